@@ -2,22 +2,98 @@
 WeightAshes Backend - FastAPI Application
 """
 
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers, QueryParams
+
+try:
+    # Optional: brotli-asgi adds br encoding (falls back to gzip itself)
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
 # Load environment variables from project root
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(env_path)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm caches and sample event-loop lag in the background; on shutdown,
+    close every loaded workspace (flushing open scenes and logs).
+    """
+    from services.metrics import monitor_loop_lag
+    from services.warmup import warm_up
+
+    # Serve immediately ("up"); /api/ready reports when caches are warm
+    warmup = asyncio.create_task(warm_up())
+    loop_lag = asyncio.create_task(monitor_loop_lag())
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        loop_lag.cancel()
+        await get_workspaces().close_all()
+
+
 app = FastAPI(
     title="WeightAshes",
     description="Personal writing IDE for The Weight of Ashes",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+
+class WorkspaceScope:
+    """
+    Serve each request from the workspace it names, in the X-Workspace
+    header or the `workspace` query parameter (the default one if neither).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        name = Headers(scope=scope).get("x-workspace") or QueryParams(
+            scope["query_string"]
+        ).get("workspace", DEFAULT_WORKSPACE)
+        registry = get_workspaces()
+        try:
+            workspace = await registry.open(name)
+        except WorkspaceError as e:
+            await _reject(scope, receive, send, 400, str(e))
+            return
+        except KeyError:
+            await _reject(scope, receive, send, 404, f"Workspace '{name}' not found")
+            return
+        async with registry.use(workspace):
+            await self.app(scope, receive, send)
+
+
+async def _reject(scope, receive, send, status_code: int, detail: str) -> None:
+    if scope["type"] == "websocket":
+        # Same 4xxx codes as the scene WebSocket uses (4404: not found)
+        code = 4000 + status_code
+        await send({"type": "websocket.close", "code": code, "reason": detail})
+        return
+    response = JSONResponse({"detail": detail}, status_code=status_code)
+    await response(scope, receive, send)
+
+
+# Added first (innermost), so its error responses still get CORS headers
+app.add_middleware(WorkspaceScope)
+
 # CORS middleware for frontend dev server
 app.add_middleware(
     CORSMiddleware,
@@ -25,14 +101,61 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
+# Compress large payloads (scene prose, codex listings)
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
+class UncompressedStreams:
+    """
+    Hide Accept-Encoding from the compression middleware on streaming
+    routes, so each NDJSON event reaches the client as it's produced.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and STREAMING_PATHS.match(scope["path"]):
+            scope = {
+                **scope,
+                "headers": [
+                    (name, value)
+                    for name, value in scope["headers"]
+                    if name != b"accept-encoding"
+                ],
+            }
+        await self.app(scope, receive, send)
+
+
+# Added last, so it runs before the compression middleware
+app.add_middleware(UncompressedStreams)
+
 # Register routers
-from routes import ai_router, codex_router, manuscript_router
+from routes import (
+    ai_router,
+    codex_router,
+    manuscript_router,
+    stats_router,
+    workspaces_router,
+)
+from routes.responses import STREAMING_PATHS
+from services.context_cache import get_context_cache
+from services.locks import get_lock_manager
+from services.metrics import get_metrics
+from services.warmup import COLD, WARMING, get_warmup_state
+from services.workspace import DEFAULT_WORKSPACE, WorkspaceError, get_workspaces
 
 app.include_router(codex_router)
 app.include_router(manuscript_router)
 app.include_router(ai_router)
+app.include_router(stats_router)
+app.include_router(workspaces_router)
 
 # TODO: Register session router when implemented
 # from routes import session_router
@@ -41,5 +164,31 @@ app.include_router(ai_router)
 
 @app.get("/")
 async def health_check():
-    """Health check endpoint."""
+    """Health check endpoint (liveness: the process is up)."""
     return {"status": "ok", "app": "WeightAshes"}
+
+
+@app.get("/api/ready")
+async def readiness_check():
+    """
+    Readiness: 200 once startup warm-up has finished (even if a step
+    failed and its cache will fill lazily), 503 while it is still running.
+    """
+    state = get_warmup_state()
+    status_code = 503 if state.status in (COLD, WARMING) else 200
+    return JSONResponse(state.snapshot(), status_code=status_code)
+
+
+@app.get("/api/metrics")
+async def metrics():
+    """
+    In-process metrics: counters, timing series (seconds, including
+    "loop_lag" for event-loop responsiveness), the current workspace's
+    lock state and context cache hit rate, and loaded workspaces.
+    """
+    return {
+        **get_metrics().snapshot(),
+        "locks": get_lock_manager().snapshot(),
+        "contextCache": get_context_cache().stats(),
+        "workspaces": get_workspaces().snapshot(),
+    }
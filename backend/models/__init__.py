@@ -4,6 +4,7 @@ from .codex import (
     CodexEntry,
     CodexEntryWithDescription,
     CodexType,
+    Progression,
     Relation,
 )
 from .manuscript import (
@@ -23,6 +24,7 @@ __all__ = [
     # Codex
     "CodexType",
     "Relation",
+    "Progression",
     "CodexEntry",
     "CodexEntryWithDescription",
     # Manuscript
@@ -24,6 +24,16 @@ class Relation(BaseModel):
     type: str
 
 
+class Progression(BaseModel):
+    """
+    How a codex entry reads from a given scene onward.
+    `scene` is the scene key (book/act/chapter/scene) the change happens in.
+    """
+
+    scene: str
+    description: str
+
+
 class CodexEntry(BaseModel):
     """Metadata for a codex entry (stored as JSON)."""
 
@@ -35,6 +45,7 @@ class CodexEntry(BaseModel):
     global_entry: bool = Field(default=False, serialization_alias="global")
     region: str | None = None
     relations: list[Relation] = []
+    progressions: list[Progression] = []
     created: datetime
     modified: datetime
 
@@ -3,9 +3,13 @@
 from .ai import router as ai_router
 from .codex import router as codex_router
 from .manuscript import router as manuscript_router
+from .stats import router as stats_router
+from .workspaces import router as workspaces_router
 
 __all__ = [
     "ai_router",
     "codex_router",
     "manuscript_router",
+    "stats_router",
+    "workspaces_router",
 ]
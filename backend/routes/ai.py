@@ -1,11 +1,25 @@
 """API routes for AI chat operations."""
 
-from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
 
-from services import get_codex_entry
 from services.ai_client import generate
-from services.prompt_builder import build_chat_prompt, load_system_prompt
+from services.context_engine import assemble_chat_context
+from services.cost_ledger import get_cost_ledger
+from services.extractor import (
+    ExtractionError,
+    commit_batch,
+    discard_batch,
+    extract,
+    get_batch,
+)
+from services.provider_router import get_router
+from services.rate_limiter import get_scheduler
+from services.summarizer import DEFAULT_PACK_BUDGET, summarize_scenes
+from services.token_estimator import get_token_estimator
+from services.variants import MAX_VARIANTS, generate_variants, get_run
+
+from .responses import ndjson_stream
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
@@ -16,6 +30,54 @@ class ChatRequest(BaseModel):
     message: str
     context_entries: list[str] = []
     scene_id: str | None = None
+    relation_hops: int = Field(default=0, ge=0, le=3)
+    relation_limit: int = Field(default=5, ge=0, le=20)
+    passages: int = Field(default=0, ge=0, le=20)
+
+
+class VariantsRequest(ChatRequest):
+    """Request body for generating several variants of a chat response."""
+
+    count: int = Field(default=3, ge=2, le=MAX_VARIANTS)
+    # Every variant reserves this much output budget while it streams,
+    # so a lower cap than chat's lets them all start at once
+    max_tokens: int = Field(default=1024, ge=64, le=8192)
+
+
+class SummarizeRequest(BaseModel):
+    """Request body for summarizing the scenes of a book, act or chapter."""
+
+    book_id: str
+    act_id: str | None = None
+    chapter_id: str | None = None
+    model: str = "claude-sonnet-4-20250514"
+    # Estimated input tokens of scene text packed into one request
+    budget: int = Field(default=DEFAULT_PACK_BUDGET, ge=500, le=100_000)
+    words: int = Field(default=80, ge=20, le=400)
+    missing_only: bool = False
+    # False sends one request per scene, for comparison
+    packed: bool = True
+
+
+class TokenCountRequest(BaseModel):
+    """Request body for local token counting."""
+
+    blocks: list[str]
+    model: str = "claude-sonnet-4-20250514"
+
+
+class ExtractRequest(BaseModel):
+    """Request body for codex extraction."""
+
+    text: str = Field(min_length=1)
+    model: str = "claude-sonnet-4-20250514"
+    max_tokens: int = Field(default=4096, ge=256, le=16384)
+
+
+class ExtractCommitRequest(BaseModel):
+    """Request body for committing an extraction batch."""
+
+    accept: list[int] | None = None
 
 
 class TokenUsage(BaseModel):
@@ -23,6 +85,7 @@ class TokenUsage(BaseModel):
 
     input: int
     output: int
+    cached: int = 0
 
 
 class ChatResponse(BaseModel):
@@ -30,6 +93,7 @@ class ChatResponse(BaseModel):
 
     response: str
     tokens_used: TokenUsage
+    cost: float | None = None
 
 
 @router.post("/chat")
@@ -43,26 +107,212 @@ async def chat(request: ChatRequest) -> ChatResponse:
     Returns:
         AI response with token usage
     """
-    # Load codex entries for context
-    codex_entries = []
-    for entry_id in request.context_entries:
-        entry = await get_codex_entry(entry_id)
-        if entry:
-            codex_entries.append(entry)
-
-    # Build the prompt
-    prompt = build_chat_prompt(request.message, codex_entries)
-
-    # Load system prompt
-    system = load_system_prompt()
+    # Assemble codex context (plus related entries, if asked) and prompt
+    context = await assemble_chat_context(
+        request.message,
+        request.context_entries,
+        scene_id=request.scene_id,
+        relation_hops=request.relation_hops,
+        relation_limit=request.relation_limit,
+        passage_limit=request.passages,
+    )
 
     # Generate response
-    result = await generate(prompt=prompt, system=system)
+    result = await generate(
+        prompt=context["prompt"],
+        system=context["system"],
+        operation="chat",
+        scene_id=request.scene_id,
+    )
 
     return ChatResponse(
         response=result["response"],
         tokens_used=TokenUsage(
             input=result["input_tokens"],
             output=result["output_tokens"],
+            cached=result["cached_tokens"],
         ),
+        cost=result["cost"],
+    )
+
+
+@router.post("/variants")
+async def chat_variants(request: VariantsRequest):
+    """
+    Generate several alternative responses at once, streaming them as
+    NDJSON events interleaved and tagged with their variant index.
+
+    The context is assembled once and shared by every variant. The first
+    event carries the run ID; cancel an unwanted variant mid-stream with
+    DELETE /api/ai/variants/{run_id}/{variant}.
+    """
+    context = await assemble_chat_context(
+        request.message,
+        request.context_entries,
+        scene_id=request.scene_id,
+        relation_hops=request.relation_hops,
+        relation_limit=request.relation_limit,
+        passage_limit=request.passages,
+    )
+    return ndjson_stream(
+        generate_variants(
+            context["prompt"],
+            context["system"],
+            request.count,
+            max_tokens=request.max_tokens,
+            scene_id=request.scene_id,
+        )
+    )
+
+
+@router.delete("/variants/{run_id}/{variant}")
+async def cancel_variant(run_id: str, variant: int) -> dict:
+    """
+    Stop one variant of a run that is still streaming. Returns
+    {"cancelled": false} if the variant had already finished.
+    """
+    run = get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Run '{run_id}' not found")
+    if not 0 <= variant < len(run.statuses):
+        raise HTTPException(
+            status_code=404, detail=f"Variant '{variant}' not found"
+        )
+    return {"cancelled": run.cancel(variant)}
+
+
+@router.get("/providers")
+async def provider_health() -> list[dict]:
+    """Report routing health (latency, error rate, breaker state) per provider."""
+    return get_router().health_snapshot()
+
+
+@router.get("/limits")
+async def rate_limits() -> dict:
+    """Report remaining rate-limit budget and queue depth per model."""
+    return get_scheduler().snapshot()
+
+
+@router.get("/spend")
+async def spend_report(
+    days: int = Query(30, ge=1, le=3660, description="Days of daily spend"),
+    limit: int = Query(20, ge=1, le=500, description="Top chapters/scenes"),
+) -> dict:
+    """
+    Report AI spend: totals, per day, per model and operation, and the
+    costliest chapters and scenes. Costs are in USD; requests to models
+    without a listed price count tokens but no cost.
+    """
+    ledger = get_cost_ledger()
+    await ledger.ensure_built()
+    return ledger.report(days, limit)
+
+
+@router.post("/tokens/count")
+async def count_tokens(request: TokenCountRequest) -> dict:
+    """
+    Estimate tokens for many text blocks at once, locally.
+
+    Returns per-block counts, their sum, and the estimate for a request
+    made of all the blocks (which adds per-request overhead).
+    """
+    estimator = get_token_estimator()
+    await estimator.ensure_loaded()
+    counts = estimator.count(request.blocks, request.model)
+    calibration = estimator.models.get(request.model)
+    return {
+        "model": request.model,
+        "counts": counts,
+        "total": sum(counts),
+        "request": estimator.estimate(request.blocks, request.model),
+        "calibrated": bool(calibration and calibration.calibrated),
+    }
+
+
+@router.get("/tokens/calibration")
+async def token_calibration(
+    holdout: float = Query(0.2, gt=0, lt=1, description="Share held out"),
+) -> list[dict]:
+    """
+    Per-model estimator weights, with error bounds measured on the most
+    recent logged requests (held out from fitting).
+    """
+    estimator = get_token_estimator()
+    await estimator.ensure_loaded()
+    return [
+        {**model, "evaluation": estimator.evaluate(model["model"], holdout)}
+        for model in estimator.snapshot()
+    ]
+
+
+@router.post("/extract")
+async def extract_entries(request: ExtractRequest):
+    """
+    Extract codex entries from text, streaming candidates as NDJSON.
+
+    Each candidate is staged in a batch (its ID comes first in the stream)
+    and marked new, duplicate (of an existing entry's name or alias) or
+    invalid. Review the batch, then commit it to create the entries.
+    """
+    return ndjson_stream(extract(request.text, request.model, request.max_tokens))
+
+
+@router.get("/extract/{batch_id}")
+async def get_extraction(batch_id: str) -> dict:
+    """Return a staged extraction batch with its candidates."""
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Batch '{batch_id}' not found")
+    return batch.snapshot()
+
+
+@router.post("/extract/{batch_id}/commit")
+async def commit_extraction(batch_id: str, request: ExtractCommitRequest) -> dict:
+    """
+    Create a batch's new candidates (or just the `accept`ed indexes) as
+    codex entries in one bulk write.
+    """
+    try:
+        return await commit_batch(batch_id, request.accept)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Batch '{batch_id}' not found")
+    except ExtractionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.delete("/extract/{batch_id}")
+async def discard_extraction(batch_id: str) -> dict:
+    """Drop a staged extraction batch."""
+    if not discard_batch(batch_id):
+        raise HTTPException(status_code=404, detail=f"Batch '{batch_id}' not found")
+    return {"deleted": True}
+
+
+@router.post("/summarize")
+async def summarize(request: SummarizeRequest):
+    """
+    Summarize the scenes of a book, act or chapter, streaming each summary
+    as NDJSON as it is stored on its scene.
+
+    Several scenes are packed into each request, up to `budget` estimated
+    input tokens; scenes missing from a packed response are retried on
+    their own. The last event reports the requests and input tokens used
+    against one request per scene.
+    """
+    if request.chapter_id is not None and request.act_id is None:
+        raise HTTPException(status_code=400, detail="chapter_id needs an act_id")
+    scope = tuple(
+        part
+        for part in (request.book_id, request.act_id, request.chapter_id)
+        if part is not None
+    )
+    return ndjson_stream(
+        summarize_scenes(
+            scope,
+            model=request.model,
+            budget=request.budget,
+            words=request.words,
+            missing_only=request.missing_only,
+            packed=request.packed,
+        )
     )
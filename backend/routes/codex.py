@@ -3,16 +3,24 @@
 import uuid
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 
 from models import CodexEntry, CodexEntryWithDescription, CodexType
 from services import (
     delete_codex_entry,
     get_codex_entry,
-    list_codex_entries,
+    get_codex_entry_version,
+    list_codex_payloads,
     save_codex_entry,
 )
+from services.context_engine import apply_progressions
+from services.fuzzy_index import DEFAULT_MIN_SCORE, get_fuzzy_index
+from services.listing_index import get_codex_listing, project
+from services.locks import codex_resource, get_lock_manager
+from services.relation_graph import BOTH, INCOMING, OUTGOING, get_relation_graph
+
+from .responses import ORJSONResponse, cache_headers, check_if_match, not_modified
 
 router = APIRouter(prefix="/api/codex", tags=["codex"])
 
@@ -28,6 +36,7 @@ class CodexCreateRequest(BaseModel):
     global_entry: bool = False
     region: str | None = None
     relations: list[dict] = []
+    progressions: list[dict] = []
     description: str = ""
 
 
@@ -41,63 +50,208 @@ class CodexUpdateRequest(BaseModel):
     global_entry: bool | None = None
     region: str | None = None
     relations: list[dict] | None = None
+    progressions: list[dict] | None = None
     description: str | None = None
 
 
-@router.get("/search")
+class CodexMergeRequest(BaseModel):
+    """Request body for merging a duplicate entry into another."""
+
+    source: str
+
+
+@router.get("/suggest")
+async def suggest_entries(
+    q: str = Query(..., min_length=1, description="Name, possibly misspelled"),
+    limit: int = Query(10, ge=1, le=50),
+    min_score: float = Query(DEFAULT_MIN_SCORE, gt=0, le=1),
+) -> list[dict]:
+    """
+    "Did you mean": entries whose name or an alias resembles the query,
+    ranked by trigram similarity.
+    """
+    index = get_fuzzy_index()
+    await index.ensure_built()
+    return index.search(q, limit=limit, min_score=min_score)
+
+
+@router.get("/duplicates")
+async def find_duplicates(
+    min_score: float = Query(0.6, gt=0, le=1),
+    limit: int = Query(100, ge=1, le=1000),
+) -> list[dict]:
+    """Pairs of entries with the same or nearly the same name or alias."""
+    index = get_fuzzy_index()
+    await index.ensure_built()
+    return await index.duplicates(min_score=min_score, limit=limit)
+
+
+@router.get(
+    "/search", response_model=list[CodexEntry], response_class=ORJSONResponse
+)
 async def search_codex(
     q: str = Query(..., min_length=1, description="Search query")
-) -> list[CodexEntry]:
+) -> ORJSONResponse:
     """
     Search codex entries by name, aliases, tags, and description.
     Simple case-insensitive substring search.
     """
-    all_entries = await list_codex_entries()
+    payloads = await list_codex_payloads()
     query_lower = q.lower()
     results = []
 
-    for entry in all_entries:
+    for payload in payloads:
         # Check name
-        if query_lower in entry.name.lower():
-            results.append(entry)
+        if query_lower in payload["name"].lower():
+            results.append(payload)
             continue
 
         # Check aliases
-        if any(query_lower in alias.lower() for alias in entry.aliases):
-            results.append(entry)
+        if any(query_lower in alias.lower() for alias in payload["aliases"]):
+            results.append(payload)
             continue
 
         # Check tags
-        if any(query_lower in tag.lower() for tag in entry.tags):
-            results.append(entry)
+        if any(query_lower in tag.lower() for tag in payload["tags"]):
+            results.append(payload)
             continue
 
         # Check description (need to load full entry)
-        full_entry = await get_codex_entry(entry.id)
+        full_entry = await get_codex_entry(payload["id"])
         if full_entry and query_lower in full_entry.description.lower():
-            results.append(entry)
+            results.append(payload)
 
-    return results
+    # Cached payloads, serialized once per entry rather than per request
+    return ORJSONResponse(results)
 
 
-@router.get("/")
+@router.get("/", response_model=list[CodexEntry], response_class=ORJSONResponse)
 async def list_entries(
-    type: CodexType | None = Query(None, description="Filter by entry type")
-) -> list[CodexEntry]:
-    """List all codex entries, optionally filtered by type."""
+    type: CodexType | None = Query(None, description="Filter by entry type"),
+    tag: list[str] | None = Query(None, description="Require all these tags"),
+    region: str | None = Query(None, description="Filter by region"),
+    global_entry: bool | None = Query(
+        None, alias="global", description="Filter by the global flag"
+    ),
+    sort: str | None = Query(
+        None,
+        pattern="^-?(name|created|modified)$",
+        description="Sort field; prefix with '-' for descending (default: name)",
+    ),
+    limit: int | None = Query(None, ge=1, le=1000, description="Page size"),
+    cursor: str | None = Query(None, description="X-Next-Cursor of the last page"),
+    fields: str | None = Query(
+        None, description="Comma-separated fields to return (id is always kept)"
+    ),
+) -> ORJSONResponse:
+    """
+    List codex entries, optionally filtered, sorted, projected and paged.
+
+    Without any of tag/region/global/sort/limit/cursor/fields this returns
+    every entry (filtered by type) read fresh from disk. Otherwise pages are
+    served from the in-memory listing index; when more results remain, the
+    response carries an X-Next-Cursor header to pass back as `cursor`.
+    """
     type_str = type.value if type else None
-    return await list_codex_entries(type_str)
+    indexed = any(
+        param is not None
+        for param in (tag, region, global_entry, sort, limit, cursor, fields)
+    )
+    if not indexed:
+        return ORJSONResponse(await list_codex_payloads(type_str))
+
+    listing = get_codex_listing()
+    await listing.ensure_built()
+
+    tags = set(tag or [])
+
+    def matches(item: dict) -> bool:
+        return (
+            (type_str is None or item["type"] == type_str)
+            and (region is None or item["region"] == region)
+            and (global_entry is None or item["global"] == global_entry)
+            and tags.issubset(item["tags"])
+        )
+
+    sort = sort or "name"
+    try:
+        items, next_cursor = listing.index.page(
+            sort.lstrip("-"),
+            descending=sort.startswith("-"),
+            cursor=cursor,
+            limit=limit,
+            predicate=matches,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    field_set = {f.strip() for f in fields.split(",") if f.strip()} if fields else None
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse(
+        [project(item, field_set, keep=("id",)) for item in items],
+        headers=headers,
+    )
 
 
 @router.get("/{entry_id}")
-async def get_entry(entry_id: str) -> CodexEntryWithDescription:
-    """Get a single codex entry by ID, including description."""
+async def get_entry(
+    entry_id: str,
+    request: Request,
+    response: Response,
+    as_of: str | None = Query(
+        None, description="Scene key; resolve the description as of this scene"
+    ),
+) -> CodexEntryWithDescription:
+    """
+    Get a single codex entry by ID, including description.
+    Supports conditional GET via If-None-Match / If-Modified-Since, except
+    for as-of views: those also depend on scene order, which the entry's
+    files don't capture.
+    """
+    version = await get_codex_entry_version(entry_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"Entry '{entry_id}' not found")
+    if not as_of:
+        cached = not_modified(request, *version)
+        if cached is not None:
+            return cached
+
     entry = await get_codex_entry(entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail=f"Entry '{entry_id}' not found")
+    if as_of:
+        [entry] = await apply_progressions([entry], as_of)
+    else:
+        response.headers.update(cache_headers(*version))
     return entry
 
 
+@router.get("/{entry_id}/relations")
+async def get_entry_relations(
+    entry_id: str,
+    direction: str = Query(BOTH, pattern=f"^({OUTGOING}|{INCOMING}|{BOTH})$"),
+    type: list[str] | None = Query(None, description="Relation types to follow"),
+    hops: int = Query(1, ge=1, le=3, description="Relation distance"),
+    limit: int = Query(50, ge=1, le=500),
+) -> list[dict]:
+    """
+    List entries related to an entry, following forward and/or reverse
+    relations up to `hops` away.
+    """
+    graph = get_relation_graph()
+    await graph.ensure_built()
+    types = set(type) if type else None
+
+    if hops == 1:
+        return graph.neighbors(entry_id, direction, types)[:limit]
+    return [
+        {"id": related_id, "distance": distance}
+        for related_id, distance in graph.expand(
+            [entry_id], hops=hops, limit=limit, direction=direction, types=types
+        )
+    ]
+
+
 @router.post("/")
 async def create_entry(request: CodexCreateRequest) -> CodexEntryWithDescription:
     """Create a new codex entry."""
@@ -106,28 +260,30 @@ async def create_entry(request: CodexCreateRequest) -> CodexEntryWithDescription
     # Generate ID if not provided
     entry_id = request.id or str(uuid.uuid4())[:8]
 
-    # Check if entry already exists
-    existing = await get_codex_entry(entry_id)
-    if existing:
-        raise HTTPException(
-            status_code=400, detail=f"Entry '{entry_id}' already exists"
+    async with get_lock_manager().hold(codex_resource(entry_id)):
+        # Check if entry already exists
+        existing = await get_codex_entry_version(entry_id)
+        if existing:
+            raise HTTPException(
+                status_code=400, detail=f"Entry '{entry_id}' already exists"
+            )
+
+        # Create the entry
+        entry = CodexEntry(
+            id=entry_id,
+            type=request.type,
+            name=request.name,
+            aliases=request.aliases,
+            tags=request.tags,
+            global_entry=request.global_entry,
+            region=request.region,
+            relations=request.relations,
+            progressions=request.progressions,
+            created=now,
+            modified=now,
         )
 
-    # Create the entry
-    entry = CodexEntry(
-        id=entry_id,
-        type=request.type,
-        name=request.name,
-        aliases=request.aliases,
-        tags=request.tags,
-        global_entry=request.global_entry,
-        region=request.region,
-        relations=request.relations,
-        created=now,
-        modified=now,
-    )
-
-    await save_codex_entry(entry, request.description)
+        await save_codex_entry(entry, request.description)
 
     # Return the saved entry with description
     return CodexEntryWithDescription(
@@ -138,30 +294,39 @@ async def create_entry(request: CodexCreateRequest) -> CodexEntryWithDescription
 
 @router.put("/{entry_id}")
 async def update_entry(
-    entry_id: str, request: CodexUpdateRequest
+    entry_id: str, request: CodexUpdateRequest, http_request: Request
 ) -> CodexEntryWithDescription:
-    """Update an existing codex entry."""
-    # Load existing entry
-    existing = await get_codex_entry(entry_id)
-    if not existing:
-        raise HTTPException(status_code=404, detail=f"Entry '{entry_id}' not found")
-
-    # Merge updates
-    update_data = request.model_dump(exclude_unset=True)
-    description = update_data.pop("description", None)
-    if description is None:
-        description = existing.description
-
-    # Build updated entry
-    entry_data = existing.model_dump()
-    entry_data.update(update_data)
-    entry_data["modified"] = datetime.now(timezone.utc)
-
-    # Remove description from entry_data (it's stored separately)
-    entry_data.pop("description", None)
-
-    entry = CodexEntry.model_validate(entry_data)
-    await save_codex_entry(entry, description)
+    """
+    Update an existing codex entry.
+    Send If-Match with the entry's ETag to fail with 412 instead of
+    overwriting a change made since it was read.
+    """
+    async with get_lock_manager().hold(codex_resource(entry_id)):
+        # Load existing entry
+        version = await get_codex_entry_version(entry_id)
+        existing = await get_codex_entry(entry_id)
+        if not existing:
+            raise HTTPException(
+                status_code=404, detail=f"Entry '{entry_id}' not found"
+            )
+        check_if_match(http_request, version[0] if version else None)
+
+        # Merge updates
+        update_data = request.model_dump(exclude_unset=True)
+        description = update_data.pop("description", None)
+        if description is None:
+            description = existing.description
+
+        # Build updated entry
+        entry_data = existing.model_dump()
+        entry_data.update(update_data)
+        entry_data["modified"] = datetime.now(timezone.utc)
+
+        # Remove description from entry_data (it's stored separately)
+        entry_data.pop("description", None)
+
+        entry = CodexEntry.model_validate(entry_data)
+        await save_codex_entry(entry, description)
 
     # Return updated entry with description
     return CodexEntryWithDescription(
@@ -173,7 +338,96 @@ async def update_entry(
 @router.delete("/{entry_id}")
 async def delete_entry(entry_id: str) -> dict:
     """Delete a codex entry."""
-    deleted = await delete_codex_entry(entry_id)
+    async with get_lock_manager().hold(codex_resource(entry_id)):
+        deleted = await delete_codex_entry(entry_id)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"Entry '{entry_id}' not found")
     return {"deleted": True}
+
+
+@router.post("/{entry_id}/merge")
+async def merge_entry(
+    entry_id: str, request: CodexMergeRequest
+) -> CodexEntryWithDescription:
+    """
+    Merge a duplicate entry (`source`) into this one.
+
+    The source's name and aliases become aliases here, tags, relations and
+    progressions are combined, its description is appended, relations
+    from other entries are pointed here, and the source is deleted.
+    """
+    source_id = request.source
+    if source_id == entry_id:
+        raise HTTPException(status_code=400, detail="Cannot merge an entry into itself")
+
+    graph = get_relation_graph()
+    await graph.ensure_built()
+    referrers = {
+        neighbor["id"]
+        for neighbor in graph.neighbors(source_id, INCOMING)
+        if neighbor["id"] not in (entry_id, source_id)
+    }
+    resources = [codex_resource(i) for i in (entry_id, source_id, *referrers)]
+
+    async with get_lock_manager().hold(*resources):
+        target = await get_codex_entry(entry_id)
+        if not target:
+            raise HTTPException(
+                status_code=404, detail=f"Entry '{entry_id}' not found"
+            )
+        source = await get_codex_entry(source_id)
+        if not source:
+            raise HTTPException(
+                status_code=404, detail=f"Entry '{source_id}' not found"
+            )
+
+        seen = {target.name.casefold()}
+        aliases = []
+        for alias in [*target.aliases, source.name, *source.aliases]:
+            if alias.casefold() not in seen:
+                seen.add(alias.casefold())
+                aliases.append(alias)
+        relations = []
+        for relation in [*target.relations, *source.relations]:
+            if relation.target in (entry_id, source_id) or relation in relations:
+                continue
+            relations.append(relation)
+        description = target.description
+        if source.description.strip() and source.description not in description:
+            description = f"{description.rstrip()}\n\n{source.description.strip()}\n"
+
+        entry = CodexEntry.model_validate(
+            {
+                **target.model_dump(exclude={"description"}),
+                "aliases": aliases,
+                "tags": list(dict.fromkeys([*target.tags, *source.tags])),
+                "relations": relations,
+                "progressions": [*target.progressions, *source.progressions],
+            }
+        )
+        await save_codex_entry(entry, description)
+
+        # Repoint relations that targeted the source
+        for referrer_id in sorted(referrers):
+            referrer = await get_codex_entry(referrer_id)
+            if not referrer:
+                continue
+            repointed = []
+            for relation in referrer.relations:
+                if relation.target == source_id:
+                    relation = relation.model_copy(update={"target": entry_id})
+                if relation not in repointed:
+                    repointed.append(relation)
+            await save_codex_entry(
+                CodexEntry.model_validate(
+                    {
+                        **referrer.model_dump(exclude={"description"}),
+                        "relations": repointed,
+                    }
+                ),
+                referrer.description,
+            )
+
+        await delete_codex_entry(source_id)
+
+    return CodexEntryWithDescription(**entry.model_dump(), description=description)
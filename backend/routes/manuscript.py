@@ -1,22 +1,51 @@
 """API routes for Manuscript operations."""
 
+import asyncio
+import json
 import uuid
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from pydantic import BaseModel, Field
 
 from models import Chapter, Scene, SceneStatus, SceneWithContent
 from services import (
+    delete_scene as delete_scene_files,
     get_chapter,
+    get_chapter_version,
     get_manuscript_structure,
     get_scene,
+    get_scene_version,
     save_chapter,
     save_scene,
     count_words,
-    MANUSCRIPT_DIR,
+    get_occurrence_matrix,
+    scene_key,
+)
+from services.context_engine import MAX_PASSAGES, find_passages
+from services.listing_index import get_scene_listing, project
+from services.locks import chapter_resource, get_lock_manager, scene_resource
+from services.highlighter import highlight_paragraphs
+from services.progressions import get_progression_index
+from services.recent_prose import get_recent_prose
+from services.scene_sessions import (
+    SessionError,
+    flush_session,
+    join_session,
+    leave_session,
+    write_session_edits,
 )
 
+from .responses import ORJSONResponse, cache_headers, check_if_match, not_modified
+
 router = APIRouter(prefix="/api/manuscript", tags=["manuscript"])
 
 
@@ -28,6 +57,13 @@ class ChapterUpdateRequest(BaseModel):
     status: SceneStatus | None = None
 
 
+class HighlightRequest(BaseModel):
+    """Request body for paragraph highlighting."""
+
+    paragraphs: list[str]
+    first_index: int = Field(default=0, ge=0)
+
+
 class SceneCreateRequest(BaseModel):
     """Request body for creating a scene."""
 
@@ -41,6 +77,12 @@ class SceneCreateRequest(BaseModel):
     content: str = ""
 
 
+class BulkSceneCreateRequest(BaseModel):
+    """Request body for creating several scenes in one chapter."""
+
+    scenes: list[SceneCreateRequest] = Field(min_length=1, max_length=500)
+
+
 class SceneUpdateRequest(BaseModel):
     """Request body for updating a scene."""
 
@@ -59,103 +101,348 @@ async def get_structure() -> dict:
     return await get_manuscript_structure()
 
 
+@router.get("/scenes", response_class=ORJSONResponse)
+async def list_scenes(
+    book: str | None = Query(None, description="Filter by book ID"),
+    act: str | None = Query(None, description="Filter by act ID"),
+    chapter: str | None = Query(None, description="Filter by chapter ID"),
+    status: SceneStatus | None = Query(None, description="Filter by status"),
+    pov: str | None = Query(None, description="Filter by POV character"),
+    label: list[str] | None = Query(None, description="Require all these labels"),
+    sort: str = Query(
+        "position",
+        pattern="^-?(position|title|modified|wordCount)$",
+        description="Sort field; prefix with '-' for descending",
+    ),
+    limit: int | None = Query(None, ge=1, le=1000, description="Page size"),
+    cursor: str | None = Query(None, description="X-Next-Cursor of the last page"),
+    fields: str | None = Query(
+        None, description="Comma-separated fields to return (key/id always kept)"
+    ),
+) -> ORJSONResponse:
+    """
+    List scene metadata across the manuscript, filtered, sorted, projected
+    and paged from the in-memory listing index. When more results remain,
+    the response carries an X-Next-Cursor header to pass back as `cursor`.
+    """
+    listing = get_scene_listing()
+    await listing.ensure_built()
+
+    labels = set(label or [])
+    status_str = status.value if status else None
+
+    def matches(item: dict) -> bool:
+        return (
+            (book is None or item["bookId"] == book)
+            and (act is None or item["actId"] == act)
+            and (chapter is None or item["chapterId"] == chapter)
+            and (status_str is None or item["status"] == status_str)
+            and (pov is None or item["pov"] == pov)
+            and labels.issubset(item["labels"])
+        )
+
+    try:
+        items, next_cursor = listing.index.page(
+            sort.lstrip("-"),
+            descending=sort.startswith("-"),
+            cursor=cursor,
+            limit=limit,
+            predicate=matches,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    field_set = {f.strip() for f in fields.split(",") if f.strip()} if fields else None
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse(
+        [project(item, field_set, keep=("key", "id")) for item in items],
+        headers=headers,
+    )
+
+
+@router.get("/matrix")
+async def get_matrix(
+    types: str | None = Query(
+        None, description="Comma-separated codex types to include as columns"
+    )
+) -> dict:
+    """
+    Return the scene x codex-entry occurrence matrix in compact CSR form.
+    Row i's mentions are indices/counts/firstOffsets[indptr[i]:indptr[i+1]].
+    """
+    type_filter = {t.strip() for t in types.split(",") if t.strip()} if types else None
+    return await get_occurrence_matrix().compact(type_filter)
+
+
+@router.get("/passages")
+async def search_passages(
+    q: str = Query(..., min_length=1, description="Text to find passages for"),
+    limit: int = Query(5, ge=1, le=MAX_PASSAGES),
+    before: str | None = Query(
+        None, description="Only search scenes before this scene key or ID"
+    ),
+) -> list[dict]:
+    """
+    Prose paragraphs most relevant to `q` (BM25 over all scenes), best
+    first, e.g. to find the last time two characters spoke.
+    """
+    if before is not None:
+        progressions = get_progression_index()
+        await progressions.ensure_built()
+        if progressions.manuscript.resolve_key(before) is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Scene '{before}' not found (or its ID is ambiguous)",
+            )
+    return await find_passages(q, limit, before)
+
+
+@router.post("/highlight")
+async def highlight(request: HighlightRequest) -> list[dict]:
+    """
+    Codex mention spans for the paragraphs an edit touched.
+
+    Send only the changed paragraphs (and the index of the first one);
+    offsets in the result are relative to each paragraph. Unchanged
+    paragraph texts are answered from cache without rescanning.
+    """
+    return await highlight_paragraphs(request.paragraphs, request.first_index)
+
+
 @router.get("/{book_id}/{act_id}/{chapter_id}")
 async def get_chapter_metadata(
-    book_id: str, act_id: str, chapter_id: str
+    book_id: str, act_id: str, chapter_id: str, response: Response
 ) -> Chapter:
-    """Get chapter metadata."""
+    """Get chapter metadata (with an ETag for If-Match on update)."""
+    version = await get_chapter_version(book_id, act_id, chapter_id)
     chapter = await get_chapter(book_id, act_id, chapter_id)
     if not chapter:
         raise HTTPException(
             status_code=404,
             detail=f"Chapter '{chapter_id}' not found",
         )
+    if version is not None:
+        response.headers.update(cache_headers(*version))
     return chapter
 
 
 @router.put("/{book_id}/{act_id}/{chapter_id}")
 async def update_chapter(
-    book_id: str, act_id: str, chapter_id: str, request: ChapterUpdateRequest
+    book_id: str,
+    act_id: str,
+    chapter_id: str,
+    request: ChapterUpdateRequest,
+    http_request: Request,
+    response: Response,
 ) -> Chapter:
-    """Update chapter metadata."""
-    chapter = await get_chapter(book_id, act_id, chapter_id)
-    if not chapter:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Chapter '{chapter_id}' not found",
-        )
-
-    # Merge updates
-    update_data = request.model_dump(exclude_unset=True)
-    chapter_data = chapter.model_dump()
-    chapter_data.update(update_data)
-
-    updated_chapter = Chapter.model_validate(chapter_data)
-    await save_chapter(book_id, act_id, updated_chapter)
-
+    """
+    Update chapter metadata.
+    Send If-Match with the chapter's ETag to fail with 412 instead of
+    overwriting a change made since it was read.
+    """
+    async with get_lock_manager().hold(chapter_resource(book_id, act_id, chapter_id)):
+        chapter = await get_chapter(book_id, act_id, chapter_id)
+        if not chapter:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Chapter '{chapter_id}' not found",
+            )
+        version = await get_chapter_version(book_id, act_id, chapter_id)
+        check_if_match(http_request, version[0] if version else None)
+
+        # Merge updates
+        update_data = request.model_dump(exclude_unset=True)
+        chapter_data = chapter.model_dump()
+        chapter_data.update(update_data)
+
+        updated_chapter = Chapter.model_validate(chapter_data)
+        await save_chapter(book_id, act_id, updated_chapter)
+        version = await get_chapter_version(book_id, act_id, chapter_id)
+
+    if version is not None:
+        response.headers.update(cache_headers(*version))
     return updated_chapter
 
 
 @router.get("/{book_id}/{act_id}/{chapter_id}/{scene_id}")
 async def get_scene_content(
-    book_id: str, act_id: str, chapter_id: str, scene_id: str
+    book_id: str,
+    act_id: str,
+    chapter_id: str,
+    scene_id: str,
+    request: Request,
+    response: Response,
 ) -> SceneWithContent:
-    """Get scene with content."""
+    """
+    Get scene with content.
+    Supports conditional GET: a matching If-None-Match (or an unchanged
+    If-Modified-Since) gets a 304 without the scene being read.
+    """
+    # Edits made over the editing channel and not yet flushed count too
+    await flush_session(scene_key(book_id, act_id, chapter_id, scene_id))
+    version = await get_scene_version(book_id, act_id, chapter_id, scene_id)
+    if version is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Scene '{scene_id}' not found",
+        )
+    cached = not_modified(request, *version)
+    if cached is not None:
+        return cached
+
     scene = await get_scene(book_id, act_id, chapter_id, scene_id)
     if not scene:
         raise HTTPException(
             status_code=404,
             detail=f"Scene '{scene_id}' not found",
         )
+    response.headers.update(cache_headers(*version))
     return scene
 
 
-@router.post("/{book_id}/{act_id}/{chapter_id}/scenes")
-async def create_scene(
-    book_id: str, act_id: str, chapter_id: str, request: SceneCreateRequest
-) -> SceneWithContent:
-    """Create a new scene."""
-    # Check chapter exists
-    chapter = await get_chapter(book_id, act_id, chapter_id)
-    if not chapter:
+@router.get("/{book_id}/{act_id}/{chapter_id}/{scene_id}/recent")
+async def get_scene_recent_prose(
+    book_id: str,
+    act_id: str,
+    chapter_id: str,
+    scene_id: str,
+    words: int = Query(600, ge=1, le=10000, description="Word budget"),
+    cursor: int | None = Query(
+        None, ge=0, description="UTF-8 byte offset to read back from"
+    ),
+) -> dict:
+    """Get the last `words` words of a scene's prose, in whole paragraphs."""
+    await flush_session(scene_key(book_id, act_id, chapter_id, scene_id))
+    recent = await get_recent_prose(
+        book_id, act_id, chapter_id, scene_id, words=words, cursor=cursor
+    )
+    if recent is None:
         raise HTTPException(
             status_code=404,
-            detail=f"Chapter '{chapter_id}' not found",
+            detail=f"Scene '{scene_id}' not found",
         )
+    return recent
 
+
+async def _write_new_scene(
+    book_id: str, act_id: str, chapter_id: str, request: SceneCreateRequest
+) -> SceneWithContent:
+    """Write a new scene's files (not its place in the chapter)."""
     now = datetime.now(timezone.utc)
     scene_id = request.id or f"scene-{str(uuid.uuid4())[:8]}"
 
-    # Check if scene already exists
-    existing = await get_scene(book_id, act_id, chapter_id, scene_id)
-    if existing:
+    async with get_lock_manager().hold(
+        scene_resource(book_id, act_id, chapter_id, scene_id)
+    ):
+        # Check if scene already exists
+        existing = await get_scene_version(book_id, act_id, chapter_id, scene_id)
+        if existing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Scene '{scene_id}' already exists",
+            )
+
+        # Create scene
+        scene = Scene(
+            id=scene_id,
+            title=request.title,
+            summary=request.summary,
+            pov=request.pov,
+            word_count=count_words(request.content),
+            status=request.status,
+            labels=request.labels,
+            attached_codex=request.attached_codex,
+            created=now,
+            modified=now,
+        )
+        await save_scene(book_id, act_id, chapter_id, scene, request.content)
+
+    return SceneWithContent(**scene.model_dump(), content=request.content)
+
+
+async def _append_to_chapter(
+    book_id: str, act_id: str, chapter_id: str, scene_ids: list[str]
+) -> None:
+    """Append scene IDs to the chapter's scene list (locked read-modify-write)."""
+    async with get_lock_manager().hold(chapter_resource(book_id, act_id, chapter_id)):
+        chapter = await get_chapter(book_id, act_id, chapter_id)
+        if chapter is None:
+            return
+        new_ids = [scene_id for scene_id in scene_ids if scene_id not in chapter.scenes]
+        if new_ids:
+            chapter.scenes.extend(new_ids)
+            await save_chapter(book_id, act_id, chapter)
+
+
+async def _require_chapter(book_id: str, act_id: str, chapter_id: str) -> None:
+    if await get_chapter_version(book_id, act_id, chapter_id) is None:
         raise HTTPException(
-            status_code=400,
-            detail=f"Scene '{scene_id}' already exists",
+            status_code=404,
+            detail=f"Chapter '{chapter_id}' not found",
         )
 
-    # Create scene
-    scene = Scene(
-        id=scene_id,
-        title=request.title,
-        summary=request.summary,
-        pov=request.pov,
-        word_count=count_words(request.content),
-        status=request.status,
-        labels=request.labels,
-        attached_codex=request.attached_codex,
-        created=now,
-        modified=now,
-    )
 
-    await save_scene(book_id, act_id, chapter_id, scene, request.content)
+@router.post("/{book_id}/{act_id}/{chapter_id}/scenes")
+async def create_scene(
+    book_id: str, act_id: str, chapter_id: str, request: SceneCreateRequest
+) -> SceneWithContent:
+    """Create a new scene."""
+    # Check chapter exists
+    await _require_chapter(book_id, act_id, chapter_id)
+
+    created = await _write_new_scene(book_id, act_id, chapter_id, request)
 
     # Update chapter's scenes list
-    if scene_id not in chapter.scenes:
-        chapter.scenes.append(scene_id)
-        await save_chapter(book_id, act_id, chapter)
+    await _append_to_chapter(book_id, act_id, chapter_id, [created.id])
+
+    return created
+
+
+@router.post("/{book_id}/{act_id}/{chapter_id}/scenes/bulk")
+async def create_scenes(
+    book_id: str, act_id: str, chapter_id: str, request: BulkSceneCreateRequest
+) -> list[SceneWithContent]:
+    """
+    Create several scenes in one chapter.
+
+    Scene files are written concurrently (each under its own lock), then
+    the chapter's scene list is updated once, in request order. All IDs are
+    checked up front, so a duplicate fails the request before any writes.
+    """
+    await _require_chapter(book_id, act_id, chapter_id)
+
+    scenes = [
+        scene.model_copy(update={"id": scene.id or f"scene-{str(uuid.uuid4())[:8]}"})
+        for scene in request.scenes
+    ]
+    ids = [scene.id for scene in scenes]
+    duplicates = sorted({scene_id for scene_id in ids if ids.count(scene_id) > 1})
+    if duplicates:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Duplicate scene IDs in request: {', '.join(duplicates)}",
+        )
+    versions = await asyncio.gather(
+        *(get_scene_version(book_id, act_id, chapter_id, i) for i in ids)
+    )
+    existing = [scene_id for scene_id, v in zip(ids, versions) if v is not None]
+    if existing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Scenes already exist: {', '.join(existing)}",
+        )
 
-    return SceneWithContent(**scene.model_dump(), content=request.content)
+    results = await asyncio.gather(
+        *(_write_new_scene(book_id, act_id, chapter_id, scene) for scene in scenes),
+        return_exceptions=True,
+    )
+    # List whatever was written, even if a racing create claimed an ID
+    created = [r for r in results if isinstance(r, SceneWithContent)]
+    await _append_to_chapter(book_id, act_id, chapter_id, [s.id for s in created])
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return created
 
 
 @router.put("/{book_id}/{act_id}/{chapter_id}/{scene_id}")
@@ -165,30 +452,48 @@ async def update_scene(
     chapter_id: str,
     scene_id: str,
     request: SceneUpdateRequest,
+    http_request: Request,
+    response: Response,
 ) -> SceneWithContent:
-    """Update a scene."""
-    existing = await get_scene(book_id, act_id, chapter_id, scene_id)
-    if not existing:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Scene '{scene_id}' not found",
-        )
-
-    # Merge updates
-    update_data = request.model_dump(exclude_unset=True)
-    content = update_data.pop("content", None)
-    if content is None:
-        content = existing.content
-
-    scene_data = existing.model_dump()
-    scene_data.pop("content", None)  # Remove content from scene data
-    scene_data.update(update_data)
-    scene_data["modified"] = datetime.now(timezone.utc)
-    scene_data["word_count"] = count_words(content)
-
-    scene = Scene.model_validate(scene_data)
-    await save_scene(book_id, act_id, chapter_id, scene, content)
-
+    """
+    Update a scene.
+    Send If-Match with the scene's ETag to fail with 412 instead of
+    overwriting a change made since it was read.
+    """
+    async with get_lock_manager().hold(
+        scene_resource(book_id, act_id, chapter_id, scene_id)
+    ):
+        # Write an open session's pending edits first: the If-Match check
+        # is then against them, and the reload this save triggers in the
+        # session doesn't discard them
+        await write_session_edits(scene_key(book_id, act_id, chapter_id, scene_id))
+        version = await get_scene_version(book_id, act_id, chapter_id, scene_id)
+        existing = await get_scene(book_id, act_id, chapter_id, scene_id)
+        if not existing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Scene '{scene_id}' not found",
+            )
+        check_if_match(http_request, version[0] if version else None)
+
+        # Merge updates
+        update_data = request.model_dump(exclude_unset=True)
+        content = update_data.pop("content", None)
+        if content is None:
+            content = existing.content
+
+        scene_data = existing.model_dump()
+        scene_data.pop("content", None)  # Remove content from scene data
+        scene_data.update(update_data)
+        scene_data["modified"] = datetime.now(timezone.utc)
+        scene_data["word_count"] = count_words(content)
+
+        scene = Scene.model_validate(scene_data)
+        await save_scene(book_id, act_id, chapter_id, scene, content)
+        version = await get_scene_version(book_id, act_id, chapter_id, scene_id)
+
+    if version is not None:
+        response.headers.update(cache_headers(*version))
     return SceneWithContent(**scene.model_dump(), content=content)
 
 
@@ -197,26 +502,62 @@ async def delete_scene(
     book_id: str, act_id: str, chapter_id: str, scene_id: str
 ) -> dict:
     """Delete a scene."""
-    # Check scene exists
-    existing = await get_scene(book_id, act_id, chapter_id, scene_id)
-    if not existing:
+    locks = get_lock_manager()
+
+    # Delete scene files
+    async with locks.hold(scene_resource(book_id, act_id, chapter_id, scene_id)):
+        deleted = await delete_scene_files(book_id, act_id, chapter_id, scene_id)
+    if not deleted:
         raise HTTPException(
             status_code=404,
             detail=f"Scene '{scene_id}' not found",
         )
 
-    # Delete scene files
-    chapter_dir = MANUSCRIPT_DIR / book_id / act_id / chapter_id
-    json_path = chapter_dir / f"{scene_id}.json"
-    md_path = chapter_dir / f"{scene_id}.md"
-
-    json_path.unlink(missing_ok=True)
-    md_path.unlink(missing_ok=True)
-
     # Update chapter's scenes list
-    chapter = await get_chapter(book_id, act_id, chapter_id)
-    if chapter and scene_id in chapter.scenes:
-        chapter.scenes.remove(scene_id)
-        await save_chapter(book_id, act_id, chapter)
+    async with locks.hold(chapter_resource(book_id, act_id, chapter_id)):
+        chapter = await get_chapter(book_id, act_id, chapter_id)
+        if chapter and scene_id in chapter.scenes:
+            chapter.scenes.remove(scene_id)
+            await save_chapter(book_id, act_id, chapter)
 
     return {"deleted": True}
+
+
+@router.websocket("/{book_id}/{act_id}/{chapter_id}/{scene_id}/ws")
+async def scene_session(
+    websocket: WebSocket, book_id: str, act_id: str, chapter_id: str, scene_id: str
+) -> None:
+    """
+    Editing channel for an open scene.
+
+    On connect the server sends {"type": "snapshot", "version", "content",
+    "wordCount"}. Clients send edits as {"type": "edit", "baseVersion",
+    "start", "end", "text"} and get {"type": "ack", "version"} back, or a
+    {"type": "conflict", ...} snapshot if they edited a stale version.
+    The server also pushes other clients' edits, "stats" (word count),
+    "entities" (detected codex entries) and "saved" messages. Edits are
+    held in memory and written to disk after a pause and on disconnect.
+    """
+    await websocket.accept()
+    client = websocket.send_json
+    session = await join_session(book_id, act_id, chapter_id, scene_id, client)
+    if session is None:
+        await websocket.close(code=4404, reason=f"Scene '{scene_id}' not found")
+        return
+
+    try:
+        await client(session.snapshot())
+        await session.push_entities(client)
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                message = json.loads(raw)
+                if not isinstance(message, dict):
+                    raise SessionError("Messages must be JSON objects")
+                await session.handle(client, message)
+            except (json.JSONDecodeError, SessionError) as e:
+                await client({"type": "error", "detail": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await leave_session(session, client)
@@ -0,0 +1,104 @@
+"""Response classes shared by the API routes."""
+
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, AsyncIterator
+
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Newline-delimited JSON, one event per line
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Routes that stream NDJSON. Compression would hold events back until the
+# compressor's buffer fills, so these are always sent uncompressed.
+STREAMING_PATHS = re.compile(r"^/api/ai/(extract|variants|summarize)/?$")
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson.
+
+    Used for bulk listings whose payloads are already plain data, so
+    FastAPI's response-model validation and encoding can be skipped.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def ndjson_stream(events: AsyncIterator[dict]) -> StreamingResponse:
+    """Stream events to the client as NDJSON, each line sent as produced."""
+
+    async def lines():
+        async for event in events:
+            yield orjson.dumps(event, option=orjson.OPT_APPEND_NEWLINE)
+
+    return StreamingResponse(
+        lines(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def cache_headers(etag: str, last_modified: float) -> dict[str, str]:
+    """Validator headers for a versioned resource (clients must revalidate)."""
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+
+def not_modified(
+    request: Request, etag: str, last_modified: float
+) -> Response | None:
+    """
+    Return a 304 response if the client's cached copy is current, else None.
+    If-None-Match takes precedence over If-Modified-Since.
+    """
+    headers = cache_headers(etag, last_modified)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison is correct for GET revalidation
+        candidates = {
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        }
+        if "*" in candidates or etag in candidates:
+            return Response(status_code=304, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return None
+        # HTTP dates have one-second resolution
+        if int(last_modified) <= since:
+            return Response(status_code=304, headers=headers)
+
+    return None
+
+
+def check_if_match(request: Request, etag: str | None) -> None:
+    """
+    Enforce an If-Match precondition (optimistic concurrency): the write
+    only proceeds if the client saw the current version.
+
+    Raises:
+        HTTPException: 412 if the client's version is stale
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return
+    # Strong comparison: weak validators never match for writes
+    candidates = {tag.strip() for tag in if_match.split(",")}
+    if etag is not None and ("*" in candidates or etag in candidates):
+        return
+    raise HTTPException(
+        status_code=412,
+        detail="Resource was modified since it was read; reload and retry",
+        headers={"ETag": etag} if etag else None,
+    )
@@ -0,0 +1,47 @@
+"""API routes for writing statistics."""
+
+from fastapi import APIRouter, Query
+
+from services.writing_stats import get_writing_stats
+
+router = APIRouter(prefix="/api/stats", tags=["stats"])
+
+
+@router.get("/summary")
+async def get_summary():
+    """Total words, today's and this week's activity, and writing streaks."""
+    stats = get_writing_stats()
+    await stats.ensure_built()
+    return stats.summary()
+
+
+@router.get("/daily")
+async def get_daily(days: int = Query(default=30, ge=1, le=3660)):
+    """Words added and removed per day for the last `days` days."""
+    stats = get_writing_stats()
+    await stats.ensure_built()
+    return stats.days(days)
+
+
+@router.get("/weekly")
+async def get_weekly(weeks: int = Query(default=12, ge=1, le=520)):
+    """Words added and removed per ISO week for the last `weeks` weeks."""
+    stats = get_writing_stats()
+    await stats.ensure_built()
+    return stats.weeks(weeks)
+
+
+@router.get("/velocity")
+async def get_velocity(days: int = Query(default=14, ge=1, le=3660)):
+    """Words per day by act over the last `days` days."""
+    stats = get_writing_stats()
+    await stats.ensure_built()
+    return stats.velocity(days)
+
+
+@router.get("/chapters")
+async def get_chapters():
+    """Current length and all-time activity per chapter."""
+    stats = get_writing_stats()
+    await stats.ensure_built()
+    return stats.chapter_totals()
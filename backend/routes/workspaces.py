@@ -0,0 +1,45 @@
+"""API routes for workspaces (independent projects)."""
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from services.workspace import WorkspaceError, current_workspace, get_workspaces
+
+router = APIRouter(prefix="/api/workspaces", tags=["workspaces"])
+
+
+class WorkspaceCreateRequest(BaseModel):
+    """Request body for creating a workspace."""
+
+    name: str
+
+
+@router.get("/")
+async def list_workspaces() -> dict:
+    """
+    List every workspace on disk, the one this request is using, and the
+    loaded workspaces with their estimated memory.
+
+    Select a workspace per request with the X-Workspace header (or the
+    `workspace` query parameter, e.g. for WebSockets).
+    """
+    registry = get_workspaces()
+    return {
+        "current": current_workspace().name,
+        "workspaces": await registry.names(),
+        **registry.snapshot(),
+    }
+
+
+@router.post("/", status_code=201)
+async def create_workspace(request: WorkspaceCreateRequest) -> dict:
+    """Create an empty workspace."""
+    try:
+        workspace = await get_workspaces().create(request.name)
+    except WorkspaceError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileExistsError:
+        raise HTTPException(
+            status_code=409, detail=f"Workspace '{request.name}' already exists"
+        )
+    return workspace.snapshot()
@@ -1,50 +1,70 @@
 """Services package for WeightAshes."""
 
 from .file_manager import (
-    # Configuration
-    DATA_DIR,
-    CODEX_DIR,
-    MANUSCRIPT_DIR,
-    SESSIONS_DIR,
     # Helpers
     count_words,
     find_file_by_id,
+    scene_key,
+    # Change listeners
+    subscribe,
     # Codex functions
     list_codex_entries,
+    list_codex_payloads,
     get_codex_entry,
+    get_codex_entry_version,
     save_codex_entry,
     delete_codex_entry,
     # Manuscript functions
     get_manuscript_structure,
+    list_scene_paths,
     get_scene,
+    get_scene_version,
+    get_scene_content,
     save_scene,
+    delete_scene,
     get_chapter,
+    get_chapter_version,
     save_chapter,
 )
 
 from .ai_client import generate as ai_generate
+from .occurrence_matrix import get_occurrence_matrix
+from .listing_index import get_codex_listing, get_scene_listing
+from .progressions import get_progression_index
+from .relation_graph import get_relation_graph
 from .prompt_builder import build_chat_prompt, load_system_prompt
 
 __all__ = [
-    # Configuration
-    "DATA_DIR",
-    "CODEX_DIR",
-    "MANUSCRIPT_DIR",
-    "SESSIONS_DIR",
     # Helpers
     "count_words",
     "find_file_by_id",
+    "scene_key",
+    # Change listeners
+    "subscribe",
     # Codex
     "list_codex_entries",
+    "list_codex_payloads",
     "get_codex_entry",
+    "get_codex_entry_version",
     "save_codex_entry",
     "delete_codex_entry",
     # Manuscript
     "get_manuscript_structure",
+    "list_scene_paths",
     "get_scene",
+    "get_scene_version",
+    "get_scene_content",
     "save_scene",
+    "delete_scene",
     "get_chapter",
+    "get_chapter_version",
     "save_chapter",
+    # Indexes
+    "get_occurrence_matrix",
+    "get_relation_graph",
+    "get_progression_index",
+    "get_codex_listing",
+    "get_scene_listing",
     # AI
     "ai_generate",
     "build_chat_prompt",
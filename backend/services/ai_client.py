@@ -1,9 +1,14 @@
 """AI client service for interacting with LLM providers."""
 
-import os
-from typing import TypedDict
+import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator, TypedDict
 
-import anthropic
+from .cost_ledger import get_cost_ledger
+from .provider_router import get_router
+from .providers import ProviderError
+from .rate_limiter import INTERACTIVE, get_scheduler
+from .token_estimator import get_token_estimator
 
 
 class GenerateResult(TypedDict):
@@ -12,78 +17,183 @@ class GenerateResult(TypedDict):
     response: str
     input_tokens: int
     output_tokens: int
+    cached_tokens: int
+    cost: float | None
+    provider: str
+
+
+def _error_result(message: str) -> GenerateResult:
+    return {
+        "response": f"Error: {message}",
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cached_tokens": 0,
+        "cost": None,
+        "provider": "",
+    }
+
+
+def _error_message(error: ProviderError) -> str:
+    """User-facing message for a failed request."""
+    if error.rate_limited:
+        return (
+            "Rate limit exceeded after several retries. "
+            "Please wait a moment and try again."
+        )
+    if error.status_code is None and error.provider:
+        return (
+            "Could not connect to the AI provider. "
+            "Please check your internet connection."
+        )
+    return error.message
+
+
+async def _record_cost(
+    usage: dict, operation: str, scene_id: str | None
+) -> float | None:
+    return await get_cost_ledger().record(
+        model=usage["model"],
+        provider=usage["provider"],
+        operation=operation,
+        input_tokens=usage["input_tokens"],
+        output_tokens=usage["output_tokens"],
+        cached_tokens=usage.get("cached_tokens", 0),
+        scene_id=scene_id,
+    )
 
 
 async def generate(
     prompt: str,
     system: str,
     model: str = "claude-sonnet-4-20250514",
+    hedge: bool | None = None,
+    max_tokens: int = 4096,
+    priority: str = INTERACTIVE,
+    operation: str = "chat",
+    scene_id: str | None = None,
 ) -> GenerateResult:
     """
     Generate a response from the AI model.
 
+    The request waits for room in the model's rate-limit budget, is routed
+    to a provider that serves the model (failing over to other configured
+    providers if it is unhealthy) and is retried when rate limited.
+
     Args:
         prompt: The user message/prompt
         system: The system message
         model: The model to use (default: claude-sonnet-4-20250514)
+        hedge: Race a backup provider if the first is slow (default: env)
+        max_tokens: Output token cap
+        priority: "interactive" (default) or "batch"; batch work never
+            eats into the headroom reserved for interactive requests
+        operation: What the request is for, as tagged in the cost ledger
+        scene_id: Scene the request is about, for per-scene spend
 
     Returns:
-        Dict with response text and token counts
+        Dict with response text, token counts, cost (None if the model
+        has no listed price) and the serving provider
+    """
+    router = get_router()
+    estimator = get_token_estimator()
+    await estimator.ensure_loaded()
+    try:
+        result = await get_scheduler().run(
+            model,
+            lambda: router.generate(
+                prompt=prompt,
+                system=system,
+                model=model,
+                max_tokens=max_tokens,
+                hedge=hedge,
+            ),
+            input_tokens=estimator.estimate([system, prompt], model),
+            max_output_tokens=max_tokens,
+            priority=priority,
+        )
+    except ProviderError as e:
+        return _error_result(_error_message(e))
+    except Exception as e:
+        return _error_result(f"Unexpected error: {str(e)}")
+
+    # Calibrate under the requested model, the ID estimate() and the
+    # scheduler's budgets look up (the serving provider may name it
+    # differently, e.g. "anthropic/..." on OpenRouter)
+    await estimator.record(model, [system, prompt], result["input_tokens"])
+    cost = await _record_cost(result, operation, scene_id)
+
+    return {
+        "response": result["response"],
+        "input_tokens": result["input_tokens"],
+        "output_tokens": result["output_tokens"],
+        "cached_tokens": result.get("cached_tokens", 0),
+        "cost": cost,
+        "provider": result["provider"],
+    }
+
+
+async def generate_stream(
+    prompt: str,
+    system: str,
+    model: str = "claude-sonnet-4-20250514",
+    max_tokens: int = 4096,
+    priority: str = INTERACTIVE,
+    operation: str = "chat",
+    scene_id: str | None = None,
+) -> AsyncIterator[dict]:
     """
-    api_key = os.getenv("ANTHROPIC_API_KEY")
+    Stream a response from the AI model, with the same rate limiting,
+    routing, calibration and cost tracking as generate().
 
-    if not api_key:
-        return {
-            "response": "Error: ANTHROPIC_API_KEY not configured. Please add it to your .env file.",
-            "input_tokens": 0,
-            "output_tokens": 0,
-        }
+    A stream abandoned part way (closed or cancelled by the caller) stops
+    the provider's generation; what it already produced is still billed,
+    so it is recorded with token counts estimated from the text so far.
 
+    Yields:
+        {"type": "text", "text"} for each chunk, then either
+        {"type": "done", input_tokens, output_tokens, cached_tokens, cost,
+        provider, model} or {"type": "error", "message"} (possibly after
+        some text)
+    """
+    router = get_router()
+    estimator = get_token_estimator()
+    await estimator.ensure_loaded()
+    input_tokens = estimator.estimate([system, prompt], model)
+    chunks: list[str] = []
+    finished = False
     try:
-        client = anthropic.Anthropic(api_key=api_key)
-
-        message = client.messages.create(
-            model=model,
-            max_tokens=4096,
-            system=system,
-            messages=[
-                {"role": "user", "content": prompt},
-            ],
+        events = get_scheduler().stream(
+            model,
+            lambda: router.stream(
+                prompt=prompt, system=system, model=model, max_tokens=max_tokens
+            ),
+            input_tokens=input_tokens,
+            max_output_tokens=max_tokens,
+            priority=priority,
         )
-
-        # Extract text from response
-        response_text = ""
-        for block in message.content:
-            if hasattr(block, "text"):
-                response_text += block.text
-
-        return {
-            "response": response_text,
-            "input_tokens": message.usage.input_tokens,
-            "output_tokens": message.usage.output_tokens,
-        }
-
-    except anthropic.APIConnectionError:
-        return {
-            "response": "Error: Could not connect to Anthropic API. Please check your internet connection.",
-            "input_tokens": 0,
-            "output_tokens": 0,
-        }
-    except anthropic.RateLimitError:
-        return {
-            "response": "Error: Rate limit exceeded. Please wait a moment and try again.",
-            "input_tokens": 0,
-            "output_tokens": 0,
-        }
-    except anthropic.APIStatusError as e:
-        return {
-            "response": f"Error: API error ({e.status_code}): {e.message}",
-            "input_tokens": 0,
-            "output_tokens": 0,
-        }
+        # Closed with this generator, so the provider stops promptly
+        async with aclosing(events):
+            async for event in events:
+                if "text" in event:
+                    chunks.append(event["text"])
+                    yield {"type": "text", "text": event["text"]}
+                    continue
+                finished = True
+                await estimator.record(model, [system, prompt], event["input_tokens"])
+                cost = await _record_cost(event, operation, scene_id)
+                yield {"type": "done", **event, "cost": cost}
+    except ProviderError as e:
+        yield {"type": "error", "message": _error_message(e)}
     except Exception as e:
-        return {
-            "response": f"Error: Unexpected error: {str(e)}",
-            "input_tokens": 0,
-            "output_tokens": 0,
-        }
+        yield {"type": "error", "message": f"Unexpected error: {str(e)}"}
+    except (GeneratorExit, asyncio.CancelledError):
+        if chunks and not finished:
+            usage = {
+                "model": model,
+                "provider": "",
+                "input_tokens": input_tokens,
+                "output_tokens": sum(estimator.count(chunks, model)),
+            }
+            # The caller may be cancelled again while this is recorded
+            await asyncio.shield(_record_cost(usage, operation, scene_id))
+        raise
@@ -0,0 +1,260 @@
+"""Cache of assembled context blocks, invalidated by what they depend on."""
+
+from collections import OrderedDict
+from typing import Hashable
+
+from models import CodexEntryWithDescription
+
+from .file_manager import scene_key, subscribe
+from .progressions import ManuscriptPositions, Position, get_progression_index
+from .workspace import current_workspace
+
+# Blocks kept per workspace, least recently used dropped first
+MAX_BLOCKS = 256
+# Passage searches remembered per block (identical messages, retries)
+MAX_PASSAGE_QUERIES = 8
+
+
+class ContextBlock:
+    """
+    The codex part of an assembled context and what it was built from.
+
+    `entries` are the loaded entries with descriptions resolved as of the
+    scene. A block depends on the codex entries it requested or reached
+    through relations (`depends_on`), and on the reading-order positions
+    of its scene and of the scenes its entries' progressions are anchored
+    at (`anchors`). Passage searches are remembered separately: they
+    depend on the prose before the scene, which changes more often.
+    """
+
+    __slots__ = (
+        "entries",
+        "depends_on",
+        "expanded",
+        "scene",
+        "scene_key",
+        "anchors",
+        "passages",
+    )
+
+    def __init__(
+        self,
+        entries: list[CodexEntryWithDescription],
+        depends_on: frozenset[str],
+        expanded: bool,
+        scene: str | None,
+        scene_key: str | None,
+        anchors: dict[str, Position | None],
+    ):
+        self.entries = entries
+        self.depends_on = depends_on
+        # Built with relation expansion, so new relations can change it
+        self.expanded = expanded
+        # The scene as requested (key or bare ID) and the key it resolved to
+        self.scene = scene
+        self.scene_key = scene_key
+        self.anchors = anchors
+        # (query, limit) -> passages, most recent last
+        self.passages: OrderedDict[tuple[str, int], list[dict]] = OrderedDict()
+
+    def positions_valid(self, manuscript: ManuscriptPositions) -> bool:
+        """Whether the scene and anchor positions are as when built."""
+        if self.scene and manuscript.resolve_key(self.scene) != self.scene_key:
+            return False
+        return all(
+            manuscript.positions.get(key) == position
+            for key, position in self.anchors.items()
+        )
+
+
+class ContextCache:
+    """
+    Assembled context blocks per (operation, scene, request parameters).
+
+    Saving or deleting a codex entry drops only the blocks that depend on
+    it (or, for blocks built with relation expansion, that it now relates
+    to); moved scenes are caught on lookup by comparing the positions a
+    block recorded. Saving prose only forgets passage searches of blocks
+    whose scene comes after it. Generation counters keep a block (or a
+    passage search) from being stored if something it read changed while
+    it was being assembled.
+    """
+
+    def __init__(self):
+        self.blocks: OrderedDict[Hashable, ContextBlock] = OrderedDict()
+        # Entry ID -> keys of blocks depending on it
+        self.by_entry: dict[str, set[Hashable]] = {}
+        # Bumped on codex and on prose invalidations respectively
+        self.generation = 0
+        self.prose_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.passage_hits = 0
+        self.passage_misses = 0
+
+    def get(
+        self, key: Hashable, manuscript: ManuscriptPositions | None = None
+    ) -> ContextBlock | None:
+        """
+        The cached block for `key`, or None (a miss). Pass the manuscript
+        positions when the block was built for a scene.
+        """
+        block = self.blocks.get(key)
+        if block is not None and manuscript is not None:
+            if not block.positions_valid(manuscript):
+                self._drop(key)
+                self.invalidations += 1
+                block = None
+        if block is None:
+            self.misses += 1
+            return None
+        self.blocks.move_to_end(key)
+        self.hits += 1
+        return block
+
+    def put(self, key: Hashable, block: ContextBlock, generation: int) -> None:
+        """
+        Store a block assembled starting at `generation`; skipped if
+        anything was invalidated since, as the block may be stale.
+        """
+        if generation != self.generation:
+            return
+        self._drop(key)
+        self.blocks[key] = block
+        for entry_id in block.depends_on:
+            self.by_entry.setdefault(entry_id, set()).add(key)
+        while len(self.blocks) > MAX_BLOCKS:
+            self._drop(next(iter(self.blocks)))
+
+    def _drop(self, key: Hashable) -> None:
+        block = self.blocks.pop(key, None)
+        if block is None:
+            return
+        for entry_id in block.depends_on:
+            keys = self.by_entry.get(entry_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_entry[entry_id]
+
+    def entry_changed(self, entry_id: str, targets: set[str] = frozenset()) -> None:
+        """
+        Drop blocks depending on a saved or deleted entry, and expanded
+        blocks depending on any entry it now relates to.
+        """
+        self.generation += 1
+        stale = set(self.by_entry.get(entry_id, ()))
+        for target in targets:
+            stale.update(
+                key
+                for key in self.by_entry.get(target, ())
+                if self.blocks[key].expanded
+            )
+        for key in stale:
+            self._drop(key)
+        self.invalidations += len(stale)
+
+    def prose_changed(self, key: str, manuscript: ManuscriptPositions) -> None:
+        """
+        Forget passage searches that could have retrieved from the scene
+        `key`: those of blocks without a scene or whose scene comes after
+        it (all of them if its position is unknown, e.g. once deleted).
+        """
+        self.prose_generation += 1
+        position = manuscript.positions.get(key)
+        for block in self.blocks.values():
+            if not block.passages or block.scene_key == key:
+                continue
+            current = manuscript.positions.get(block.scene_key or "")
+            if position is None or current is None or position < current:
+                block.passages.clear()
+
+    def order_changed(self) -> None:
+        """Forget every passage search (which scenes come first changed)."""
+        self.prose_generation += 1
+        for block in self.blocks.values():
+            block.passages.clear()
+
+    def get_passages(
+        self, block: ContextBlock, query: str, limit: int
+    ) -> list[dict] | None:
+        passages = block.passages.get((query, limit))
+        if passages is None:
+            self.passage_misses += 1
+            return None
+        block.passages.move_to_end((query, limit))
+        self.passage_hits += 1
+        return passages
+
+    def put_passages(
+        self,
+        block: ContextBlock,
+        query: str,
+        limit: int,
+        passages: list[dict],
+        generation: int,
+    ) -> None:
+        """Remember a search that started at prose `generation`."""
+        if generation != self.prose_generation:
+            return
+        block.passages[(query, limit)] = passages
+        while len(block.passages) > MAX_PASSAGE_QUERIES:
+            block.passages.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        searches = self.passage_hits + self.passage_misses
+        return {
+            "blocks": len(self.blocks),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+            "passageHits": self.passage_hits,
+            "passageMisses": self.passage_misses,
+            "passageHitRate": (
+                round(self.passage_hits / searches, 3) if searches else None
+            ),
+        }
+
+
+def get_context_cache() -> ContextCache:
+    """Return the current workspace's assembled-context cache."""
+    return current_workspace().service("context_cache", ContextCache)
+
+
+async def _on_codex_saved(entry, description) -> None:
+    targets = {relation.target for relation in entry.relations}
+    get_context_cache().entry_changed(entry.id, targets)
+
+
+async def _on_codex_deleted(entry_id) -> None:
+    get_context_cache().entry_changed(entry_id)
+
+
+async def _on_scene_saved(book_id, act_id, chapter_id, scene, content) -> None:
+    cache = get_context_cache()
+    if cache.blocks:
+        manuscript = get_progression_index().manuscript
+        key = scene_key(book_id, act_id, chapter_id, scene.id)
+        cache.prose_changed(key, manuscript)
+
+
+async def _on_scene_deleted(book_id, act_id, chapter_id, scene_id) -> None:
+    cache = get_context_cache()
+    if cache.blocks:
+        manuscript = get_progression_index().manuscript
+        key = scene_key(book_id, act_id, chapter_id, scene_id)
+        cache.prose_changed(key, manuscript)
+
+
+async def _on_chapter_saved(book_id, act_id, chapter) -> None:
+    get_context_cache().order_changed()
+
+
+subscribe("codex_saved", _on_codex_saved)
+subscribe("codex_deleted", _on_codex_deleted)
+subscribe("scene_saved", _on_scene_saved)
+subscribe("scene_deleted", _on_scene_deleted)
+subscribe("chapter_saved", _on_chapter_saved)
@@ -0,0 +1,215 @@
+"""Context assembly for AI requests."""
+
+import time
+from typing import TypedDict
+
+from models import CodexEntryWithDescription
+
+from .context_cache import ContextBlock, get_context_cache
+from .file_manager import get_codex_entry
+from .metrics import get_metrics
+from .passage_index import get_passage_index
+from .progressions import get_progression_index
+from .prompt_builder import build_chat_prompt, load_system_prompt
+from .relation_graph import get_relation_graph
+
+# Upper bounds on relation expansion, whatever the request asks for
+MAX_RELATION_HOPS = 3
+MAX_RELATED_ENTRIES = 20
+# Upper bound on earlier passages retrieved into a prompt
+MAX_PASSAGES = 20
+
+
+class AssembledContext(TypedDict):
+    """Result from assemble_chat_context."""
+
+    prompt: str
+    system: str
+    entry_ids: list[str]
+    passages: list[dict]
+
+
+async def expand_related(
+    entry_ids: list[str],
+    hops: int,
+    limit: int,
+    types: set[str] | None = None,
+) -> list[str]:
+    """
+    Entries within `hops` relations of the given ones, closest first,
+    capped at `limit` entries.
+    """
+    if hops <= 0 or limit <= 0 or not entry_ids:
+        return []
+    graph = get_relation_graph()
+    await graph.ensure_built()
+    related = graph.expand(
+        entry_ids,
+        hops=min(hops, MAX_RELATION_HOPS),
+        limit=min(limit, MAX_RELATED_ENTRIES),
+        types=types,
+    )
+    return [entry_id for entry_id, _ in related]
+
+
+async def apply_progressions(
+    entries: list[CodexEntryWithDescription], scene: str
+) -> list[CodexEntryWithDescription]:
+    """
+    Swap in each entry's description as of `scene` (a scene key, or a
+    bare scene ID if unambiguous), so later developments don't leak in.
+    """
+    index = get_progression_index()
+    await index.ensure_built()
+    resolved = []
+    for entry in entries:
+        description = index.resolve(entry.id, scene)
+        if description is not None:
+            entry = entry.model_copy(update={"description": description})
+        resolved.append(entry)
+    return resolved
+
+
+async def find_passages(
+    query: str, limit: int, scene: str | None = None
+) -> list[dict]:
+    """
+    Prose paragraphs most relevant to `query`, best first. Given a scene
+    (key or unambiguous bare ID), only paragraphs from scenes before it
+    in reading order are considered, so nothing later leaks in; a scene
+    that can't be resolved (unknown, ambiguous or not yet indexed) finds
+    nothing rather than searching the whole manuscript.
+    """
+    if limit <= 0:
+        return []
+    index = get_passage_index()
+    await index.ensure_built()
+
+    allow = None
+    if scene:
+        progressions = get_progression_index()
+        await progressions.ensure_built()
+        positions = progressions.manuscript.positions
+        key = progressions.manuscript.resolve_key(scene)
+        if key is None:
+            return []
+        current = positions[key]
+
+        def allow_before(other: str) -> bool:
+            position = positions.get(other)
+            return position is not None and position < current
+
+        allow = allow_before
+
+    return index.search(query, min(limit, MAX_PASSAGES), allow)
+
+
+async def _codex_block(
+    operation: str,
+    entry_ids: list[str],
+    scene_id: str | None,
+    relation_hops: int,
+    relation_limit: int,
+) -> ContextBlock:
+    """
+    The codex entries for a request, from the context cache when nothing
+    they depend on has changed since they were last assembled.
+    """
+    cache = get_context_cache()
+    manuscript = None
+    if scene_id:
+        progressions = get_progression_index()
+        await progressions.ensure_built()
+        manuscript = progressions.manuscript
+    key = (operation, scene_id, tuple(entry_ids), relation_hops, relation_limit)
+    block = cache.get(key, manuscript)
+    if block is not None:
+        return block
+
+    generation = cache.generation
+    related = await expand_related(entry_ids, relation_hops, relation_limit)
+    entries: list[CodexEntryWithDescription] = []
+    for entry_id in [*entry_ids, *related]:
+        entry = await get_codex_entry(entry_id)
+        if entry:
+            entries.append(entry)
+
+    scene = None
+    anchors = {}
+    if scene_id:
+        entries = await apply_progressions(entries, scene_id)
+        scene = manuscript.resolve_key(scene_id)
+        anchored = [scene] if scene else []
+        for entry in entries:
+            anchored += [p.scene for p in entry.progressions]
+        anchors = {key: manuscript.positions.get(key) for key in anchored}
+
+    block = ContextBlock(
+        entries,
+        depends_on=frozenset([*entry_ids, *related]),
+        expanded=relation_hops > 0,
+        scene=scene_id,
+        scene_key=scene,
+        anchors=anchors,
+    )
+    cache.put(key, block, generation)
+    return block
+
+
+async def assemble_chat_context(
+    message: str,
+    context_entries: list[str],
+    scene_id: str | None = None,
+    relation_hops: int = 0,
+    relation_limit: int = 5,
+    passage_limit: int = 0,
+) -> AssembledContext:
+    """
+    Assemble the prompt for a chat request.
+
+    The codex part is cached per scene and request parameters, so
+    consecutive messages in a scene skip loading and resolving entries
+    until one of them changes (see context_cache).
+
+    Args:
+        message: The user's message
+        context_entries: Codex entry IDs selected for context
+        scene_id: Current scene; codex descriptions are resolved as of it
+        relation_hops: Also include entries this many relations away
+        relation_limit: Maximum number of related entries to add
+        passage_limit: Earlier prose paragraphs to retrieve for the
+            message and the selected entries' names
+
+    Returns:
+        Dict with prompt, system prompt, the codex entry IDs used and the
+        retrieved passages
+    """
+    started = time.perf_counter()
+    block = await _codex_block(
+        "chat",
+        list(dict.fromkeys(context_entries)),
+        scene_id,
+        relation_hops,
+        relation_limit,
+    )
+    codex_entries = block.entries
+
+    passages: list[dict] = []
+    if passage_limit > 0:
+        cache = get_context_cache()
+        query = " ".join([message, *(entry.name for entry in codex_entries)])
+        cached = cache.get_passages(block, query, passage_limit)
+        if cached is None:
+            generation = cache.prose_generation
+            passages = await find_passages(query, passage_limit, scene_id)
+            cache.put_passages(block, query, passage_limit, passages, generation)
+        else:
+            passages = cached
+
+    get_metrics().observe("context_assembly", time.perf_counter() - started)
+    return {
+        "prompt": build_chat_prompt(message, codex_entries, passages),
+        "system": load_system_prompt(),
+        "entry_ids": [entry.id for entry in codex_entries],
+        "passages": passages,
+    }
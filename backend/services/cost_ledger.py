@@ -0,0 +1,289 @@
+"""Ledger of AI requests with token counts, cost and spend rollups."""
+
+import asyncio
+import heapq
+import time
+from datetime import date, timedelta
+
+import orjson
+
+from . import event_log, fs
+from .file_manager import sessions_dir
+from .progressions import get_progression_index
+from .workspace import current_workspace
+
+LEDGER_FILENAME = "ai_ledger.jsonl"
+SPEND_FILENAME = "ai_spend.json"
+# Bump when the rollup layout changes; old snapshots are rebuilt from the log
+SPEND_VERSION = 1
+# Requests recorded between rollup snapshots
+SNAPSHOT_EVERY = 50
+
+# USD per million tokens: (input, cached input, output). Matched by the
+# longest prefix of the model ID, without any vendor prefix
+PRICING: dict[str, tuple[float, float, float]] = {
+    "claude-opus-4-5": (5.0, 0.5, 25.0),
+    "claude-opus-4": (15.0, 1.5, 75.0),
+    "claude-sonnet-4": (3.0, 0.3, 15.0),
+    "claude-3-7-sonnet": (3.0, 0.3, 15.0),
+    "claude-3-5-sonnet": (3.0, 0.3, 15.0),
+    "claude-haiku-4": (1.0, 0.1, 5.0),
+    "claude-3-5-haiku": (0.8, 0.08, 4.0),
+    "gpt-4.1-nano": (0.1, 0.025, 0.4),
+    "gpt-4.1-mini": (0.4, 0.1, 1.6),
+    "gpt-4.1": (2.0, 0.5, 8.0),
+    "gpt-4o-mini": (0.15, 0.075, 0.6),
+    "gpt-4o": (2.5, 1.25, 10.0),
+    "o4-mini": (1.1, 0.275, 4.4),
+    "o3": (2.0, 0.5, 8.0),
+}
+
+_EVENT_FIELDS = frozenset(
+    {"ts", "model", "operation", "scene", "input", "output", "cached", "cost"}
+)
+
+# Rollup cells are [requests, input tokens, output tokens, cached tokens, USD]
+Cell = list[int | float]
+
+
+def price_for(model: str) -> tuple[float, float, float] | None:
+    """Per-million-token prices for a model, or None if it isn't listed."""
+    name = model.rsplit("/", 1)[-1]
+    matches = [prefix for prefix in PRICING if name.startswith(prefix)]
+    return PRICING[max(matches, key=len)] if matches else None
+
+
+def request_cost(
+    model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0
+) -> float | None:
+    """
+    USD cost of one request, or None if the model has no listed price.
+    Cached tokens are the part of the input read from the prompt cache.
+    """
+    price = price_for(model)
+    if price is None:
+        return None
+    input_price, cached_price, output_price = price
+    cached = min(cached_tokens, input_tokens)
+    return (
+        (input_tokens - cached) * input_price
+        + cached * cached_price
+        + output_tokens * output_price
+    ) / 1_000_000
+
+
+def _add(table: dict[str, Cell], key: str, event: dict) -> None:
+    cell = table.get(key)
+    if cell is None:
+        cell = table[key] = [0, 0, 0, 0, 0.0]
+    cell[0] += 1
+    cell[1] += event["input"]
+    cell[2] += event["output"]
+    cell[3] += event["cached"]
+    cell[4] += event["cost"] or 0.0
+
+
+def _cell_dict(cell: Cell | None) -> dict:
+    requests, input_tokens, output_tokens, cached, cost = cell or (0, 0, 0, 0, 0.0)
+    return {
+        "requests": requests,
+        "inputTokens": input_tokens,
+        "outputTokens": output_tokens,
+        "cachedTokens": cached,
+        "cost": round(cost, 4),
+    }
+
+
+class CostLedger:
+    """
+    Every AI request's token counts and cost, with running totals.
+
+    Each request is appended to a JSONL ledger tagged with its model,
+    provider, operation and scene, and folded into per-day, per-scene,
+    per-chapter, per-model and per-operation rollups as it is recorded,
+    so spend reports read the rollups and never replay the ledger. Cost
+    is priced when the request is made; later price changes don't
+    rewrite history.
+    """
+
+    def __init__(self):
+        self.total: Cell = [0, 0, 0, 0, 0.0]
+        self.daily: dict[str, Cell] = {}
+        self.scenes: dict[str, Cell] = {}
+        self.chapters: dict[str, Cell] = {}
+        self.models: dict[str, Cell] = {}
+        self.operations: dict[str, Cell] = {}
+        # Models requests were made with that have no listed price
+        self.unpriced: set[str] = set()
+        self.offset = 0
+        self.pending = 0
+        self.built = False
+        self._lock = asyncio.Lock()
+
+    async def ensure_built(self) -> None:
+        async with self._lock:
+            if self.built:
+                return
+            snapshot, events, offset = await fs.run(
+                event_log.load,
+                sessions_dir() / LEDGER_FILENAME,
+                sessions_dir() / SPEND_FILENAME,
+                SPEND_VERSION,
+                _EVENT_FIELDS,
+            )
+            if snapshot is not None:
+                self._restore(snapshot)
+            for event in events:
+                self._apply(event)
+            self.offset = offset
+            self.pending = len(events)
+            self.built = True
+
+    def _restore(self, snapshot: dict) -> None:
+        self.total = snapshot["total"]
+        self.daily = snapshot["daily"]
+        self.scenes = snapshot["scenes"]
+        self.chapters = snapshot["chapters"]
+        self.models = snapshot["models"]
+        self.operations = snapshot["operations"]
+        self.unpriced = set(snapshot["unpriced"])
+
+    def _apply(self, event: dict) -> None:
+        """Fold one request into the rollups."""
+        self.total[0] += 1
+        for i, field in enumerate(("input", "output", "cached"), start=1):
+            self.total[i] += event[field]
+        self.total[4] += event["cost"] or 0.0
+
+        day = date.fromtimestamp(event["ts"]).isoformat()
+        _add(self.daily, day, event)
+        _add(self.models, event["model"], event)
+        _add(self.operations, event["operation"], event)
+        scene = event["scene"]
+        if scene:
+            _add(self.scenes, scene, event)
+            # Full scene keys (book/act/chapter/scene) roll up by chapter
+            if scene.count("/") == 3:
+                _add(self.chapters, scene.rsplit("/", 1)[0], event)
+        if event["cost"] is None:
+            self.unpriced.add(event["model"])
+
+    async def record(
+        self,
+        model: str,
+        provider: str,
+        operation: str,
+        input_tokens: int,
+        output_tokens: int,
+        cached_tokens: int = 0,
+        scene_id: str | None = None,
+    ) -> float | None:
+        """
+        Log a completed request and return its cost.
+
+        Args:
+            model: Model that served the request
+            provider: Provider that served it
+            operation: What the request was for ("chat", "extract", ...)
+            input_tokens: Prompt tokens, including cached ones
+            output_tokens: Generated tokens
+            cached_tokens: Prompt tokens read from the provider's cache
+            scene_id: Scene the request was about; a bare scene ID is
+                resolved to its full key when unambiguous
+
+        Returns:
+            Cost in USD, or None if the model has no listed price
+        """
+        scene = await _resolve_scene(scene_id) if scene_id else None
+        cost = request_cost(model, input_tokens, output_tokens, cached_tokens)
+        event = {
+            "ts": round(time.time(), 3),
+            "model": model,
+            "provider": provider,
+            "operation": operation,
+            "scene": scene,
+            "input": input_tokens,
+            "output": output_tokens,
+            "cached": cached_tokens,
+            "cost": round(cost, 8) if cost is not None else None,
+        }
+        await self.ensure_built()
+        async with self._lock:
+            written = await fs.run(
+                event_log.append, sessions_dir() / LEDGER_FILENAME, event
+            )
+            self._apply(event)
+            self.offset += written
+            self.pending += 1
+            if self.pending >= SNAPSHOT_EVERY:
+                await self._snapshot()
+        return cost
+
+    async def flush(self) -> None:
+        """Snapshot the rollups if requests were recorded since the last one."""
+        async with self._lock:
+            if self.built and self.pending:
+                await self._snapshot()
+
+    async def close(self) -> None:
+        """Flush before shutdown or workspace eviction."""
+        await self.flush()
+
+    async def _snapshot(self) -> None:
+        data = orjson.dumps(
+            {
+                "version": SPEND_VERSION,
+                "offset": self.offset,
+                "total": self.total,
+                "daily": self.daily,
+                "scenes": self.scenes,
+                "chapters": self.chapters,
+                "models": self.models,
+                "operations": self.operations,
+                "unpriced": sorted(self.unpriced),
+            }
+        )
+        await fs.run(event_log.write_snapshot, sessions_dir() / SPEND_FILENAME, data)
+        self.pending = 0
+
+    def report(
+        self, days: int = 30, limit: int = 20, today: date | None = None
+    ) -> dict:
+        """
+        Spend totals, the last `days` days, and the costliest models,
+        operations, chapters and (up to `limit`) scenes.
+        """
+        today = today or date.today()
+        window = []
+        for back in range(days - 1, -1, -1):
+            day = (today - timedelta(days=back)).isoformat()
+            window.append({"date": day, **_cell_dict(self.daily.get(day))})
+
+        def ranked(table: dict[str, Cell], name: str, n: int | None = None):
+            top = (
+                heapq.nlargest(n, table.items(), key=lambda item: item[1][4])
+                if n is not None
+                else sorted(table.items(), key=lambda item: -item[1][4])
+            )
+            return [{name: key, **_cell_dict(cell)} for key, cell in top]
+
+        return {
+            "total": _cell_dict(self.total),
+            "days": window,
+            "models": ranked(self.models, "model"),
+            "operations": ranked(self.operations, "operation"),
+            "chapters": ranked(self.chapters, "chapter", limit),
+            "scenes": ranked(self.scenes, "scene", limit),
+            "unpricedModels": sorted(self.unpriced),
+        }
+
+
+async def _resolve_scene(scene_id: str) -> str:
+    index = get_progression_index()
+    await index.ensure_built()
+    return index.manuscript.resolve_key(scene_id) or scene_id
+
+
+def get_cost_ledger() -> CostLedger:
+    """Return the current workspace's AI cost ledger."""
+    return current_workspace().service("cost_ledger", CostLedger)
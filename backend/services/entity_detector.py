@@ -0,0 +1,123 @@
+"""Detection of codex entry names and aliases in text."""
+
+import re
+
+from models import CodexEntry
+
+# Contractions that make a capitalised word something else entirely:
+# "Don't" must not match an entry named "Don", but "Don's" should.
+_CONTRACTION = r"['’](?:t|ll|re|ve|d|m)\b"
+
+
+def entry_terms(entry: CodexEntry) -> tuple[str, ...]:
+    """The names an entry can be mentioned by, longest first, deduplicated."""
+    terms = {t.strip() for t in [entry.name, *entry.aliases] if t.strip()}
+    return tuple(sorted(terms, key=lambda term: (-len(term), term.lower())))
+
+
+def _trie_pattern(terms: tuple[str, ...]) -> str:
+    """
+    Regex source matching any of the terms, shaped as a prefix trie.
+
+    A flat alternation makes the regex engine try every term at every
+    position, which gets slow with thousands of names; the trie branches
+    on one character at a time. Optional tails are greedy, so the longest
+    term that also satisfies the boundary checks still wins.
+    """
+    root: dict = {}
+    for term in terms:
+        node = root
+        for char in term.lower():
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        ends_here = "" in node
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if ends_here:
+            return f"(?:{body})?"
+        return body
+
+    return build(root)
+
+
+def compile_terms(terms: tuple[str, ...]) -> re.Pattern | None:
+    """
+    Compile a case-insensitive, word-boundary aware pattern for the terms.
+    Longer terms win, so "Lieutenant Merrill" beats "Merrill".
+    """
+    if not terms:
+        return None
+    return re.compile(
+        rf"(?<!\w)(?:{_trie_pattern(terms)})(?!\w)(?!{_CONTRACTION})",
+        re.IGNORECASE,
+    )
+
+
+def count_mentions(pattern: re.Pattern | None, text: str) -> tuple[int, int]:
+    """
+    Count matches of an entry pattern in text.
+
+    Returns:
+        Tuple of (mention count, character offset of the first mention),
+        with offset -1 when there are no mentions
+    """
+    if pattern is None:
+        return 0, -1
+    count = 0
+    first = -1
+    for match in pattern.finditer(text):
+        if count == 0:
+            first = match.start()
+        count += 1
+    return count, first
+
+
+class EntityMatcher:
+    """
+    A single combined pattern over the terms of many entries, so a text can
+    be scanned for every entry in one pass.
+    """
+
+    def __init__(self, terms_by_entry: dict[str, tuple[str, ...]]):
+        self.entries_by_term: dict[str, list[str]] = {}
+        for entry_id, terms in terms_by_entry.items():
+            for term in terms:
+                self.entries_by_term.setdefault(term.lower(), []).append(entry_id)
+        self.pattern = compile_terms(
+            tuple(sorted(self.entries_by_term, key=lambda t: (-len(t), t)))
+        )
+
+    def scan(self, text: str) -> dict[str, tuple[int, int]]:
+        """
+        Scan text for every entry at once.
+
+        Returns:
+            Dict of entry_id -> (mention count, first mention offset)
+        """
+        found: dict[str, tuple[int, int]] = {}
+        if self.pattern is None:
+            return found
+        for match in self.pattern.finditer(text):
+            for entry_id in self.entries_by_term.get(match.group(0).lower(), []):
+                count, first = found.get(entry_id, (0, match.start()))
+                found[entry_id] = (count + 1, first)
+        return found
+
+    def spans(self, text: str) -> list[tuple[int, int, list[str]]]:
+        """Every mention as (start, end, entry_ids), in text order."""
+        if self.pattern is None:
+            return []
+        spans = []
+        for match in self.pattern.finditer(text):
+            entry_ids = self.entries_by_term.get(match.group(0).lower())
+            if entry_ids:
+                spans.append((match.start(), match.end(), entry_ids))
+        return spans
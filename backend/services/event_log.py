@@ -0,0 +1,76 @@
+"""
+Append-only JSONL event logs with snapshotted rollups.
+
+A service folds each event into in-memory rollups as it is appended,
+and periodically snapshots the rollups together with the log offset
+they cover. Loading restores the snapshot and replays only the log tail
+after that offset. These helpers block; run them in the filesystem pool.
+"""
+
+import json
+import os
+from pathlib import Path
+
+
+def load(
+    log_path: Path, snapshot_path: Path, version: int, fields: frozenset[str]
+) -> tuple[dict | None, list[dict], int]:
+    """
+    Read a rollup snapshot and the log events after it.
+
+    Args:
+        log_path: The JSONL event log
+        snapshot_path: The JSON rollup snapshot (with "version", "offset")
+        version: Snapshot layout version; other versions are ignored
+        fields: Keys every event must have; other lines are skipped
+
+    Returns:
+        (snapshot or None, events to replay, log offset after them). If
+        the log is shorter than the snapshot's offset (it was truncated or
+        replaced), the snapshot is ignored and the whole log replayed.
+    """
+    try:
+        snapshot = json.loads(snapshot_path.read_bytes())
+    except (FileNotFoundError, json.JSONDecodeError):
+        snapshot = None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != version:
+        snapshot = None
+    offset = snapshot["offset"] if snapshot else 0
+
+    try:
+        with log_path.open("rb") as f:
+            if os.fstat(f.fileno()).st_size < offset:
+                snapshot, offset = None, 0
+            f.seek(offset)
+            tail = f.read()
+    except FileNotFoundError:
+        return None, [], 0
+
+    # A torn last line (crash mid-append) is left for the next load
+    complete = tail[: tail.rfind(b"\n") + 1]
+    events = []
+    for line in complete.splitlines():
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(event, dict) and fields <= event.keys():
+            events.append(event)
+    return snapshot, events, offset + len(complete)
+
+
+def append(log_path: Path, event: dict) -> int:
+    """Append one event to the log. Return the bytes written."""
+    line = (json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8")
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with log_path.open("ab") as f:
+        f.write(line)
+    return len(line)
+
+
+def write_snapshot(snapshot_path: Path, data: bytes) -> None:
+    """Replace the snapshot atomically, so a crash never leaves half of one."""
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = snapshot_path.with_suffix(".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, snapshot_path)
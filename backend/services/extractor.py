@@ -0,0 +1,559 @@
+"""Streaming extraction of codex entries from AI output."""
+
+import asyncio
+import json
+import re
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+
+from models import CodexEntry, CodexType
+
+from .ai_client import generate_stream
+from .entity_detector import EntityMatcher, entry_terms
+from .file_manager import (
+    get_codex_entry_version,
+    list_codex_entries,
+    save_codex_entry,
+    subscribe,
+)
+from .locks import codex_resource, get_lock_manager
+from .prompt_builder import load_system_prompt, load_template
+from .workspace import current_workspace
+
+# Candidate statuses
+NEW = "new"
+DUPLICATE = "duplicate"  # matches an existing entry's name or alias
+INVALID = "invalid"
+CREATED = "created"
+
+# Batch statuses
+STREAMING = "streaming"
+READY = "ready"
+FAILED = "failed"
+COMMITTED = "committed"
+
+# Staged batches kept for review (oldest dropped first)
+MAX_BATCHES = 50
+# Known entries listed in the prompt so the model skips them
+MAX_KNOWN_ENTRIES = 100
+
+_NON_SLUG = re.compile(r"[^a-z0-9]+")
+
+
+class ExtractionError(ValueError):
+    """A batch can't be committed in its current state."""
+
+
+def normalize_name(name: str) -> str:
+    """Comparison key for names: case- and whitespace-insensitive."""
+    return " ".join(name.casefold().split()).strip(".,;:!?\"'")
+
+
+def slugify(name: str) -> str:
+    return _NON_SLUG.sub("-", name.lower()).strip("-") or str(uuid.uuid4())[:8]
+
+
+# ============================================================================
+# Incremental parsing
+# ============================================================================
+
+
+class EntryStreamParser:
+    """
+    Pull JSON objects out of streamed model output as soon as each one
+    closes.
+
+    Only brace depth and string state are tracked between chunks, so
+    JSON Lines, a pretty-printed array or objects wrapped in code fences
+    and chatter all parse the same way. Text outside top-level objects is
+    ignored.
+    """
+
+    def __init__(self):
+        self._current: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.errors = 0
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Consume a chunk; return the objects it completed."""
+        found = []
+        start = 0 if self._depth else None
+        for i, char in enumerate(chunk):
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    start = i
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._current.append(chunk[start : i + 1])
+                    obj = self._parse("".join(self._current))
+                    if obj is not None:
+                        found.append(obj)
+                    self._current = []
+                    start = None
+        if self._depth:
+            self._current.append(chunk[start:])
+        return found
+
+    def close(self) -> None:
+        """End of stream: an unfinished object counts as an error."""
+        if self._depth:
+            self.errors += 1
+        self._current = []
+        self._depth = 0
+        self._in_string = self._escaped = False
+
+    def _parse(self, text: str) -> dict | None:
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError:
+            self.errors += 1
+            return None
+        return obj if isinstance(obj, dict) else None
+
+
+# ============================================================================
+# Name lookup
+# ============================================================================
+
+
+class CodexNameIndex:
+    """
+    Normalized entry names and aliases -> entry IDs, kept current through
+    codex change events, so candidates are checked without touching disk.
+    """
+
+    def __init__(self):
+        self.entries_by_name: dict[str, set[str]] = {}
+        self.terms: dict[str, tuple[str, ...]] = {}
+        self.names: dict[str, str] = {}
+        self.built = False
+        self._matcher: EntityMatcher | None = None
+        self._lock = asyncio.Lock()
+
+    async def ensure_built(self) -> None:
+        async with self._lock:
+            if self.built:
+                return
+            for entry in await list_codex_entries():
+                self.set_entry(entry)
+            self.built = True
+
+    @property
+    def matcher(self) -> EntityMatcher:
+        if self._matcher is None:
+            self._matcher = EntityMatcher(self.terms)
+        return self._matcher
+
+    def set_entry(self, entry: CodexEntry) -> None:
+        self.remove_entry(entry.id)
+        self.terms[entry.id] = entry_terms(entry)
+        self.names[entry.id] = entry.name
+        for term in self.terms[entry.id]:
+            self.entries_by_name.setdefault(normalize_name(term), set()).add(entry.id)
+        self._matcher = None
+
+    def remove_entry(self, entry_id: str) -> None:
+        self.names.pop(entry_id, None)
+        for term in self.terms.pop(entry_id, ()):
+            key = normalize_name(term)
+            ids = self.entries_by_name.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self.entries_by_name[key]
+        self._matcher = None
+
+    def match(self, names: list[str]) -> str | None:
+        """The existing entry any of these names refers to, if one does."""
+        for name in names:
+            ids = self.entries_by_name.get(normalize_name(name))
+            if ids:
+                return min(ids)
+        return None
+
+    def mentioned(self, text: str, limit: int) -> list[str]:
+        """Names of entries mentioned in text, most mentioned first."""
+        if not self.terms:
+            return []
+        counts = self.matcher.scan(text)
+        ranked = sorted(counts, key=lambda entry_id: (-counts[entry_id][0], entry_id))
+        return [self.names[entry_id] for entry_id in ranked[:limit]]
+
+
+def get_name_index() -> CodexNameIndex:
+    """Return the current workspace's codex name index."""
+    return current_workspace().service("name_index", CodexNameIndex)
+
+
+async def _on_codex_saved(entry, description) -> None:
+    index = get_name_index()
+    if index.built:
+        index.set_entry(entry)
+
+
+async def _on_codex_deleted(entry_id) -> None:
+    index = get_name_index()
+    if index.built:
+        index.remove_entry(entry_id)
+
+
+subscribe("codex_saved", _on_codex_saved)
+subscribe("codex_deleted", _on_codex_deleted)
+
+
+# ============================================================================
+# Staged batches
+# ============================================================================
+
+
+def _string_list(value) -> list[str]:
+    if not isinstance(value, list):
+        return []
+    return [item.strip() for item in value if isinstance(item, str) and item.strip()]
+
+
+def _entry_error(fields: dict) -> str | None:
+    """
+    Why a candidate's fields don't make a valid CodexEntry, or None if
+    they do (the ID and dates are filled in only when it is created).
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        CodexEntry.model_validate(
+            {**fields, "id": slugify(fields["name"]), "created": now, "modified": now}
+        )
+    except ValidationError as e:
+        return "; ".join(
+            f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+            for error in e.errors()
+        )
+    return None
+
+
+class ExtractionBatch:
+    """
+    Candidates from one extraction run, staged for review.
+
+    Each candidate is a dict with index, status, entry (the fields of the
+    CodexEntry to create), description and match (the existing entry a
+    duplicate refers to). A name seen twice in one run merges into the
+    first candidate.
+    """
+
+    def __init__(self, model: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.model = model
+        self.created = datetime.now(timezone.utc)
+        self.status = STREAMING
+        self.message: str | None = None
+        self.candidates: list[dict] = []
+        self.parse_errors = 0
+        self.usage: dict = {}
+        self._by_name: dict[str, dict] = {}
+
+    def add(self, raw: dict, index: CodexNameIndex) -> dict:
+        """Stage one parsed object; return the new or updated candidate."""
+        name = raw.get("name")
+        name = name.strip() if isinstance(name, str) else ""
+        aliases = [a for a in _string_list(raw.get("aliases")) if a != name]
+        names = [name, *aliases] if name else aliases
+
+        for key in map(normalize_name, names):
+            if key in self._by_name:
+                return self._merge(self._by_name[key], raw, aliases)
+
+        candidate = {
+            "index": len(self.candidates),
+            "status": NEW,
+            "entry": {
+                "type": raw.get("type"),
+                "name": name,
+                "aliases": aliases,
+                "tags": _string_list(raw.get("tags")),
+                "region": raw.get("region") or None,
+                "relations": [
+                    {"target": r["target"].strip(), "type": r["type"].strip()}
+                    for r in raw.get("relations") or []
+                    if isinstance(r, dict)
+                    and isinstance(r.get("target"), str)
+                    and isinstance(r.get("type"), str)
+                ],
+            },
+            "description": str(raw.get("description") or "").strip(),
+            "match": None,
+            "error": None,
+        }
+        if not name:
+            candidate["status"] = INVALID
+            candidate["error"] = "Missing name"
+        elif raw.get("type") not in {t.value for t in CodexType}:
+            candidate["status"] = INVALID
+            candidate["error"] = f"Unknown type {raw.get('type')!r}"
+        elif error := _entry_error(candidate["entry"]):
+            candidate["status"] = INVALID
+            candidate["error"] = error
+        else:
+            match = index.match(names)
+            if match is not None:
+                candidate["status"] = DUPLICATE
+                candidate["match"] = match
+
+        self.candidates.append(candidate)
+        for key in map(normalize_name, names):
+            self._by_name[key] = candidate
+        return candidate
+
+    def _merge(self, candidate: dict, raw: dict, aliases: list[str]) -> dict:
+        entry = candidate["entry"]
+        for alias in aliases:
+            if alias != entry["name"] and alias not in entry["aliases"]:
+                entry["aliases"].append(alias)
+                self._by_name[normalize_name(alias)] = candidate
+        for tag in _string_list(raw.get("tags")):
+            if tag not in entry["tags"]:
+                entry["tags"].append(tag)
+        if not candidate["description"]:
+            candidate["description"] = str(raw.get("description") or "").strip()
+        return candidate
+
+    def summary(self) -> dict:
+        counts: dict[str, int] = {}
+        for candidate in self.candidates:
+            counts[candidate["status"]] = counts.get(candidate["status"], 0) + 1
+        return {
+            "id": self.id,
+            "model": self.model,
+            "created": self.created.isoformat(),
+            "status": self.status,
+            "message": self.message,
+            "counts": counts,
+            "parseErrors": self.parse_errors,
+            "usage": self.usage,
+        }
+
+    def snapshot(self) -> dict:
+        return {**self.summary(), "candidates": self.candidates}
+
+
+def _batches() -> OrderedDict[str, ExtractionBatch]:
+    """The current workspace's staged batches, oldest first."""
+    return current_workspace().service("extraction_batches", OrderedDict)
+
+
+def get_batch(batch_id: str) -> ExtractionBatch | None:
+    return _batches().get(batch_id)
+
+
+def discard_batch(batch_id: str) -> bool:
+    return _batches().pop(batch_id, None) is not None
+
+
+def _stage(batch: ExtractionBatch) -> None:
+    batches = _batches()
+    batches[batch.id] = batch
+    while len(batches) > MAX_BATCHES:
+        batches.popitem(last=False)
+
+
+def build_extract_prompt(source: str, known: list[str]) -> str:
+    """Fill the extraction template with the source text and known names."""
+    template = load_template("extract.md") or "{{known_entries}}\n\n{{source}}"
+    known_text = "\n".join(f"- {name}" for name in known) or "(none)"
+    return template.replace("{{known_entries}}", known_text).replace(
+        "{{source}}", source
+    )
+
+
+async def extract(
+    source: str,
+    model: str = "claude-sonnet-4-20250514",
+    max_tokens: int = 4096,
+) -> AsyncIterator[dict]:
+    """
+    Extract codex entries from text, staging candidates as they stream in.
+
+    Yields:
+        {"type": "batch", "id"} first, then {"type": "candidate", ...} as
+        each entry is parsed (again with the same index if a later line
+        merged into it), and finally {"type": "done", "batch": summary} or
+        {"type": "error", "message", "batch": summary}
+    """
+    index = get_name_index()
+    await index.ensure_built()
+
+    batch = ExtractionBatch(model)
+    _stage(batch)
+    yield {"type": "batch", "id": batch.id}
+
+    prompt = build_extract_prompt(source, index.mentioned(source, MAX_KNOWN_ENTRIES))
+    parser = EntryStreamParser()
+    async for event in generate_stream(
+        prompt,
+        load_system_prompt(),
+        model=model,
+        max_tokens=max_tokens,
+        operation="extract",
+    ):
+        if event["type"] == "text":
+            for raw in parser.feed(event["text"]):
+                yield {"type": "candidate", **batch.add(raw, index)}
+        elif event["type"] == "done":
+            batch.usage = {
+                "input": event["input_tokens"],
+                "output": event["output_tokens"],
+            }
+        else:
+            batch.status = FAILED
+            batch.message = event["message"]
+
+    parser.close()
+    batch.parse_errors = parser.errors
+    if batch.status == FAILED:
+        yield {"type": "error", "message": batch.message, "batch": batch.summary()}
+        return
+    batch.status = READY
+    yield {"type": "done", "batch": batch.summary()}
+
+
+async def commit_batch(batch_id: str, accept: list[int] | None = None) -> dict:
+    """
+    Create the batch's accepted new candidates in one bulk write.
+
+    Candidates are rechecked against the codex first, since entries may
+    have been created while the batch was under review. Relation targets
+    naming an existing or newly created entry are resolved to its ID.
+
+    Args:
+        batch_id: Batch to commit
+        accept: Candidate indexes to create (default: every new one)
+
+    Returns:
+        Dict with the created entry IDs and skipped [{index, reason}]
+
+    Raises:
+        KeyError: If the batch doesn't exist
+        ExtractionError: If the batch is still streaming, failed or was
+            already committed
+    """
+    batch = _batches().get(batch_id)
+    if batch is None:
+        raise KeyError(batch_id)
+    if batch.status != READY:
+        raise ExtractionError(f"Batch '{batch_id}' is {batch.status}")
+
+    index = get_name_index()
+    await index.ensure_built()
+    wanted = set(range(len(batch.candidates)) if accept is None else accept)
+    skipped = [
+        {"index": i, "reason": "No such candidate"}
+        for i in sorted(wanted)
+        if not 0 <= i < len(batch.candidates)
+    ]
+
+    chosen = []
+    for candidate in batch.candidates:
+        if candidate["index"] not in wanted:
+            continue
+        entry = candidate["entry"]
+        match = index.match([entry["name"], *entry["aliases"]])
+        if candidate["status"] != NEW or match is not None:
+            skipped.append(
+                {
+                    "index": candidate["index"],
+                    "reason": candidate["error"]
+                    or f"Matches existing entry '{match or candidate['match']}'",
+                }
+            )
+            continue
+        # Checked again so one bad candidate is skipped, not the whole commit
+        error = _entry_error(entry)
+        if error is not None:
+            skipped.append({"index": candidate["index"], "reason": error})
+            continue
+        chosen.append(candidate)
+
+    # Unique IDs from names, avoiding each other and existing entries
+    ids: dict[int, str] = {}
+    taken: set[str] = set()
+    for candidate in chosen:
+        base = slugify(candidate["entry"]["name"])
+        entry_id, n = base, 1
+        while entry_id in taken or entry_id in index.names:
+            n += 1
+            entry_id = f"{base}-{n}"
+        taken.add(entry_id)
+        ids[candidate["index"]] = entry_id
+
+    def resolve(target: str) -> str:
+        for candidate in chosen:
+            names = [candidate["entry"]["name"], *candidate["entry"]["aliases"]]
+            if normalize_name(target) in map(normalize_name, names):
+                return ids[candidate["index"]]
+        return index.match([target]) or slugify(target)
+
+    now = datetime.now(timezone.utc)
+    entries = [
+        CodexEntry.model_validate(
+            {
+                **candidate["entry"],
+                "id": ids[candidate["index"]],
+                "relations": [
+                    {**relation, "target": resolve(relation["target"])}
+                    for relation in candidate["entry"]["relations"]
+                ],
+                "created": now,
+                "modified": now,
+            }
+        )
+        for candidate in chosen
+    ]
+
+    async with get_lock_manager().hold(*(codex_resource(e.id) for e in entries)):
+        versions = await asyncio.gather(
+            *(get_codex_entry_version(entry.id) for entry in entries)
+        )
+        writes = [
+            (candidate, entry)
+            for candidate, entry, version in zip(chosen, entries, versions)
+            if version is None
+        ]
+        for candidate, entry, version in zip(chosen, entries, versions):
+            if version is not None:
+                skipped.append(
+                    {
+                        "index": candidate["index"],
+                        "reason": f"Entry '{entry.id}' already exists",
+                    }
+                )
+        await asyncio.gather(
+            *(save_codex_entry(entry, c["description"]) for c, entry in writes)
+        )
+
+    for candidate, entry in writes:
+        candidate["status"] = CREATED
+        candidate["match"] = entry.id
+    batch.status = COMMITTED
+    return {
+        "created": [entry.id for _, entry in writes],
+        "skipped": sorted(skipped, key=lambda s: s["index"]),
+    }
@@ -1,11 +1,17 @@
 """File manager service for codex and manuscript I/O."""
 
 import json
+import logging
 import re
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Awaitable, Callable
 
 import aiofiles
+from pydantic import TypeAdapter
+
+from . import fs
+from .workspace import current_workspace
 
 from models import (
     Chapter,
@@ -15,12 +21,48 @@ from models import (
     SceneWithContent,
 )
 
-# Directory configuration
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-DATA_DIR = PROJECT_ROOT / "data"
-CODEX_DIR = DATA_DIR / "codex"
-MANUSCRIPT_DIR = DATA_DIR / "manuscript"
-SESSIONS_DIR = DATA_DIR / "sessions"
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Change Listeners
+# ============================================================================
+
+# Events emitted after a successful write:
+#   codex_saved(entry, description), codex_deleted(entry_id),
+#   scene_saved(book_id, act_id, chapter_id, scene, content),
+#   scene_deleted(book_id, act_id, chapter_id, scene_id),
+#   chapter_saved(book_id, act_id, chapter)
+_listeners: dict[str, list[Callable[..., Awaitable[None]]]] = {}
+
+
+def subscribe(event: str, callback: Callable[..., Awaitable[None]]) -> None:
+    """Register an async callback for a storage change event."""
+    _listeners.setdefault(event, []).append(callback)
+
+
+async def _emit(event: str, *args) -> None:
+    """Notify listeners of a change. Listener failures never fail the write."""
+    for callback in _listeners.get(event, []):
+        try:
+            await callback(*args)
+        except Exception:
+            logger.exception("Listener %r failed for %s", callback, event)
+
+
+def codex_dir() -> Path:
+    """The current workspace's codex directory."""
+    return current_workspace().codex_dir
+
+
+def manuscript_dir() -> Path:
+    """The current workspace's manuscript directory."""
+    return current_workspace().manuscript_dir
+
+
+def sessions_dir() -> Path:
+    """The current workspace's directory for logs and snapshots."""
+    return current_workspace().sessions_dir
 
 
 def count_words(text: str) -> int:
@@ -43,14 +85,7 @@ async def find_file_by_id(
     base_dir: Path, file_id: str, extension: str
 ) -> Path | None:
     """Recursively search for a file by ID."""
-    if not base_dir.exists():
-        return None
-
-    pattern = f"{file_id}{extension}"
-    for path in base_dir.rglob(pattern):
-        if path.is_file():
-            return path
-    return None
+    return await fs.find_file(base_dir, f"{file_id}{extension}")
 
 
 # ============================================================================
@@ -58,41 +93,190 @@ async def find_file_by_id(
 # ============================================================================
 
 
+class _CachedCodexEntry:
+    """A codex entry as last read from (or written to) disk."""
+
+    __slots__ = ("fingerprint", "entry", "_payload")
+
+    def __init__(self, fingerprint: tuple[int, int], entry: CodexEntry):
+        self.fingerprint = fingerprint
+        self.entry = entry
+        self._payload: dict | None = None
+
+    @property
+    def payload(self) -> dict:
+        """The entry's API representation (by alias), computed once."""
+        if self._payload is None:
+            self._payload = self.entry.model_dump(mode="json", by_alias=True)
+        return self._payload
+
+
+class _CodexCache:
+    """A workspace's codex entries as last read or written."""
+
+    __slots__ = ("entries", "paths")
+
+    def __init__(self):
+        # JSON path -> entry, reused while the file's (mtime_ns, size) is same
+        self.entries: dict[Path, _CachedCodexEntry] = {}
+        # Entry ID -> JSON path, to skip the recursive search on lookups
+        self.paths: dict[str, Path] = {}
+
+
+def _codex_cache() -> _CodexCache:
+    return current_workspace().service("codex_cache", _CodexCache)
+
+
+_codex_list_adapter = TypeAdapter(list[CodexEntry])
+
+# Changed files validated per batch during a scan; between batches the
+# scanning thread gives the event loop a chance at the GIL
+_VALIDATE_BATCH = 256
+# A scan that loads at least this many entries is a cold load: the heap is
+# frozen afterwards so full collections stop walking the cache
+_FREEZE_AFTER = 1000
+
+
+async def _fingerprint(path: Path) -> tuple[int, int] | None:
+    stat = await fs.stat(path)
+    return (stat.mtime_ns, stat.size) if stat else None
+
+
+def _codex_metadata(data: dict) -> dict:
+    # Handle 'global' -> 'global_entry' mapping
+    if "global" in data:
+        data["global_entry"] = data.pop("global")
+    return data
+
+
+def _validate_codex_batch(stale: list[dict]) -> list[CodexEntry | None]:
+    """Validate changed files in one TypeAdapter pass (None if invalid)."""
+    try:
+        return _codex_list_adapter.validate_python(stale)
+    except ValueError:
+        # Some file is invalid: validate one by one and skip the bad ones
+        entries = []
+        for data in stale:
+            try:
+                entries.append(CodexEntry.model_validate(data))
+            except ValueError:
+                entries.append(None)
+        return entries
+
+
+def _scan_codex_files(
+    search_dir: Path, cached_entries: dict[Path, _CachedCodexEntry]
+) -> tuple[list[Path], list[tuple[Path, tuple[int, int], CodexEntry]]]:
+    """
+    Walk a codex directory, reading and validating only files that changed
+    since cached. Runs in the filesystem pool; only reads the cache.
+
+    Returns:
+        Tuple of (all JSON paths found, [(path, fingerprint, entry)] for
+        files that changed)
+    """
+    paths = []
+    stale = []
+    for stat in fs.walk_files(search_dir, ".json"):
+        fingerprint = (stat.mtime_ns, stat.size)
+        paths.append(stat.path)
+        cached = cached_entries.get(stat.path)
+        if cached is not None and cached.fingerprint == fingerprint:
+            continue
+        text = fs.read_text_or_none(stat.path)
+        try:
+            data = json.loads(text) if text is not None else None
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            stale.append((stat.path, fingerprint, _codex_metadata(data)))
+
+    changed = []
+    for start in range(0, len(stale), _VALIDATE_BATCH):
+        batch = stale[start : start + _VALIDATE_BATCH]
+        entries = _validate_codex_batch([data for _, _, data in batch])
+        for (json_path, fingerprint, _), entry in zip(batch, entries):
+            if entry is not None:
+                changed.append((json_path, fingerprint, entry))
+    return paths, changed
+
+
+async def _load_codex(entry_type: str | None = None) -> list[_CachedCodexEntry]:
+    # If filtering by type, only scan that subdirectory (missing: no entries)
+    search_dir = codex_dir() / entry_type if entry_type else codex_dir()
+    cache = _codex_cache()
+    with fs.deferred_gc():
+        paths, changed = await fs.run(_scan_codex_files, search_dir, cache.entries)
+        for json_path, fingerprint, entry in changed:
+            cache.entries[json_path] = _CachedCodexEntry(fingerprint, entry)
+            cache.paths[entry.id] = json_path
+        if len(changed) >= _FREEZE_AFTER:
+            fs.freeze_heap()
+
+    if not entry_type:
+        # Forget files that disappeared behind our back
+        for gone in cache.entries.keys() - set(paths):
+            cached = cache.entries.pop(gone)
+            if cache.paths.get(cached.entry.id) == gone:
+                del cache.paths[cached.entry.id]
+
+    return [cache.entries[path] for path in paths if path in cache.entries]
+
+
 async def list_codex_entries(entry_type: str | None = None) -> list[CodexEntry]:
     """
     List all codex entries, optionally filtered by type.
-    Recursively scan CODEX_DIR for .json files.
+    Recursively scan the codex directory for .json files.
     Return list of CodexEntry (metadata only, no description).
+
+    Files whose mtime and size are unchanged since they were last read or
+    written by the app are served from memory without re-validation, so
+    the returned entries are shared and must be treated as read-only.
     """
-    entries = []
+    return [cached.entry for cached in await _load_codex(entry_type)]
+
+
+async def list_codex_payloads(entry_type: str | None = None) -> list[dict]:
+    """
+    Like list_codex_entries, but return each entry's API representation
+    (serialized by alias), cached alongside the entry.
+    """
+    return [cached.payload for cached in await _load_codex(entry_type)]
 
-    if not CODEX_DIR.exists():
-        return entries
 
-    # If filtering by type, only scan that subdirectory
-    if entry_type:
-        search_dirs = [CODEX_DIR / entry_type]
-    else:
-        search_dirs = [CODEX_DIR]
+async def _find_codex_json(entry_id: str) -> Path | None:
+    """Locate an entry's JSON file, using the ID -> path cache when valid."""
+    json_path = _codex_cache().paths.get(entry_id)
+    if json_path is not None and await fs.exists(json_path):
+        return json_path
+    return await find_file_by_id(codex_dir(), entry_id, ".json")
 
-    for search_dir in search_dirs:
-        if not search_dir.exists():
+
+async def _version(paths: list[Path]) -> tuple[str, float] | None:
+    """
+    Strong ETag and last-modified time for a set of files, derived from
+    each file's mtime and size. Return None if the first file is missing.
+    """
+    stats = await fs.stat_many(paths)
+    if stats[0] is None:
+        return None
+    parts = []
+    latest = 0.0
+    for stat in stats:
+        if stat is None:
+            parts.append("0-0")
             continue
+        parts.append(f"{stat.mtime_ns:x}-{stat.size:x}")
+        latest = max(latest, stat.mtime)
+    return f'"{".".join(parts)}"', latest
 
-        for json_path in search_dir.rglob("*.json"):
-            try:
-                async with aiofiles.open(json_path, "r", encoding="utf-8") as f:
-                    data = json.loads(await f.read())
-                    # Handle 'global' -> 'global_entry' mapping
-                    if "global" in data:
-                        data["global_entry"] = data.pop("global")
-                    entry = CodexEntry.model_validate(data)
-                    entries.append(entry)
-            except (json.JSONDecodeError, ValueError):
-                # Skip invalid files
-                continue
 
-    return entries
+async def get_codex_entry_version(entry_id: str) -> tuple[str, float] | None:
+    """Return (ETag, last-modified timestamp) for a codex entry, or None."""
+    json_path = await _find_codex_json(entry_id)
+    if not json_path:
+        return None
+    return await _version([json_path, json_path.with_suffix(".md")])
 
 
 async def get_codex_entry(entry_id: str) -> CodexEntryWithDescription | None:
@@ -101,30 +285,34 @@ async def get_codex_entry(entry_id: str) -> CodexEntryWithDescription | None:
     Load both the .json metadata and .md description.
     Return CodexEntryWithDescription or None if not found.
     """
-    json_path = await find_file_by_id(CODEX_DIR, entry_id, ".json")
+    json_path = await _find_codex_json(entry_id)
     if not json_path:
         return None
 
+    # Load markdown description
+    md_path = json_path.with_suffix(".md")
+    description = ""
+    try:
+        async with aiofiles.open(md_path, "r", encoding="utf-8") as f:
+            description = await f.read()
+    except FileNotFoundError:
+        pass
+
+    # Trusted path: metadata we already validated and the file is unchanged.
+    # Deep-copied, as callers edit the entry they get (lists included)
+    cached = _codex_cache().entries.get(json_path)
+    if cached is not None and cached.fingerprint == await _fingerprint(json_path):
+        return CodexEntryWithDescription.model_construct(
+            **dict(cached.entry.model_copy(deep=True)), description=description
+        )
+
     # Load JSON metadata
     try:
         async with aiofiles.open(json_path, "r", encoding="utf-8") as f:
-            data = json.loads(await f.read())
-            # Handle 'global' -> 'global_entry' mapping
-            if "global" in data:
-                data["global_entry"] = data.pop("global")
+            data = _codex_metadata(json.loads(await f.read()))
     except (json.JSONDecodeError, FileNotFoundError):
         return None
 
-    # Load markdown description
-    md_path = json_path.with_suffix(".md")
-    description = ""
-    if md_path.exists():
-        try:
-            async with aiofiles.open(md_path, "r", encoding="utf-8") as f:
-                description = await f.read()
-        except FileNotFoundError:
-            pass
-
     data["description"] = description
     return CodexEntryWithDescription.model_validate(data)
 
@@ -137,7 +325,7 @@ async def save_codex_entry(entry: CodexEntry, description: str) -> None:
     Update the 'modified' timestamp.
     """
     # Determine directory path
-    type_dir = CODEX_DIR / entry.type.value
+    type_dir = codex_dir() / entry.type.value
 
     # For characters and locations, use region subdirectory if specified
     if entry.type.value in ("characters", "character", "locations", "location"):
@@ -145,7 +333,7 @@ async def save_codex_entry(entry: CodexEntry, description: str) -> None:
             type_dir = type_dir / entry.region
 
     # Ensure directory exists
-    type_dir.mkdir(parents=True, exist_ok=True)
+    await fs.mkdir(type_dir)
 
     # Update modified timestamp
     entry.modified = datetime.now(timezone.utc)
@@ -163,6 +351,20 @@ async def save_codex_entry(entry: CodexEntry, description: str) -> None:
     async with aiofiles.open(md_path, "w", encoding="utf-8") as f:
         await f.write(description)
 
+    # We wrote it, so it can be trusted until the file changes again
+    cache = _codex_cache()
+    previous = cache.paths.get(entry.id)
+    if previous is not None and previous != json_path:
+        cache.entries.pop(previous, None)
+    fingerprint = await _fingerprint(json_path)
+    if fingerprint is not None:
+        cache.entries[json_path] = _CachedCodexEntry(
+            fingerprint, entry.model_copy(deep=True)
+        )
+        cache.paths[entry.id] = json_path
+
+    await _emit("codex_saved", entry, description)
+
 
 async def delete_codex_entry(entry_id: str) -> bool:
     """
@@ -170,17 +372,20 @@ async def delete_codex_entry(entry_id: str) -> bool:
     Remove both .json and .md files.
     Return True if deleted, False if not found.
     """
-    json_path = await find_file_by_id(CODEX_DIR, entry_id, ".json")
+    json_path = await _find_codex_json(entry_id)
     if not json_path:
         return False
 
     # Remove JSON file
-    json_path.unlink(missing_ok=True)
+    await fs.unlink(json_path)
+    cache = _codex_cache()
+    cache.entries.pop(json_path, None)
+    cache.paths.pop(entry_id, None)
 
     # Remove markdown file
-    md_path = json_path.with_suffix(".md")
-    md_path.unlink(missing_ok=True)
+    await fs.unlink(json_path.with_suffix(".md"))
 
+    await _emit("codex_deleted", entry_id)
     return True
 
 
@@ -189,99 +394,103 @@ async def delete_codex_entry(entry_id: str) -> bool:
 # ============================================================================
 
 
+def _load_json(path: Path) -> dict | None:
+    text = fs.read_text_or_none(path)
+    try:
+        data = json.loads(text) if text is not None else None
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _chapter_scene_files(chapter_dir: Path) -> list[str]:
+    return [name for name in fs.list_files(chapter_dir, ".json") if name != "meta.json"]
+
+
+def _read_structure(root: Path) -> dict:
+    """Build the manuscript tree. Runs in the filesystem pool."""
+    result = {"books": []}
+    books: dict[str, dict] = {}
+    acts: dict[tuple[str, str], dict] = {}
+
+    def title(name: str) -> str:
+        return name.replace("-", " ").title()
+
+    for (book_id,) in fs.walk_tree(root, 1):
+        books[book_id] = {"id": book_id, "title": title(book_id), "acts": []}
+        result["books"].append(books[book_id])
+    for book_id, act_id in fs.walk_tree(root, 2):
+        act = {"id": act_id, "title": title(act_id), "chapters": []}
+        acts[(book_id, act_id)] = act
+        books[book_id]["acts"].append(act)
+
+    for book_id, act_id, chapter_id in fs.walk_tree(root, 3):
+        chapter_dir = root / book_id / act_id / chapter_id
+        chapter_data = _load_json(chapter_dir / "meta.json") or {
+            "id": chapter_id,
+            "title": title(chapter_id),
+        }
+        chapter = {
+            "id": chapter_data.get("id", chapter_id),
+            "title": chapter_data.get("title", chapter_id),
+            "scenes": [],
+        }
+
+        # Scenes are the chapter's JSON files other than meta.json
+        for name in _chapter_scene_files(chapter_dir):
+            scene_data = _load_json(chapter_dir / name)
+            if scene_data is None:
+                continue
+            stem = name.removesuffix(".json")
+            chapter["scenes"].append(
+                {
+                    "id": scene_data.get("id", stem),
+                    "title": scene_data.get("title", stem),
+                }
+            )
+
+        acts[(book_id, act_id)]["chapters"].append(chapter)
+
+    return result
+
+
 async def get_manuscript_structure() -> dict:
     """
     Return the full manuscript tree structure.
-    Scan MANUSCRIPT_DIR for books, acts, chapters.
+    Scan the manuscript directory for books, acts, chapters.
     Return nested dict with structure.
     """
-    result = {"books": []}
-
-    if not MANUSCRIPT_DIR.exists():
-        return result
+    return await fs.run(_read_structure, manuscript_dir())
 
-    # Scan for books (top-level directories)
-    for book_dir in sorted(MANUSCRIPT_DIR.iterdir()):
-        if not book_dir.is_dir():
-            continue
 
-        book = {
-            "id": book_dir.name,
-            "title": book_dir.name.replace("-", " ").title(),
-            "acts": [],
-        }
+def scene_key(book_id: str, act_id: str, chapter_id: str, scene_id: str) -> str:
+    """Stable manuscript-wide key for a scene: book/act/chapter/scene."""
+    return f"{book_id}/{act_id}/{chapter_id}/{scene_id}"
 
-        # Scan for acts
-        for act_dir in sorted(book_dir.iterdir()):
-            if not act_dir.is_dir():
-                continue
 
-            act = {
-                "id": act_dir.name,
-                "title": act_dir.name.replace("-", " ").title(),
-                "chapters": [],
-            }
-
-            # Scan for chapters
-            for chapter_dir in sorted(act_dir.iterdir()):
-                if not chapter_dir.is_dir():
-                    continue
-
-                # Load chapter metadata
-                meta_path = chapter_dir / "meta.json"
-                if meta_path.exists():
-                    try:
-                        async with aiofiles.open(
-                            meta_path, "r", encoding="utf-8"
-                        ) as f:
-                            chapter_data = json.loads(await f.read())
-                    except (json.JSONDecodeError, FileNotFoundError):
-                        chapter_data = {
-                            "id": chapter_dir.name,
-                            "title": chapter_dir.name.replace("-", " ").title(),
-                        }
-                else:
-                    chapter_data = {
-                        "id": chapter_dir.name,
-                        "title": chapter_dir.name.replace("-", " ").title(),
-                    }
-
-                chapter = {
-                    "id": chapter_data.get("id", chapter_dir.name),
-                    "title": chapter_data.get("title", chapter_dir.name),
-                    "scenes": [],
-                }
+def _read_scene_paths(root: Path) -> list[tuple[str, str, str, str]]:
+    """Scene paths in reading order. Runs in the filesystem pool."""
+    paths = []
+    for book_id, act_id, chapter_id in fs.walk_tree(root, 3):
+        chapter_dir = root / book_id / act_id / chapter_id
+        scene_ids = [
+            name.removesuffix(".json") for name in _chapter_scene_files(chapter_dir)
+        ]
+        meta = _load_json(chapter_dir / "meta.json") or {}
+        listed = meta.get("scenes") or []
+        ordered = [sid for sid in listed if sid in scene_ids]
+        ordered += [sid for sid in scene_ids if sid not in listed]
+        paths.extend((book_id, act_id, chapter_id, sid) for sid in ordered)
+    return paths
 
-                # Scan for scenes (JSON files that aren't meta.json)
-                for scene_file in sorted(chapter_dir.glob("*.json")):
-                    if scene_file.name == "meta.json":
-                        continue
-
-                    try:
-                        async with aiofiles.open(
-                            scene_file, "r", encoding="utf-8"
-                        ) as f:
-                            scene_data = json.loads(await f.read())
-                            chapter["scenes"].append(
-                                {
-                                    "id": scene_data.get(
-                                        "id", scene_file.stem
-                                    ),
-                                    "title": scene_data.get(
-                                        "title", scene_file.stem
-                                    ),
-                                }
-                            )
-                    except (json.JSONDecodeError, FileNotFoundError):
-                        continue
-
-                act["chapters"].append(chapter)
-
-            book["acts"].append(act)
-
-        result["books"].append(book)
 
-    return result
+async def list_scene_paths() -> list[tuple[str, str, str, str]]:
+    """
+    List every scene as (book_id, act_id, chapter_id, scene_id) in reading
+    order: books, acts and chapters by directory name, scenes in the order
+    of the chapter's meta.json `scenes` list (unlisted scenes last, by name).
+    """
+    return await fs.run(_read_scene_paths, manuscript_dir())
 
 
 async def get_scene(
@@ -292,13 +501,10 @@ async def get_scene(
     Load both .json metadata and .md content.
     Return SceneWithContent or None if not found.
     """
-    chapter_dir = MANUSCRIPT_DIR / book_id / act_id / chapter_id
+    chapter_dir = manuscript_dir() / book_id / act_id / chapter_id
     json_path = chapter_dir / f"{scene_id}.json"
     md_path = chapter_dir / f"{scene_id}.md"
 
-    if not json_path.exists():
-        return None
-
     # Load JSON metadata
     try:
         async with aiofiles.open(json_path, "r", encoding="utf-8") as f:
@@ -313,17 +519,38 @@ async def get_scene(
 
     # Load markdown content
     content = ""
-    if md_path.exists():
-        try:
-            async with aiofiles.open(md_path, "r", encoding="utf-8") as f:
-                content = await f.read()
-        except FileNotFoundError:
-            pass
+    try:
+        async with aiofiles.open(md_path, "r", encoding="utf-8") as f:
+            content = await f.read()
+    except FileNotFoundError:
+        pass
 
     data["content"] = content
     return SceneWithContent.model_validate(data)
 
 
+async def get_scene_version(
+    book_id: str, act_id: str, chapter_id: str, scene_id: str
+) -> tuple[str, float] | None:
+    """Return (ETag, last-modified timestamp) for a scene, or None."""
+    chapter_dir = manuscript_dir() / book_id / act_id / chapter_id
+    return await _version(
+        [chapter_dir / f"{scene_id}.json", chapter_dir / f"{scene_id}.md"]
+    )
+
+
+async def get_scene_content(
+    book_id: str, act_id: str, chapter_id: str, scene_id: str
+) -> str | None:
+    """Load only a scene's markdown content. Return None if missing."""
+    md_path = manuscript_dir() / book_id / act_id / chapter_id / f"{scene_id}.md"
+    try:
+        async with aiofiles.open(md_path, "r", encoding="utf-8") as f:
+            return await f.read()
+    except FileNotFoundError:
+        return None
+
+
 async def save_scene(
     book_id: str, act_id: str, chapter_id: str, scene: Scene, content: str
 ) -> None:
@@ -332,8 +559,8 @@ async def save_scene(
     Write .json metadata and .md content.
     Update 'modified' timestamp and calculate word_count from content.
     """
-    chapter_dir = MANUSCRIPT_DIR / book_id / act_id / chapter_id
-    chapter_dir.mkdir(parents=True, exist_ok=True)
+    chapter_dir = manuscript_dir() / book_id / act_id / chapter_id
+    await fs.mkdir(chapter_dir)
 
     # Update timestamp and word count
     scene.modified = datetime.now(timezone.utc)
@@ -352,15 +579,38 @@ async def save_scene(
     async with aiofiles.open(md_path, "w", encoding="utf-8") as f:
         await f.write(content)
 
+    await _emit("scene_saved", book_id, act_id, chapter_id, scene, content)
+
+
+async def delete_scene(
+    book_id: str, act_id: str, chapter_id: str, scene_id: str
+) -> bool:
+    """
+    Delete a scene's .json metadata and .md content.
+    Return True if deleted, False if not found.
+    """
+    chapter_dir = manuscript_dir() / book_id / act_id / chapter_id
+    if not await fs.unlink(chapter_dir / f"{scene_id}.json"):
+        return False
+    await fs.unlink(chapter_dir / f"{scene_id}.md")
+
+    await _emit("scene_deleted", book_id, act_id, chapter_id, scene_id)
+    return True
+
+
+async def get_chapter_version(
+    book_id: str, act_id: str, chapter_id: str
+) -> tuple[str, float] | None:
+    """Return (ETag, last-modified timestamp) for a chapter's meta.json."""
+    meta_path = manuscript_dir() / book_id / act_id / chapter_id / "meta.json"
+    return await _version([meta_path])
+
 
 async def get_chapter(
     book_id: str, act_id: str, chapter_id: str
 ) -> Chapter | None:
     """Load chapter metadata from meta.json."""
-    meta_path = MANUSCRIPT_DIR / book_id / act_id / chapter_id / "meta.json"
-
-    if not meta_path.exists():
-        return None
+    meta_path = manuscript_dir() / book_id / act_id / chapter_id / "meta.json"
 
     try:
         async with aiofiles.open(meta_path, "r", encoding="utf-8") as f:
@@ -376,8 +626,8 @@ async def get_chapter(
 
 async def save_chapter(book_id: str, act_id: str, chapter: Chapter) -> None:
     """Save chapter metadata to meta.json."""
-    chapter_dir = MANUSCRIPT_DIR / book_id / act_id / chapter.id
-    chapter_dir.mkdir(parents=True, exist_ok=True)
+    chapter_dir = manuscript_dir() / book_id / act_id / chapter.id
+    await fs.mkdir(chapter_dir)
 
     # Serialize to JSON with alias mapping
     data = chapter.model_dump(by_alias=True, mode="json")
@@ -386,3 +636,5 @@ async def save_chapter(book_id: str, act_id: str, chapter: Chapter) -> None:
     meta_path = chapter_dir / "meta.json"
     async with aiofiles.open(meta_path, "w", encoding="utf-8") as f:
         await f.write(json.dumps(data, indent=2, ensure_ascii=False))
+
+    await _emit("chapter_saved", book_id, act_id, chapter)
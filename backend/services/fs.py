@@ -0,0 +1,249 @@
+"""
+Filesystem access off the event loop.
+
+Directory walks, stats, existence checks, mkdir and unlink all run in one
+bounded thread pool, so a large scan can't freeze other requests (or
+starve the default executor that aiofiles uses for file contents).
+Traversal uses os.scandir, which returns names and file types in one
+syscall per directory, and metadata for many paths is read in one hop.
+"""
+
+import asyncio
+import contextlib
+import functools
+import gc
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, NamedTuple, TypeVar
+
+T = TypeVar("T")
+
+# Threads for filesystem work; more only helps on network filesystems
+FS_THREADS = int(os.getenv("FS_THREADS", "4"))
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=FS_THREADS, thread_name_prefix="fs")
+    return _executor
+
+
+async def run(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking filesystem function in the filesystem pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(fn, *args, **kwargs)
+    )
+
+
+class FileStat(NamedTuple):
+    """The metadata callers need from a stat."""
+
+    path: Path
+    mtime_ns: int
+    mtime: float
+    size: int
+
+
+# ============================================================================
+# Blocking helpers (run these through run(); safe to call from threads)
+# ============================================================================
+
+
+def stat_or_none(path: Path) -> FileStat | None:
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return FileStat(path, st.st_mtime_ns, st.st_mtime, st.st_size)
+
+
+def walk_files(
+    root: Path, suffix: str = "", name: str | None = None, limit: int | None = None
+) -> list[FileStat]:
+    """
+    Every regular file under root ending in `suffix` (or named `name`),
+    with its metadata, depth-first in sorted order. Stops after `limit`.
+    """
+    found: list[FileStat] = []
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+                if name is not None:
+                    if entry.name != name:
+                        continue
+                elif not entry.name.endswith(suffix):
+                    continue
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            found.append(
+                FileStat(Path(entry.path), st.st_mtime_ns, st.st_mtime, st.st_size)
+            )
+            if limit is not None and len(found) >= limit:
+                return found
+        # Reversed so the stack pops them in sorted order
+        stack.extend(reversed(subdirs))
+    return found
+
+
+def list_subdirs(directory: Path) -> list[str]:
+    """Names of a directory's subdirectories, sorted (empty if missing)."""
+    try:
+        with os.scandir(directory) as it:
+            return sorted(e.name for e in it if e.is_dir())
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def list_files(directory: Path, suffix: str) -> list[str]:
+    """Names of a directory's files ending in `suffix`, sorted."""
+    try:
+        with os.scandir(directory) as it:
+            return sorted(
+                e.name for e in it if e.name.endswith(suffix) and e.is_file()
+            )
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def walk_tree(root: Path, depth: int) -> list[tuple[str, ...]]:
+    """
+    Relative directory paths exactly `depth` levels below root, as name
+    tuples in sorted order (e.g. depth 3 -> (book, act, chapter)).
+    """
+    level: list[tuple[str, ...]] = [()]
+    for _ in range(depth):
+        level = [
+            (*parts, name)
+            for parts in level
+            for name in list_subdirs(root.joinpath(*parts))
+        ]
+    return level
+
+
+def read_text_or_none(path: Path) -> str | None:
+    try:
+        return path.read_text(encoding="utf-8")
+    except (FileNotFoundError, NotADirectoryError, UnicodeDecodeError):
+        return None
+
+
+# ============================================================================
+# Garbage collection during scans
+# ============================================================================
+
+# A threshold no scan reaches, holding off full collections meanwhile
+_DEFERRED_GEN2_THRESHOLD = 1_000_000
+
+_gc_lock = threading.Lock()
+_gc_deferrals = 0
+_gc_threshold: tuple[int, int, int] | None = None
+
+
+@contextlib.contextmanager
+def deferred_gc():
+    """
+    Hold off full (generation 2) collections while a scan builds many
+    long-lived objects. Each one walks the whole heap holding the GIL,
+    stalling the event loop for longer the more the scan has built;
+    young collections still run. Safe to nest and to use from threads.
+    """
+    global _gc_deferrals, _gc_threshold
+    with _gc_lock:
+        if _gc_deferrals == 0:
+            _gc_threshold = gc.get_threshold()
+            gen0, gen1, _ = _gc_threshold
+            gc.set_threshold(gen0, gen1, _DEFERRED_GEN2_THRESHOLD)
+        _gc_deferrals += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_deferrals -= 1
+            if _gc_deferrals == 0 and _gc_threshold is not None:
+                gc.set_threshold(*_gc_threshold)
+                _gc_threshold = None
+
+
+def freeze_heap() -> None:
+    """
+    Move every object alive now out of reach of later collections, after
+    a cold load has filled long-lived caches, so full collections don't
+    keep walking them. Young garbage is collected first so it isn't kept;
+    frozen objects are still freed by reference counting.
+    """
+    gc.collect(1)
+    gc.freeze()
+
+
+# ============================================================================
+# Async API
+# ============================================================================
+
+
+async def exists(path: Path) -> bool:
+    return await run(os.path.exists, path)
+
+
+async def stat(path: Path) -> FileStat | None:
+    return await run(stat_or_none, path)
+
+
+async def stat_many(paths: list[Path]) -> list[FileStat | None]:
+    """Stat many paths in a single trip to the pool."""
+    return await run(lambda: [stat_or_none(path) for path in paths])
+
+
+async def mkdir(path: Path) -> None:
+    await run(os.makedirs, path, exist_ok=True)
+
+
+async def unlink(path: Path) -> bool:
+    """Remove a file. Return False if it didn't exist."""
+
+    def _unlink() -> bool:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    return await run(_unlink)
+
+
+async def walk(root: Path, suffix: str = "") -> list[FileStat]:
+    return await run(walk_files, root, suffix)
+
+
+async def find_file(root: Path, name: str) -> Path | None:
+    """First file called `name` anywhere under root."""
+
+    def _find() -> Path | None:
+        found = walk_files(root, name=name, limit=1)
+        return found[0].path if found else None
+
+    return await run(_find)
+
+
+async def read_many(paths: list[Path]) -> list[str | None]:
+    """Read many small text files in a single trip to the pool."""
+    return await run(lambda: [read_text_or_none(path) for path in paths])
@@ -0,0 +1,272 @@
+"""Trigram index over codex names and aliases for typo-tolerant lookup."""
+
+import asyncio
+import unicodedata
+
+import numpy as np
+
+from models import CodexEntry
+
+from .entity_detector import entry_terms
+from .file_manager import list_codex_entries, subscribe
+from .workspace import current_workspace
+
+# Matches below this Jaccard similarity are not worth suggesting
+DEFAULT_MIN_SCORE = 0.3
+# Names compared per event-loop turn during a duplicates scan
+_DUPLICATES_BATCH = 256
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+
+def trigrams(text: str) -> frozenset[str]:
+    """
+    Trigrams of a normalized string, padded so the start and end of each
+    word count ("merril" shares "  m", " me" and "il " with "merrill").
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class FuzzyNameIndex:
+    """
+    Inverted trigram index over every entry's name and aliases.
+
+    Each name is indexed whole and, for multi-word names, word by word, so
+    "Merril" finds "Merrill Vance". Lookups score every indexed name at
+    once by Jaccard similarity of trigram sets: the query's postings are
+    concatenated and counted with numpy, so the cost is one pass over the
+    postings rather than a Python loop over candidates.
+
+    Term IDs are never reused while the index is live; once most IDs are
+    dead (entries re-saved many times), the index is renumbered.
+    """
+
+    def __init__(self):
+        # Term ID -> (entry ID, original name, trigram set, whole name?)
+        self.terms: dict[int, tuple[str, str, frozenset[str], bool]] = {}
+        self.postings: dict[str, set[int]] = {}
+        self.by_entry: dict[str, list[int]] = {}
+        self.entry_names: dict[str, str] = {}
+        self.built = False
+        self._next_id = 0
+        # Per term ID: trigram count (0 once removed) and whole-name flag
+        self._sizes = np.zeros(1024, dtype=np.int32)
+        self._whole = np.zeros(1024, dtype=bool)
+        # Posting arrays for numpy, rebuilt lazily after a gram changes
+        self._arrays: dict[str, np.ndarray] = {}
+        self._lock = asyncio.Lock()
+
+    async def ensure_built(self) -> None:
+        async with self._lock:
+            if self.built:
+                return
+            for entry in await list_codex_entries():
+                self.set_entry(entry)
+            self.built = True
+
+    def set_entry(self, entry: CodexEntry) -> None:
+        """Index (or re-index) an entry's name and aliases."""
+        self.remove_entry(entry.id)
+        if self._next_id > 2 * len(self.terms) + 1024:
+            self._renumber()
+        self.entry_names[entry.id] = entry.name
+        # Whole names first (entry name leading), so a word that is also a
+        # whole alias is indexed as one and ties show the entry's name
+        terms = [entry.name, *(t for t in entry_terms(entry) if t != entry.name)]
+        keys: dict[str, tuple[str, bool]] = {}
+        for term in terms:
+            keys.setdefault(normalize(term), (term, True))
+        for term in terms:
+            for word in normalize(term).split():
+                keys.setdefault(word, (term, False))
+        term_ids = [
+            self._add_term(entry.id, term, trigrams(key), whole)
+            for key, (term, whole) in keys.items()
+            if len(key) >= 2
+        ]
+        self.by_entry[entry.id] = term_ids
+
+    def _add_term(
+        self, entry_id: str, term: str, grams: frozenset[str], whole: bool
+    ) -> int:
+        term_id = self._next_id
+        self._next_id += 1
+        if term_id >= len(self._sizes):
+            self._sizes = np.resize(self._sizes, 2 * len(self._sizes))
+            self._whole = np.resize(self._whole, 2 * len(self._whole))
+        self._sizes[term_id] = len(grams)
+        self._whole[term_id] = whole
+        self.terms[term_id] = (entry_id, term, grams, whole)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(term_id)
+            self._arrays.pop(gram, None)
+        return term_id
+
+    def remove_entry(self, entry_id: str) -> None:
+        self.entry_names.pop(entry_id, None)
+        for term_id in self.by_entry.pop(entry_id, []):
+            _, _, grams, _ = self.terms.pop(term_id)
+            self._sizes[term_id] = 0
+            for gram in grams:
+                self._arrays.pop(gram, None)
+                posting = self.postings[gram]
+                posting.discard(term_id)
+                if not posting:
+                    del self.postings[gram]
+
+    def _renumber(self) -> None:
+        """Reassign term IDs densely, dropping the dead ones."""
+        terms = list(self.terms.values())
+        by_entry: dict[str, list[int]] = {}
+        self.terms.clear()
+        self.postings.clear()
+        self._arrays.clear()
+        self._next_id = 0
+        self._sizes[:] = 0
+        for entry_id, term, grams, whole in terms:
+            term_id = self._add_term(entry_id, term, grams, whole)
+            by_entry.setdefault(entry_id, []).append(term_id)
+        self.by_entry = by_entry
+
+    def _posting_array(self, gram: str) -> np.ndarray:
+        array = self._arrays.get(gram)
+        if array is None:
+            array = np.fromiter(self.postings[gram], dtype=np.int32)
+            self._arrays[gram] = array
+        return array
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        min_score: float = DEFAULT_MIN_SCORE,
+        exclude: str | None = None,
+        whole_names: bool = False,
+    ) -> list[dict]:
+        """
+        Entries whose name or an alias resembles the query, best first.
+
+        Args:
+            query: Name to look up (any case, typos welcome)
+            limit: Maximum number of entries to return
+            min_score: Minimum Jaccard similarity (0-1)
+            exclude: Entry ID to leave out (e.g. the entry itself)
+            whole_names: Only compare against whole names and aliases,
+                not their individual words
+
+        Returns:
+            List of {"id", "name", "matched", "score"} dicts; `matched` is
+            the name or alias that scored best
+        """
+        grams = trigrams(normalize(query))
+        arrays = [self._posting_array(g) for g in grams if g in self.postings]
+        if not arrays:
+            return []
+
+        # Shared trigrams with every term at once, then Jaccard similarity
+        n = self._next_id
+        shared = np.bincount(np.concatenate(arrays), minlength=n)
+        scores = shared / (len(grams) + self._sizes[:n] - shared)
+        if whole_names:
+            scores[~self._whole[:n]] = 0.0
+        hits = np.flatnonzero(scores >= max(min_score, 1e-9))
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+
+        # Best-scoring name per entry, until `limit` entries are found
+        best: dict[str, tuple[float, str]] = {}
+        for term_id in hits.tolist():
+            entry_id, term, _, _ = self.terms[term_id]
+            if entry_id == exclude or entry_id in best:
+                continue
+            best[entry_id] = (float(scores[term_id]), term)
+            if len(best) >= limit:
+                break
+
+        top = sorted(best.items(), key=lambda item: (-item[1][0], item[0]))
+        return [
+            {
+                "id": entry_id,
+                "name": self.entry_names[entry_id],
+                "matched": term,
+                "score": round(score, 3),
+            }
+            for entry_id, (score, term) in top
+        ]
+
+    async def duplicates(
+        self, min_score: float = 0.6, limit: int = 100
+    ) -> list[dict]:
+        """
+        Pairs of distinct entries with a name or alias in common (or
+        nearly), most similar first, as merge candidates. Only whole names
+        are compared, so a shared surname alone doesn't make a pair.
+
+        Returns:
+            List of {"ids": [a, b], "names", "matched", "score"} dicts
+        """
+        pairs: dict[tuple[str, str], dict] = {}
+        names = [(e, term) for e, term, _, whole in self.terms.values() if whole]
+        for i, (entry_id, term) in enumerate(names):
+            if i and i % _DUPLICATES_BATCH == 0:
+                # Let other requests in; saves in between are picked up
+                await asyncio.sleep(0)
+            if entry_id not in self.entry_names:
+                continue
+            matches = self.search(
+                term, limit=20, min_score=min_score, exclude=entry_id, whole_names=True
+            )
+            for match in matches:
+                other = match["id"]
+                key = (min(entry_id, other), max(entry_id, other))
+                if key in pairs and pairs[key]["score"] >= match["score"]:
+                    continue
+                pairs[key] = {
+                    "ids": list(key),
+                    "names": [self.entry_names[key[0]], self.entry_names[key[1]]],
+                    "matched": [term, match["matched"]]
+                    if key[0] == entry_id
+                    else [match["matched"], term],
+                    "score": match["score"],
+                }
+        ranked = sorted(
+            (p for p in pairs.values() if all(i in self.entry_names for i in p["ids"])),
+            key=lambda p: (-p["score"], p["ids"]),
+        )
+        return ranked[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.by_entry),
+            "terms": len(self.terms),
+            "trigrams": len(self.postings),
+        }
+
+
+def get_fuzzy_index() -> FuzzyNameIndex:
+    """Return the current workspace's fuzzy name index."""
+    return current_workspace().service("fuzzy_index", FuzzyNameIndex)
+
+
+async def _on_codex_saved(entry, description) -> None:
+    index = get_fuzzy_index()
+    if index.built:
+        index.set_entry(entry)
+
+
+async def _on_codex_deleted(entry_id) -> None:
+    index = get_fuzzy_index()
+    if index.built:
+        index.remove_entry(entry_id)
+
+
+subscribe("codex_saved", _on_codex_saved)
+subscribe("codex_deleted", _on_codex_deleted)
@@ -0,0 +1,216 @@
+"""Paragraph-level codex mention highlighting with a content-hash cache."""
+
+import asyncio
+import hashlib
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+
+from models import CodexEntry
+
+from .entity_detector import EntityMatcher, entry_terms
+from .file_manager import list_codex_entries, subscribe
+from .workspace import current_workspace
+
+# Paragraph results kept (one per distinct paragraph text)
+MAX_CACHED_PARAGRAPHS = 20000
+# Term changes remembered for partial rescans; older results rescan fully
+MAX_CHANGELOG = 1000
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+
+# (start, end, entry_ids) within one paragraph
+Span = tuple[int, int, tuple[str, ...]]
+
+
+def split_paragraphs(text: str) -> list[tuple[int, str]]:
+    """Split text on blank lines into (offset, paragraph) pairs."""
+    paragraphs = []
+    start = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        paragraphs.append((start, text[start : match.start()]))
+        start = match.end()
+    paragraphs.append((start, text[start:]))
+    return paragraphs
+
+
+def _merge_disjoint(kept: list[Span], added: list[Span]) -> list[Span] | None:
+    """
+    Merge two span lists in text order, or return None if any span of one
+    overlaps a span of the other (leftmost-longest matching could then
+    resolve differently, so only a full scan gives the right answer).
+    """
+    merged = sorted(kept + added)
+    for previous, span in zip(merged, merged[1:]):
+        if span[0] < previous[1]:
+            return None
+    return merged
+
+
+class _Cached:
+    __slots__ = ("generation", "spans")
+
+    def __init__(self, generation: int, spans: list[Span]):
+        self.generation = generation
+        self.spans = spans
+
+
+class ParagraphHighlighter:
+    """
+    Finds codex mentions paragraph by paragraph.
+
+    Results are cached by paragraph content hash, so an edit only costs a
+    scan of the paragraphs it touched. Each change to an entry's names or
+    aliases bumps a generation counter and is logged; a cached result from
+    an older generation is brought up to date by scanning for just the
+    entries changed since. The paragraph is rescanned in full instead if
+    one of them was already mentioned in it, or if a new mention overlaps
+    a kept one, so overlapping names resolve exactly as a fresh scan
+    would.
+    """
+
+    def __init__(self):
+        self.terms: dict[str, tuple[str, ...]] = {}
+        self.generation = 0
+        self.changelog: list[tuple[int, str]] = []
+        self.cache: OrderedDict[bytes, _Cached] = OrderedDict()
+        self.hits = 0
+        self.partial = 0
+        self.misses = 0
+        self.built = False
+        self._matcher: EntityMatcher | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def matcher(self) -> EntityMatcher:
+        if self._matcher is None:
+            self._matcher = EntityMatcher(self.terms)
+        return self._matcher
+
+    async def ensure_built(self) -> None:
+        async with self._lock:
+            if self.built:
+                return
+            for entry in await list_codex_entries():
+                terms = entry_terms(entry)
+                if terms:
+                    self.terms[entry.id] = terms
+            self.built = True
+
+    def set_terms(self, entry_id: str, terms: tuple[str, ...]) -> None:
+        """Record an entry's current terms; log it only if they changed."""
+        if self.terms.get(entry_id, ()) == terms:
+            return
+        if terms:
+            self.terms[entry_id] = terms
+        else:
+            self.terms.pop(entry_id, None)
+        self._matcher = None
+        self.generation += 1
+        self.changelog.append((self.generation, entry_id))
+        if len(self.changelog) > MAX_CHANGELOG:
+            del self.changelog[: len(self.changelog) - MAX_CHANGELOG]
+
+    def _changed_since(self, generation: int) -> set[str] | None:
+        """Entries whose terms changed after `generation` (None: unknown)."""
+        if self.changelog and self.changelog[0][0] > generation + 1:
+            return None
+        at = bisect_right(self.changelog, generation, key=lambda item: item[0])
+        return {entry_id for _, entry_id in self.changelog[at:]}
+
+    def _scan(self, matcher: EntityMatcher, text: str) -> list[Span]:
+        return [
+            (start, end, tuple(entry_ids))
+            for start, end, entry_ids in matcher.spans(text)
+        ]
+
+    def highlight(self, text: str) -> list[Span]:
+        """Mention spans in one paragraph (offsets relative to it)."""
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        cached = self.cache.get(digest)
+
+        if cached is not None and cached.generation == self.generation:
+            self.cache.move_to_end(digest)
+            self.hits += 1
+            return cached.spans
+
+        spans: list[Span] | None = None
+        if cached is not None:
+            changed = self._changed_since(cached.generation)
+            mentioned = {entry_id for span in cached.spans for entry_id in span[2]}
+            if changed is not None and not changed & mentioned:
+                # In self.terms order, so shared terms list their entries
+                # as a full scan would
+                live = {e: t for e, t in self.terms.items() if e in changed}
+                spans = _merge_disjoint(
+                    cached.spans, self._scan(EntityMatcher(live), text)
+                )
+                if spans is not None:
+                    self.partial += 1
+        if spans is None:
+            self.misses += 1
+            spans = self._scan(self.matcher, text)
+
+        self.cache[digest] = _Cached(self.generation, spans)
+        self.cache.move_to_end(digest)
+        if len(self.cache) > MAX_CACHED_PARAGRAPHS:
+            self.cache.popitem(last=False)
+        return spans
+
+    def stats(self) -> dict:
+        return {
+            "paragraphs": len(self.cache),
+            "hits": self.hits,
+            "partial": self.partial,
+            "misses": self.misses,
+            "generation": self.generation,
+        }
+
+
+def get_highlighter() -> ParagraphHighlighter:
+    """Return the current workspace's paragraph highlighter."""
+    return current_workspace().service("highlighter", ParagraphHighlighter)
+
+
+async def highlight_paragraphs(
+    paragraphs: list[str], first_index: int = 0
+) -> list[dict]:
+    """
+    Mention spans for a run of paragraphs.
+
+    Args:
+        paragraphs: Paragraph texts (only the ones that changed)
+        first_index: Index of the first paragraph within the scene
+
+    Returns:
+        List of {"index", "spans": [{"start", "end", "entries"}]} dicts,
+        with offsets relative to each paragraph
+    """
+    highlighter = get_highlighter()
+    await highlighter.ensure_built()
+    return [
+        {
+            "index": first_index + i,
+            "spans": [
+                {"start": start, "end": end, "entries": list(entry_ids)}
+                for start, end, entry_ids in highlighter.highlight(text)
+            ],
+        }
+        for i, text in enumerate(paragraphs)
+    ]
+
+
+async def _on_codex_saved(entry: CodexEntry, description) -> None:
+    highlighter = get_highlighter()
+    if highlighter.built:
+        highlighter.set_terms(entry.id, entry_terms(entry))
+
+
+async def _on_codex_deleted(entry_id) -> None:
+    highlighter = get_highlighter()
+    if highlighter.built:
+        highlighter.set_terms(entry_id, ())
+
+
+subscribe("codex_saved", _on_codex_saved)
+subscribe("codex_deleted", _on_codex_deleted)
@@ -0,0 +1,288 @@
+"""Sorted in-memory indexes behind paginated codex and scene listings."""
+
+import asyncio
+import base64
+import json
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Iterable
+
+from .file_manager import (
+    get_scene,
+    list_codex_entries,
+    list_scene_paths,
+    scene_key,
+    subscribe,
+)
+from .workspace import current_workspace
+
+
+def encode_cursor(sort: str, value: Any, item_id: str) -> str:
+    """Opaque cursor pointing just past (value, item_id) in `sort` order."""
+    raw = json.dumps([sort, value, item_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, Any, str]:
+    """
+    Decode a cursor from encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort, value, item_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    return sort, value, str(item_id)
+
+
+def project(payload: dict, fields: set[str] | None, keep: Iterable[str]) -> dict:
+    """
+    Restrict a payload to the requested fields (plus identity fields),
+    dropping index-internal fields (leading underscore).
+    """
+    wanted = fields | set(keep) if fields else None
+    return {
+        name: value
+        for name, value in payload.items()
+        if not name.startswith("_") and (wanted is None or name in wanted)
+    }
+
+
+class ListingIndex:
+    """
+    Items kept in one sorted (value, id) list per sort key, so a page is a
+    bisect to the cursor followed by a walk that stops once the page is
+    full. Filters are applied during the walk; nothing else is materialized.
+    """
+
+    def __init__(self, sort_keys: dict[str, Callable[[dict], Any]]):
+        self.sort_keys = sort_keys
+        self.items: dict[str, dict] = {}
+        self.sorted: dict[str, list[tuple[Any, str]]] = {
+            name: [] for name in sort_keys
+        }
+        self._values: dict[str, dict[str, Any]] = {name: {} for name in sort_keys}
+
+    def put(self, item_id: str, item: dict) -> None:
+        self.remove(item_id)
+        self.items[item_id] = item
+        for name, key in self.sort_keys.items():
+            value = key(item)
+            self._values[name][item_id] = value
+            insort(self.sorted[name], (value, item_id))
+
+    def remove(self, item_id: str) -> None:
+        if self.items.pop(item_id, None) is None:
+            return
+        for name in self.sort_keys:
+            value = self._values[name].pop(item_id)
+            entries = self.sorted[name]
+            index = bisect_left(entries, (value, item_id))
+            if index < len(entries) and entries[index] == (value, item_id):
+                del entries[index]
+
+    def resort(self, name: str) -> None:
+        """Recompute one sort key for every item (its inputs changed)."""
+        key = self.sort_keys[name]
+        self._values[name] = {
+            item_id: key(item) for item_id, item in self.items.items()
+        }
+        self.sorted[name] = sorted(
+            (value, item_id) for item_id, value in self._values[name].items()
+        )
+
+    def page(
+        self,
+        sort: str,
+        descending: bool = False,
+        cursor: str | None = None,
+        limit: int | None = None,
+        predicate: Callable[[dict], bool] | None = None,
+    ) -> tuple[list[dict], str | None]:
+        """
+        Return one page of items and the cursor for the next page (None
+        when this is the last page).
+
+        Raises:
+            ValueError: On an unknown sort key or a cursor for another sort
+        """
+        if sort not in self.sorted:
+            raise ValueError(f"Unknown sort '{sort}'")
+        entries = self.sorted[sort]
+        cursor_name = f"-{sort}" if descending else sort
+
+        if cursor:
+            name, value, item_id = decode_cursor(cursor)
+            if name != cursor_name:
+                raise ValueError("Cursor belongs to a different sort order")
+            if descending:
+                start = bisect_left(entries, (value, item_id)) - 1
+            else:
+                start = bisect_right(entries, (value, item_id))
+        else:
+            start = len(entries) - 1 if descending else 0
+
+        step = -1 if descending else 1
+        results: list[dict] = []
+        position = start
+        last: tuple[Any, str] | None = None
+        while 0 <= position < len(entries):
+            value, item_id = entries[position]
+            position += step
+            item = self.items[item_id]
+            if predicate is not None and not predicate(item):
+                continue
+            if limit is not None and len(results) == limit:
+                # There is at least one more match: hand out a cursor
+                return results, encode_cursor(cursor_name, *last)
+            results.append(item)
+            last = (value, item_id)
+
+        return results, None
+
+
+# ============================================================================
+# Codex Listing
+# ============================================================================
+
+
+class CodexListing:
+    """Listing index over codex entry payloads (API representation)."""
+
+    SORTS = ("name", "created", "modified")
+
+    def __init__(self):
+        self.index = ListingIndex(
+            {
+                "name": lambda item: item["name"].lower(),
+                "created": lambda item: item["_created_ts"],
+                "modified": lambda item: item["_modified_ts"],
+            }
+        )
+        self.built = False
+        self._lock = asyncio.Lock()
+
+    def put(self, entry) -> None:
+        payload = entry.model_dump(mode="json", by_alias=True)
+        # Sort on real timestamps: ISO strings with and without fractional
+        # seconds don't compare correctly as text.
+        payload["_created_ts"] = entry.created.timestamp()
+        payload["_modified_ts"] = entry.modified.timestamp()
+        self.index.put(entry.id, payload)
+
+    async def ensure_built(self) -> None:
+        async with self._lock:
+            if self.built:
+                return
+            for entry in await list_codex_entries():
+                self.put(entry)
+            self.built = True
+
+
+def get_codex_listing() -> CodexListing:
+    """Return the current workspace's codex listing index."""
+    return current_workspace().service("codex_listing", CodexListing)
+
+
+# ============================================================================
+# Scene Listing
+# ============================================================================
+
+
+class SceneListing:
+    """Listing index over scene metadata, including reading-order position."""
+
+    SORTS = ("position", "title", "modified", "wordCount")
+
+    def __init__(self):
+        self.order: dict[str, int] = {}
+        self.index = ListingIndex(
+            {
+                "position": lambda item: self.order.get(
+                    item["key"], len(self.order)
+                ),
+                "title": lambda item: item["title"].lower(),
+                "modified": lambda item: item["_modified_ts"],
+                "wordCount": lambda item: item["wordCount"],
+            }
+        )
+        self.built = False
+        self._lock = asyncio.Lock()
+
+    def put(self, book_id: str, act_id: str, chapter_id: str, scene) -> None:
+        payload = scene.model_dump(mode="json", by_alias=True)
+        payload.pop("content", None)
+        payload["key"] = scene_key(book_id, act_id, chapter_id, scene.id)
+        payload["bookId"] = book_id
+        payload["actId"] = act_id
+        payload["chapterId"] = chapter_id
+        payload["_modified_ts"] = scene.modified.timestamp()
+        self.index.put(payload["key"], payload)
+
+    async def refresh_order(self) -> None:
+        """Re-read reading order (after scenes are added, removed or moved)."""
+        paths = await list_scene_paths()
+        self.order = {scene_key(*path): i for i, path in enumerate(paths)}
+        self.index.resort("position")
+
+    async def ensure_built(self) -> None:
+        async with self._lock:
+            if self.built:
+                return
+            paths = await list_scene_paths()
+            self.order = {scene_key(*path): i for i, path in enumerate(paths)}
+            for path in paths:
+                scene = await get_scene(*path)
+                if scene:
+                    self.put(*path[:3], scene)
+            self.built = True
+
+
+def get_scene_listing() -> SceneListing:
+    """Return the current workspace's scene listing index."""
+    return current_workspace().service("scene_listing", SceneListing)
+
+
+async def _on_codex_saved(entry, description) -> None:
+    listing = get_codex_listing()
+    if listing.built:
+        listing.put(entry)
+
+
+async def _on_codex_deleted(entry_id) -> None:
+    listing = get_codex_listing()
+    if listing.built:
+        listing.index.remove(entry_id)
+
+
+async def _on_scene_saved(book_id, act_id, chapter_id, scene, content) -> None:
+    listing = get_scene_listing()
+    if not listing.built:
+        return
+    key = scene_key(book_id, act_id, chapter_id, scene.id)
+    is_new = key not in listing.index.items
+    listing.put(book_id, act_id, chapter_id, scene)
+    if is_new:
+        await listing.refresh_order()
+
+
+async def _on_scene_deleted(book_id, act_id, chapter_id, scene_id) -> None:
+    listing = get_scene_listing()
+    if listing.built:
+        listing.index.remove(scene_key(book_id, act_id, chapter_id, scene_id))
+        await listing.refresh_order()
+
+
+async def _on_chapter_saved(book_id, act_id, chapter) -> None:
+    listing = get_scene_listing()
+    if listing.built:
+        await listing.refresh_order()
+
+
+subscribe("codex_saved", _on_codex_saved)
+subscribe("codex_deleted", _on_codex_deleted)
+subscribe("scene_saved", _on_scene_saved)
+subscribe("scene_deleted", _on_scene_deleted)
+subscribe("chapter_saved", _on_chapter_saved)
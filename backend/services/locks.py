@@ -0,0 +1,105 @@
+"""Async locks keyed by resource path."""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from .metrics import get_metrics
+from .workspace import current_workspace
+
+
+def chapter_resource(book_id: str, act_id: str, chapter_id: str) -> str:
+    """Lock key for a chapter's meta.json."""
+    return f"manuscript/{book_id}/{act_id}/{chapter_id}"
+
+
+def scene_resource(book_id: str, act_id: str, chapter_id: str, scene_id: str) -> str:
+    """Lock key for a scene's .json and .md files."""
+    return f"manuscript/{book_id}/{act_id}/{chapter_id}/{scene_id}"
+
+
+def codex_resource(entry_id: str) -> str:
+    """Lock key for a codex entry's files."""
+    return f"codex/{entry_id}"
+
+
+class _Slot:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class LockManager:
+    """
+    One asyncio.Lock per resource path, created on demand and dropped when
+    no one holds or waits for it, so memory tracks live contention only.
+
+    Writes to different resources proceed in parallel; read-modify-write
+    sequences on the same resource are serialized. Time spent waiting is
+    recorded per resource kind (first path segment, plus "chapter" or
+    "scene" for manuscript paths) as "lock_wait.<kind>" in seconds.
+    """
+
+    def __init__(self):
+        self._slots: dict[str, _Slot] = {}
+        self.contended = 0
+
+    @staticmethod
+    def _kind(resource: str) -> str:
+        parts = resource.split("/")
+        if parts[0] == "manuscript":
+            return "scene" if len(parts) == 5 else "chapter"
+        return parts[0]
+
+    @asynccontextmanager
+    async def hold(self, *resources: str) -> AsyncIterator[None]:
+        """
+        Hold the locks for all given resources. Locks are always taken in
+        sorted order, so callers holding several never deadlock.
+        """
+        keys = sorted(set(resources))
+        registered: list[str] = []
+        held: set[str] = set()
+        try:
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    slot = self._slots[key] = _Slot()
+                slot.users += 1
+                registered.append(key)
+                started = time.perf_counter()
+                if slot.lock.locked():
+                    self.contended += 1
+                await slot.lock.acquire()
+                held.add(key)
+                get_metrics().observe(
+                    f"lock_wait.{self._kind(key)}", time.perf_counter() - started
+                )
+            yield
+        finally:
+            # Also runs if cancelled while waiting: only release what we got
+            for key in reversed(registered):
+                slot = self._slots[key]
+                if key in held:
+                    slot.lock.release()
+                slot.users -= 1
+                if slot.users == 0:
+                    del self._slots[key]
+
+    def snapshot(self) -> dict:
+        return {
+            "held": sum(1 for slot in self._slots.values() if slot.lock.locked()),
+            "waiting": sum(
+                slot.users - (1 if slot.lock.locked() else 0)
+                for slot in self._slots.values()
+            ),
+            "contended": self.contended,
+        }
+
+
+def get_lock_manager() -> LockManager:
+    """Return the current workspace's lock manager."""
+    return current_workspace().service("lock_manager", LockManager)
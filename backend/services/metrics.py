@@ -0,0 +1,96 @@
+"""In-process metrics: counters and timing summaries."""
+
+import asyncio
+import time
+from collections import deque
+
+# Observations kept per series for percentiles
+WINDOW = 1024
+# Seconds between event-loop lag samples
+LOOP_LAG_INTERVAL = 0.05
+
+
+class Series:
+    """Summary of a timing or size series (all-time totals, recent quantiles)."""
+
+    __slots__ = ("count", "total", "max", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: deque[float] = deque(maxlen=WINDOW)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.recent)
+
+        def quantile(q: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": quantile(0.5),
+            "p95": quantile(0.95),
+            "p99": quantile(0.99),
+            "max": self.max,
+        }
+
+
+class Metrics:
+    """Named counters and series, reported by GET /api/metrics."""
+
+    def __init__(self):
+        self.counters: dict[str, int] = {}
+        self.series: dict[str, Series] = {}
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float) -> None:
+        series = self.series.get(name)
+        if series is None:
+            series = self.series[name] = Series()
+        series.observe(value)
+
+    def snapshot(self) -> dict:
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "series": {
+                name: series.snapshot()
+                for name, series in sorted(self.series.items())
+            },
+        }
+
+
+_metrics: Metrics | None = None
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics registry."""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL) -> None:
+    """
+    Sample event-loop lag until cancelled: how much later than asked a
+    sleep wakes up, observed as the "loop_lag" series (seconds). Anything
+    blocking the loop (CPU-bound work, sync I/O) shows up here.
+    """
+    metrics = get_metrics()
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = time.perf_counter() - started - interval
+        metrics.observe("loop_lag", max(lag, 0.0))
@@ -0,0 +1,288 @@
+"""Precomputed scene x codex-entry occurrence matrix."""
+
+import asyncio
+from array import array
+
+from models import CodexEntry
+
+from .entity_detector import EntityMatcher, entry_terms
+from .file_manager import (
+    get_scene_content,
+    list_codex_entries,
+    list_scene_paths,
+    scene_key,
+    subscribe,
+)
+from .workspace import current_workspace
+
+
+class _Row:
+    """
+    Sparse row: parallel arrays sorted by column index, and the scene's
+    mention spans as flat (start, end) pairs in text order.
+    """
+
+    __slots__ = ("cols", "counts", "firsts", "spans")
+
+    def __init__(
+        self, found: dict[int, tuple[int, int]], spans: list[tuple[int, int]]
+    ):
+        ordered = sorted(found.items())
+        self.cols = array("I", (col for col, _ in ordered))
+        self.counts = array("I", (count for _, (count, _) in ordered))
+        self.firsts = array("I", (first for _, (_, first) in ordered))
+        self.spans = array("I", (offset for span in spans for offset in span))
+
+
+class OccurrenceMatrix:
+    """
+    Mention counts and first-mention offsets for every (scene, entry) pair.
+
+    Rows are keyed by scene key and stored as compact sparse arrays.
+    Saving a scene rescans only that scene. Changing an entry's name or
+    aliases (or deleting it) is applied on the next read, not on the save:
+    each scene is scanned for just the changed entries' terms and their
+    mentions merged into its row. As overlapping terms match
+    leftmost-longest, a row is rescanned in full instead if a changed
+    entry was already mentioned in it, or if a new mention overlaps a kept
+    one, so it comes out exactly as a fresh scan would.
+    """
+
+    def __init__(self):
+        # Entry ID per column; None marks a deleted entry's column
+        self.columns: list[str | None] = []
+        self.col_index: dict[str, int] = {}
+        self.col_types: dict[str, str] = {}
+        self.terms: dict[str, tuple[str, ...]] = {}
+        self.rows: dict[str, _Row] = {}
+        # Columns of entries whose terms changed since the rows were scanned
+        self.changed: set[int] = set()
+        self.scene_order: list[str] | None = None
+        self._matcher: EntityMatcher | None = None
+        self.built = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def matcher(self) -> EntityMatcher:
+        if self._matcher is None:
+            self._matcher = EntityMatcher(self.terms)
+        return self._matcher
+
+    def _column_for(self, entry_id: str) -> int:
+        if entry_id not in self.col_index:
+            self.col_index[entry_id] = len(self.columns)
+            self.columns.append(entry_id)
+        return self.col_index[entry_id]
+
+    def _found(self, spans: list[tuple[int, int, list[str]]]) -> dict:
+        """Mention count and first offset by column, from matcher spans."""
+        found: dict[int, tuple[int, int]] = {}
+        for start, _, entry_ids in spans:
+            for entry_id in entry_ids:
+                col = self.col_index[entry_id]
+                count, first = found.get(col, (0, start))
+                found[col] = (count + 1, first)
+        return found
+
+    def _row_from_text(self, text: str) -> _Row:
+        spans = self.matcher.spans(text)
+        return _Row(self._found(spans), [(start, end) for start, end, _ in spans])
+
+    def _merged_row(
+        self, row: _Row, text: str, changed: set[int], matcher: EntityMatcher
+    ) -> _Row:
+        """
+        A row brought up to date with the changed columns, scanning `text`
+        for just their terms (`matcher`) unless a full rescan is needed.
+        """
+        if not changed.isdisjoint(row.cols):
+            return self._row_from_text(text)
+        added = matcher.spans(text)
+        if not added:
+            return row
+        # An entry deleted since the scan started is rescanned without
+        if any(e not in self.col_index for _, _, ids in added for e in ids):
+            return self._row_from_text(text)
+        spans = sorted(
+            [*zip(row.spans[::2], row.spans[1::2])]
+            + [(start, end) for start, end, _ in added]
+        )
+        for (_, previous_end), (start, _) in zip(spans, spans[1:]):
+            if start < previous_end:
+                return self._row_from_text(text)
+        found = dict(zip(row.cols, zip(row.counts, row.firsts)))
+        found.update(self._found(added))
+        return _Row(found, spans)
+
+    async def ensure_built(self) -> None:
+        """Build the whole matrix on first use."""
+        async with self._lock:
+            if self.built:
+                return
+            for entry in await list_codex_entries():
+                self._set_entry(entry)
+            for path in await list_scene_paths():
+                content = await get_scene_content(*path)
+                self.rows[scene_key(*path)] = self._row_from_text(content or "")
+            self.built = True
+
+    def _set_entry(self, entry: CodexEntry) -> bool:
+        """Record an entry's terms. Return True if its terms changed."""
+        self._column_for(entry.id)
+        self.col_types[entry.id] = entry.type.value
+        terms = entry_terms(entry)
+        if self.terms.get(entry.id) == terms:
+            return False
+        self.terms[entry.id] = terms
+        self._matcher = None
+        return True
+
+    async def update_scene(self, key: str, content: str) -> None:
+        """Recompute a single scene's row."""
+        async with self._lock:
+            if not self.built:
+                return
+            if key not in self.rows:
+                self.scene_order = None
+            self.rows[key] = self._row_from_text(content)
+
+    def remove_scene(self, key: str) -> None:
+        if self.rows.pop(key, None) is not None:
+            self.scene_order = None
+
+    async def update_entry(self, entry: CodexEntry) -> None:
+        """Note the entry's column for refresh if its names changed."""
+        if not self.built:
+            return
+        async with self._lock:
+            if self._set_entry(entry):
+                self.changed.add(self.col_index[entry.id])
+
+    def remove_entry(self, entry_id: str) -> None:
+        col = self.col_index.pop(entry_id, None)
+        if col is None:
+            return
+        self.columns[col] = None
+        self.terms.pop(entry_id, None)
+        self.col_types.pop(entry_id, None)
+        self._matcher = None
+        # Rows mentioning it are rescanned: it may have hidden others
+        self.changed.add(col)
+
+    async def _refresh(self) -> None:
+        """Bring every row up to date with the entries changed since."""
+        async with self._lock:
+            if not self.changed:
+                return
+            changed, self.changed = self.changed, set()
+            # In self.terms order, so shared terms list their entries as a
+            # full scan would
+            matcher = EntityMatcher(
+                {
+                    entry_id: terms
+                    for entry_id, terms in self.terms.items()
+                    if self.col_index[entry_id] in changed
+                }
+            )
+            for key in list(self.rows):
+                row = self.rows[key]
+                if matcher.pattern is None and changed.isdisjoint(row.cols):
+                    continue
+                content = await get_scene_content(*key.split("/"))
+                # Skip scenes deleted while their content was read
+                row = self.rows.get(key)
+                if row is not None:
+                    self.rows[key] = self._merged_row(
+                        row, content or "", changed, matcher
+                    )
+
+    async def compact(self, types: set[str] | None = None) -> dict:
+        """
+        Encode the matrix in CSR form.
+
+        Returns:
+            Dict with `scenes` (row keys in reading order), `entries`
+            (column entry IDs), `types`, and the CSR arrays `indptr`,
+            `indices`, `counts` and `firstOffsets`: row i's mentions are
+            at positions indptr[i]..indptr[i+1] of the other three arrays.
+        """
+        await self.ensure_built()
+        await self._refresh()
+        if self.scene_order is None:
+            self.scene_order = [
+                key
+                for key in (scene_key(*path) for path in await list_scene_paths())
+                if key in self.rows
+            ]
+
+        # Output columns: live entries, optionally filtered by type
+        out_cols: dict[int, int] = {}
+        entries = []
+        entry_types = []
+        for col, entry_id in enumerate(self.columns):
+            if entry_id is None:
+                continue
+            if types and self.col_types[entry_id] not in types:
+                continue
+            out_cols[col] = len(entries)
+            entries.append(entry_id)
+            entry_types.append(self.col_types[entry_id])
+
+        indptr = [0]
+        indices: list[int] = []
+        counts: list[int] = []
+        firsts: list[int] = []
+        for key in self.scene_order:
+            row = self.rows[key]
+            for i, col in enumerate(row.cols):
+                if col in out_cols:
+                    indices.append(out_cols[col])
+                    counts.append(row.counts[i])
+                    firsts.append(row.firsts[i])
+            indptr.append(len(indices))
+
+        return {
+            "scenes": self.scene_order,
+            "entries": entries,
+            "types": entry_types,
+            "indptr": indptr,
+            "indices": indices,
+            "counts": counts,
+            "firstOffsets": firsts,
+        }
+
+
+def get_occurrence_matrix() -> OccurrenceMatrix:
+    """Return the current workspace's occurrence matrix."""
+    return current_workspace().service("occurrence_matrix", OccurrenceMatrix)
+
+
+async def _on_scene_saved(book_id, act_id, chapter_id, scene, content) -> None:
+    key = scene_key(book_id, act_id, chapter_id, scene.id)
+    await get_occurrence_matrix().update_scene(key, content)
+
+
+async def _on_scene_deleted(book_id, act_id, chapter_id, scene_id) -> None:
+    get_occurrence_matrix().remove_scene(
+        scene_key(book_id, act_id, chapter_id, scene_id)
+    )
+
+
+async def _on_chapter_saved(book_id, act_id, chapter) -> None:
+    # Scene order may have changed
+    get_occurrence_matrix().scene_order = None
+
+
+async def _on_codex_saved(entry, description) -> None:
+    await get_occurrence_matrix().update_entry(entry)
+
+
+async def _on_codex_deleted(entry_id) -> None:
+    get_occurrence_matrix().remove_entry(entry_id)
+
+
+subscribe("scene_saved", _on_scene_saved)
+subscribe("scene_deleted", _on_scene_deleted)
+subscribe("chapter_saved", _on_chapter_saved)
+subscribe("codex_saved", _on_codex_saved)
+subscribe("codex_deleted", _on_codex_deleted)
@@ -0,0 +1,234 @@
+"""BM25 index over manuscript paragraphs for retrieving earlier passages."""
+
+import asyncio
+import math
+import re
+from collections import Counter
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from .file_manager import get_scene_content, list_scene_paths, scene_key, subscribe
+from .fuzzy_index import normalize
+from .workspace import current_workspace
+
+# BM25 term-frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+# Paragraphs with fewer indexed words than this aren't worth retrieving
+MIN_PASSAGE_TERMS = 3
+
+_WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_STOPWORDS = frozenset(
+    """
+    a about after all also an and any are as at be been but by can could
+    did do does for from had has have he her hers him his how i if in into
+    is it its just me my no not now of on or our out she so than that the
+    their them then there these they this those to too up us was we were
+    what when where which while who will with would you your
+    """.split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Indexable words of a text: normalized, without stopwords."""
+    text = text.replace("’", "'")
+    # Accent stripping is the slow part; most prose doesn't need it
+    words = _WORD.findall(text.casefold() if text.isascii() else normalize(text))
+    return [
+        word.removesuffix("'s")
+        for word in words
+        if word not in _STOPWORDS and len(word) > 1
+    ]
+
+
+def split_paragraphs(content: str) -> list[str]:
+    """Paragraphs of scene prose (blank-line separated), stripped."""
+    return [p.strip() for p in _PARAGRAPH_BREAK.split(content) if p.strip()]
+
+
+class Passage(NamedTuple):
+    """An indexed paragraph."""
+
+    scene: str
+    paragraph: int
+    text: str
+    terms: tuple[str, ...]
+
+
+class PassageIndex:
+    """
+    BM25 index over every paragraph of scene prose.
+
+    Postings map each term to the passage slots containing it and their
+    term frequencies; a query scores all passages at once with numpy, one
+    vectorized update per query term. Saving a scene replaces only that
+    scene's passages. Slots are never reused while the index is live;
+    once most are dead, the index is renumbered.
+    """
+
+    def __init__(self):
+        self.passages: dict[int, Passage] = {}
+        self.postings: dict[str, dict[int, int]] = {}
+        self.by_scene: dict[str, list[int]] = {}
+        self.total_length = 0
+        self.built = False
+        self._next_slot = 0
+        # Indexed word count per slot (0 once removed)
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        # Posting arrays for numpy, rebuilt lazily after a term changes
+        self._arrays: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._lock = asyncio.Lock()
+
+    async def ensure_built(self) -> None:
+        async with self._lock:
+            if self.built:
+                return
+            for path in await list_scene_paths():
+                content = await get_scene_content(*path)
+                self.set_scene(scene_key(*path), content or "")
+            self.built = True
+
+    def set_scene(self, key: str, content: str) -> None:
+        """Index (or re-index) a scene's paragraphs."""
+        self.remove_scene(key)
+        if self._next_slot > 2 * len(self.passages) + 1024:
+            self._renumber()
+        slots = []
+        for i, text in enumerate(split_paragraphs(content)):
+            terms = tokenize(text)
+            if len(terms) >= MIN_PASSAGE_TERMS:
+                slots.append(self._add(Passage(key, i, text, tuple(terms))))
+        if slots:
+            self.by_scene[key] = slots
+
+    def _add(self, passage: Passage) -> int:
+        slot = self._next_slot
+        self._next_slot += 1
+        if slot >= len(self._lengths):
+            self._lengths = np.resize(self._lengths, 2 * len(self._lengths))
+        self._lengths[slot] = len(passage.terms)
+        self.total_length += len(passage.terms)
+        self.passages[slot] = passage
+        for term, tf in Counter(passage.terms).items():
+            self.postings.setdefault(term, {})[slot] = tf
+            self._arrays.pop(term, None)
+        return slot
+
+    def remove_scene(self, key: str) -> None:
+        for slot in self.by_scene.pop(key, []):
+            passage = self.passages.pop(slot)
+            self._lengths[slot] = 0
+            self.total_length -= len(passage.terms)
+            for term in set(passage.terms):
+                self._arrays.pop(term, None)
+                posting = self.postings[term]
+                del posting[slot]
+                if not posting:
+                    del self.postings[term]
+
+    def _renumber(self) -> None:
+        """Reassign slots densely, dropping the dead ones."""
+        passages = list(self.passages.values())
+        self.passages.clear()
+        self.postings.clear()
+        self.by_scene.clear()
+        self._arrays.clear()
+        self._next_slot = 0
+        self.total_length = 0
+        self._lengths[:] = 0
+        for passage in passages:
+            slot = self._add(passage)
+            self.by_scene.setdefault(passage.scene, []).append(slot)
+
+    def _posting_arrays(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            posting = self.postings[term]
+            arrays = (
+                np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                np.fromiter(posting.values(), dtype=np.float32, count=len(posting)),
+            )
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        allow: Callable[[str], bool] | None = None,
+    ) -> list[dict]:
+        """
+        Passages most relevant to the query by BM25, best first.
+
+        Args:
+            query: Free text (e.g. the current beat or character names)
+            limit: Maximum number of passages to return
+            allow: Predicate on scene keys; passages from scenes it
+                rejects are skipped (e.g. scenes after the current one)
+
+        Returns:
+            List of {"scene", "paragraph", "text", "score"} dicts, where
+            `paragraph` is the index among the scene's paragraphs
+        """
+        terms = {term for term in tokenize(query) if term in self.postings}
+        if not terms or not self.passages:
+            return []
+
+        n = self._next_slot
+        count = len(self.passages)
+        norm = K1 * (1 - B + B * self._lengths[:n] * (count / self.total_length))
+        scores = np.zeros(n, dtype=np.float32)
+        for term in terms:
+            slots, tfs = self._posting_arrays(term)
+            df = len(slots)
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            scores[slots] += idf * tfs * (K1 + 1) / (tfs + norm[slots])
+
+        hits = np.flatnonzero(scores > 0)
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        results = []
+        for slot in hits.tolist():
+            passage = self.passages[slot]
+            if allow is not None and not allow(passage.scene):
+                continue
+            results.append(
+                {
+                    "scene": passage.scene,
+                    "paragraph": passage.paragraph,
+                    "text": passage.text,
+                    "score": round(float(scores[slot]), 3),
+                }
+            )
+            if len(results) >= limit:
+                break
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "scenes": len(self.by_scene),
+            "passages": len(self.passages),
+            "terms": len(self.postings),
+        }
+
+
+def get_passage_index() -> PassageIndex:
+    """Return the current workspace's passage index."""
+    return current_workspace().service("passage_index", PassageIndex)
+
+
+async def _on_scene_saved(book_id, act_id, chapter_id, scene, content) -> None:
+    index = get_passage_index()
+    if index.built:
+        index.set_scene(scene_key(book_id, act_id, chapter_id, scene.id), content)
+
+
+async def _on_scene_deleted(book_id, act_id, chapter_id, scene_id) -> None:
+    index = get_passage_index()
+    if index.built:
+        index.remove_scene(scene_key(book_id, act_id, chapter_id, scene_id))
+
+
+subscribe("scene_saved", _on_scene_saved)
+subscribe("scene_deleted", _on_scene_deleted)
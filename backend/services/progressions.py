@@ -0,0 +1,279 @@
+"""Position-indexed codex progressions for spoiler-aware descriptions."""
+
+import asyncio
+from bisect import bisect_right
+
+from models import CodexEntry
+
+from .file_manager import (
+    list_codex_entries,
+    list_scene_paths,
+    scene_key,
+    subscribe,
+)
+from .workspace import current_workspace
+
+# (book, act, chapter, scene) ordinals in reading order
+Position = tuple[int, int, int, int]
+
+
+class ManuscriptPositions:
+    """
+    Scene key -> reading-order position.
+
+    Reordering scenes within a chapter only renumbers that chapter's
+    scenes; structural changes (new books, acts or chapters) rebuild.
+    """
+
+    def __init__(self):
+        self.positions: dict[str, Position] = {}
+        self.keys_by_scene_id: dict[str, list[str]] = {}
+        self.chapters: dict[str, tuple[int, int, int]] = {}
+
+    async def rebuild(self) -> set[str]:
+        """Recompute every position. Return the keys whose position changed."""
+        old = self.positions
+        self.positions = {}
+        self.keys_by_scene_id = {}
+        self.chapters = {}
+
+        ordinals: dict[tuple[str, ...], int] = {}
+        children: dict[tuple[str, ...], int] = {}
+
+        def ordinal(path: tuple[str, ...]) -> int:
+            # Position of a book/act/chapter among its siblings
+            if path not in ordinals:
+                parent = path[:-1]
+                ordinals[path] = children.get(parent, 0)
+                children[parent] = ordinals[path] + 1
+            return ordinals[path]
+
+        for book_id, act_id, chapter_id, scene_id in await list_scene_paths():
+            prefix = (
+                ordinal((book_id,)),
+                ordinal((book_id, act_id)),
+                ordinal((book_id, act_id, chapter_id)),
+            )
+            index = children.get((book_id, act_id, chapter_id), 0)
+            children[(book_id, act_id, chapter_id)] = index + 1
+
+            self.chapters[f"{book_id}/{act_id}/{chapter_id}"] = prefix
+            key = scene_key(book_id, act_id, chapter_id, scene_id)
+            self._set(key, (*prefix, index))
+
+        return {
+            key
+            for key in old.keys() | self.positions.keys()
+            if old.get(key) != self.positions.get(key)
+        }
+
+    def _set(self, key: str, position: Position) -> None:
+        self.positions[key] = position
+        scene_id = key.rsplit("/", 1)[1]
+        keys = self.keys_by_scene_id.setdefault(scene_id, [])
+        if key not in keys:
+            keys.append(key)
+
+    def _chapter_keys(self, chapter_path: str) -> list[str]:
+        prefix = self.chapters[chapter_path]
+        return sorted(
+            (key for key, pos in self.positions.items() if pos[:3] == prefix),
+            key=lambda key: self.positions[key],
+        )
+
+    def _renumber(self, chapter_path: str, ordered: list[str]) -> set[str]:
+        prefix = self.chapters[chapter_path]
+        changed = set()
+        for index, key in enumerate(ordered):
+            if self.positions.get(key) != (*prefix, index):
+                self._set(key, (*prefix, index))
+                changed.add(key)
+        return changed
+
+    def reorder_chapter(
+        self, chapter_path: str, scene_ids: list[str]
+    ) -> set[str] | None:
+        """
+        Renumber a known chapter's scenes to follow `scene_ids`; scenes not
+        listed keep their relative order after the listed ones.
+        Return the keys whose position changed, or None if the chapter is
+        unknown (the caller should rebuild).
+        """
+        if chapter_path not in self.chapters:
+            return None
+        existing = self._chapter_keys(chapter_path)
+        listed = [f"{chapter_path}/{scene_id}" for scene_id in scene_ids]
+        ordered = [key for key in listed if key in existing]
+        ordered += [key for key in existing if key not in listed]
+        return self._renumber(chapter_path, ordered)
+
+    def add_scene(self, key: str) -> set[str] | None:
+        """
+        Give a new scene the last position in its chapter.
+        Return the changed keys, or None if the chapter is unknown.
+        """
+        if key in self.positions:
+            return set()
+        chapter_path = key.rsplit("/", 1)[0]
+        if chapter_path not in self.chapters:
+            return None
+        return self._renumber(
+            chapter_path, [*self._chapter_keys(chapter_path), key]
+        )
+
+    def remove_scene(self, key: str) -> set[str]:
+        """Drop a scene and close the gap it leaves. Return changed keys."""
+        if self.positions.pop(key, None) is None:
+            return set()
+        scene_id = key.rsplit("/", 1)[1]
+        keys = self.keys_by_scene_id.get(scene_id, [])
+        if key in keys:
+            keys.remove(key)
+        chapter_path = key.rsplit("/", 1)[0]
+        return {key} | self._renumber(
+            chapter_path, self._chapter_keys(chapter_path)
+        )
+
+    def resolve_key(self, scene: str) -> str | None:
+        """Accept a full scene key or a bare scene ID if it is unambiguous."""
+        if scene in self.positions:
+            return scene
+        keys = self.keys_by_scene_id.get(scene, [])
+        return keys[0] if len(keys) == 1 else None
+
+
+class ProgressionIndex:
+    """
+    Per-entry sorted interval index of progressions.
+
+    Each entry's progressions are kept sorted by manuscript position, so
+    "description as of scene X" is one binary search. A progression holds
+    from its scene up to (not including) the next progression's scene.
+    """
+
+    def __init__(self):
+        self.manuscript = ManuscriptPositions()
+        self.progressions: dict[str, list[tuple[str, str]]] = {}
+        self.sorted: dict[str, tuple[list[Position], list[str]]] = {}
+        self.entries_by_scene: dict[str, set[str]] = {}
+        self.built = False
+        self._lock = asyncio.Lock()
+
+    async def ensure_built(self) -> None:
+        async with self._lock:
+            if self.built:
+                return
+            await self.manuscript.rebuild()
+            for entry in await list_codex_entries():
+                self.set_entry(entry)
+            self.built = True
+
+    def _sort_entry(self, entry_id: str) -> None:
+        anchored = [
+            (self.manuscript.positions[key], description)
+            for key, description in self.progressions.get(entry_id, [])
+            if key in self.manuscript.positions
+        ]
+        if not anchored:
+            self.sorted.pop(entry_id, None)
+            return
+        anchored.sort(key=lambda item: item[0])
+        self.sorted[entry_id] = (
+            [position for position, _ in anchored],
+            [description for _, description in anchored],
+        )
+
+    def set_entry(self, entry: CodexEntry) -> None:
+        self.remove_entry(entry.id)
+        if not entry.progressions:
+            return
+        self.progressions[entry.id] = [
+            (p.scene, p.description) for p in entry.progressions
+        ]
+        for p in entry.progressions:
+            self.entries_by_scene.setdefault(p.scene, set()).add(entry.id)
+        self._sort_entry(entry.id)
+
+    def remove_entry(self, entry_id: str) -> None:
+        for key, _ in self.progressions.pop(entry_id, []):
+            entries = self.entries_by_scene.get(key)
+            if entries is not None:
+                entries.discard(entry_id)
+                if not entries:
+                    del self.entries_by_scene[key]
+        self.sorted.pop(entry_id, None)
+
+    def positions_changed(self, keys: set[str]) -> None:
+        """Re-sort only the entries anchored at scenes that moved."""
+        affected = set()
+        for key in keys:
+            affected |= self.entries_by_scene.get(key, set())
+        for entry_id in affected:
+            self._sort_entry(entry_id)
+
+    def resolve(self, entry_id: str, scene: str) -> str | None:
+        """
+        The entry's description as of a scene, or None if no progression
+        applies yet (use the base description).
+        """
+        key = self.manuscript.resolve_key(scene)
+        index = self.sorted.get(entry_id)
+        if key is None or index is None:
+            return None
+        positions, descriptions = index
+        at = bisect_right(positions, self.manuscript.positions[key])
+        return descriptions[at - 1] if at else None
+
+
+def get_progression_index() -> ProgressionIndex:
+    """Return the current workspace's progression index."""
+    return current_workspace().service("progression_index", ProgressionIndex)
+
+
+async def _on_codex_saved(entry, description) -> None:
+    index = get_progression_index()
+    if index.built:
+        index.set_entry(entry)
+
+
+async def _on_codex_deleted(entry_id) -> None:
+    index = get_progression_index()
+    if index.built:
+        index.remove_entry(entry_id)
+
+
+async def _on_chapter_saved(book_id, act_id, chapter) -> None:
+    index = get_progression_index()
+    if not index.built:
+        return
+    changed = index.manuscript.reorder_chapter(
+        f"{book_id}/{act_id}/{chapter.id}", chapter.scenes
+    )
+    if changed is None:
+        changed = await index.manuscript.rebuild()
+    index.positions_changed(changed)
+
+
+async def _on_scene_saved(book_id, act_id, chapter_id, scene, content) -> None:
+    index = get_progression_index()
+    if not index.built:
+        return
+    key = scene_key(book_id, act_id, chapter_id, scene.id)
+    changed = index.manuscript.add_scene(key)
+    if changed is None:
+        changed = await index.manuscript.rebuild()
+    index.positions_changed(changed)
+
+
+async def _on_scene_deleted(book_id, act_id, chapter_id, scene_id) -> None:
+    index = get_progression_index()
+    if index.built:
+        key = scene_key(book_id, act_id, chapter_id, scene_id)
+        index.positions_changed(index.manuscript.remove_scene(key))
+
+
+subscribe("codex_saved", _on_codex_saved)
+subscribe("codex_deleted", _on_codex_deleted)
+subscribe("chapter_saved", _on_chapter_saved)
+subscribe("scene_saved", _on_scene_saved)
+subscribe("scene_deleted", _on_scene_deleted)
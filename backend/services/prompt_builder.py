@@ -8,18 +8,44 @@ from models import CodexEntryWithDescription
 # Path to prompt templates
 PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
 
+# Template name -> (mtime_ns, text); a stat per use picks up edits
+_templates: dict[str, tuple[int, str]] = {}
+
+
+def load_template(name: str) -> str | None:
+    """Load a prompt template by file name, or None if it doesn't exist."""
+    path = PROMPTS_DIR / name
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        _templates.pop(name, None)
+        return None
+    cached = _templates.get(name)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, path.read_text(encoding="utf-8"))
+        _templates[name] = cached
+    return cached[1]
+
+
+def warm_templates() -> int:
+    """Load every template into the cache. Return how many were loaded."""
+    if not PROMPTS_DIR.exists():
+        return 0
+    names = [path.name for path in PROMPTS_DIR.glob("*.md")]
+    for name in names:
+        load_template(name)
+    return len(names)
+
 
 def load_system_prompt() -> str:
     """Load the system prompt from the markdown file."""
-    system_path = PROMPTS_DIR / "system.md"
-    if system_path.exists():
-        return system_path.read_text(encoding="utf-8")
-    return "You are a helpful writing assistant."
+    return load_template("system.md") or "You are a helpful writing assistant."
 
 
 def build_chat_prompt(
     message: str,
     codex_entries: list[CodexEntryWithDescription],
+    passages: list[dict] | None = None,
 ) -> str:
     """
     Build a chat prompt with codex context.
@@ -27,6 +53,8 @@ def build_chat_prompt(
     Args:
         message: The user's message
         codex_entries: List of codex entries to include as context
+        passages: Earlier manuscript paragraphs ({"scene", "text"}) to
+            include for continuity
 
     Returns:
         Formatted prompt string
@@ -45,6 +73,16 @@ def build_chat_prompt(
             parts.append("")
         parts.append("---\n")
 
+    # Add earlier passages, in the order they were ranked
+    if passages:
+        parts.append("## Earlier Passages\n")
+        for passage in passages:
+            parts.append(f"*From {passage['scene']}:*")
+            parts.append("")
+            parts.append(passage["text"])
+            parts.append("")
+        parts.append("---\n")
+
     # Add user message
     parts.append("## Your Task\n")
     parts.append(message)
@@ -0,0 +1,443 @@
+"""Model-based routing across LLM providers with health tracking and failover."""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncIterator
+
+from .providers import Provider, ProviderError, default_providers
+
+
+class ProviderHealth:
+    """Rolling latency and error statistics for a single provider."""
+
+    def __init__(self, window: int = 50):
+        # Each sample is (latency_seconds, succeeded)
+        self.samples: deque[tuple[float, bool]] = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.samples.append((latency, ok))
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        failures = sum(1 for _, ok in self.samples if not ok)
+        return failures / len(self.samples)
+
+    def latency_percentile(self, pct: float) -> float | None:
+        """Latency percentile (seconds) over successful calls, or None."""
+        latencies = sorted(lat for lat, ok in self.samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(pct / 100 * len(latencies)))
+        return latencies[index]
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after repeated failures, half-open after a cooldown.
+    A half-open breaker lets one probe through; its outcome closes or
+    re-opens the breaker (with a longer cooldown).
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        max_cooldown: float = 300.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent through this breaker."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.cooldown = self.base_cooldown
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.probing:
+            # Failed probe: stay open for longer
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self.opened_at = time.monotonic()
+            self.probing = False
+        elif self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Give back a probe slot that was never used (e.g. cancelled)."""
+        self.probing = False
+
+
+class ProviderRouter:
+    """
+    Route completions to the providers able to serve a model.
+
+    Candidates are the configured providers whose breaker is not open,
+    with the model's native provider first and the rest ordered by
+    observed health. Retryable failures fail over to the next candidate.
+    With hedging on, a second candidate is started if the first has not
+    answered within the hedge delay; the first success wins and the other
+    call is cancelled.
+    """
+
+    def __init__(
+        self,
+        providers: list[Provider],
+        hedge: bool = False,
+        hedge_delay: float | None = None,
+        min_hedge_delay: float = 0.5,
+    ):
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.health = {p.name: ProviderHealth() for p in providers}
+        self.breakers = {p.name: CircuitBreaker() for p in providers}
+
+    def _score(self, provider: Provider) -> float:
+        """Lower is better: p95 latency inflated by the error rate."""
+        health = self.health[provider.name]
+        p95 = health.latency_percentile(95) or 0.0
+        return p95 * (1 + 4 * health.error_rate) + health.error_rate
+
+    def candidates(self, model: str) -> list[tuple[Provider, str]]:
+        """Providers that can serve the model, in the order to try them."""
+        servable = [
+            (p, p.model_for(model))
+            for p in self.providers
+            if p.is_configured() and p.model_for(model)
+        ]
+        if not servable:
+            return []
+
+        # The first provider in preference order that serves the model is
+        # its native provider; everything else is a fallback.
+        native, fallbacks = servable[0], servable[1:]
+        fallbacks.sort(key=lambda pair: self._score(pair[0]))
+        return [native, *fallbacks]
+
+    def _hedge_delay_for(self, provider: Provider) -> float:
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        p95 = self.health[provider.name].latency_percentile(95)
+        if p95 is None:
+            return max(self.min_hedge_delay, 2.0)
+        return max(self.min_hedge_delay, p95)
+
+    async def _attempt(
+        self,
+        provider: Provider,
+        provider_model: str,
+        prompt: str,
+        system: str,
+        max_tokens: int,
+    ) -> dict:
+        """Run one call against one provider, recording its outcome."""
+        breaker = self.breakers[provider.name]
+        health = self.health[provider.name]
+        started = time.monotonic()
+        try:
+            result = await provider.complete(
+                prompt, system, provider_model, max_tokens
+            )
+        except ProviderError as e:
+            if e.retryable:
+                # Bad requests say nothing about the provider's health
+                health.record(time.monotonic() - started, ok=False)
+                breaker.record_failure()
+            else:
+                breaker.release_probe()
+            raise
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+
+        health.record(time.monotonic() - started, ok=True)
+        breaker.record_success()
+        result["provider"] = provider.name
+        result["model"] = provider_model
+        return result
+
+    async def _hedged(
+        self,
+        first: tuple[Provider, str],
+        second: tuple[Provider, str],
+        prompt: str,
+        system: str,
+        max_tokens: int,
+    ) -> dict:
+        """Race a primary call against a delayed backup; cancel the loser."""
+        primary = asyncio.create_task(
+            self._attempt(first[0], first[1], prompt, system, max_tokens)
+        )
+        pending = {primary}
+        last_error: ProviderError | None = None
+        try:
+            await asyncio.wait(pending, timeout=self._hedge_delay_for(first[0]))
+            if primary.done():
+                error = primary.exception()
+                if error is None:
+                    return primary.result()
+                if not isinstance(error, ProviderError) or not error.retryable:
+                    # The backup would fail the same way: don't spend it
+                    raise error
+
+            # Primary is slow or failed retryably: bring in the backup
+            if self.breakers[second[0].name].allow():
+                pending.add(
+                    asyncio.create_task(
+                        self._attempt(
+                            second[0], second[1], prompt, system, max_tokens
+                        )
+                    )
+                )
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    if not isinstance(error, ProviderError) or not error.retryable:
+                        raise error
+                    last_error = error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        raise last_error
+
+    async def generate(
+        self,
+        prompt: str,
+        system: str,
+        model: str,
+        max_tokens: int = 4096,
+        hedge: bool | None = None,
+    ) -> dict:
+        """
+        Generate a completion, failing over between providers as needed.
+
+        Args:
+            prompt: The user message/prompt
+            system: The system message
+            model: Requested model ID (e.g. claude-sonnet-4-20250514)
+            max_tokens: Output token cap
+            hedge: Override the router's hedging setting for this call
+
+        Returns:
+            Dict with response, token counts, provider and model
+
+        Raises:
+            ProviderError: If no provider could serve the request
+        """
+        candidates = self.candidates(model)
+        if not candidates:
+            raise ProviderError(
+                "",
+                f"No configured provider can serve model '{model}'. "
+                "Please add the matching API key to your .env file.",
+                retryable=False,
+            )
+
+        hedge = self.hedge if hedge is None else hedge
+        last_error: ProviderError | None = None
+        remaining = list(candidates)
+
+        while remaining:
+            provider, provider_model = remaining.pop(0)
+            if not self.breakers[provider.name].allow():
+                continue
+
+            try:
+                if hedge and remaining:
+                    backup = remaining.pop(0)
+                    return await self._hedged(
+                        (provider, provider_model),
+                        backup,
+                        prompt,
+                        system,
+                        max_tokens,
+                    )
+                return await self._attempt(
+                    provider, provider_model, prompt, system, max_tokens
+                )
+            except ProviderError as e:
+                if not e.retryable:
+                    raise
+                last_error = e
+
+        if last_error is None:
+            raise ProviderError(
+                "",
+                "All providers for this model are temporarily unavailable "
+                "(circuit breakers open). Please try again shortly.",
+                status_code=503,
+            )
+        raise last_error
+
+    async def stream(
+        self,
+        prompt: str,
+        system: str,
+        model: str,
+        max_tokens: int = 4096,
+    ) -> AsyncIterator[dict]:
+        """
+        Stream a completion, failing over between providers as needed.
+
+        Failover only happens before the first chunk arrives; once output
+        has been sent on, a failure is raised to the caller. Streams are
+        never hedged.
+
+        Yields:
+            {"text": chunk} dicts, then a final usage dict with
+            input_tokens, output_tokens, provider and model
+
+        Raises:
+            ProviderError: If no provider could serve the request
+        """
+        candidates = self.candidates(model)
+        if not candidates:
+            raise ProviderError(
+                "",
+                f"No configured provider can serve model '{model}'. "
+                "Please add the matching API key to your .env file.",
+                retryable=False,
+            )
+
+        last_error: ProviderError | None = None
+        for provider, provider_model in candidates:
+            breaker = self.breakers[provider.name]
+            if not breaker.allow():
+                continue
+            health = self.health[provider.name]
+            started = time.monotonic()
+            first_chunk = True
+            # Time to first output, which health tracks for streams
+            latency = 0.0
+            try:
+                async with aclosing(
+                    provider.stream(prompt, system, provider_model, max_tokens)
+                ) as events:
+                    async for event in events:
+                        if first_chunk:
+                            latency = time.monotonic() - started
+                            first_chunk = False
+                        if "text" in event:
+                            yield event
+                        else:
+                            yield {
+                                **event,
+                                "provider": provider.name,
+                                "model": provider_model,
+                            }
+                # The outcome is recorded once the stream has ended, so a
+                # stream that keeps breaking off after its first chunk
+                # trips the breaker like a call that fails outright
+                health.record(latency, ok=True)
+                breaker.record_success()
+                return
+            except ProviderError as e:
+                if e.retryable:
+                    health.record(time.monotonic() - started, ok=False)
+                    breaker.record_failure()
+                else:
+                    breaker.release_probe()
+                if not e.retryable or not first_chunk:
+                    raise
+                last_error = e
+            except (asyncio.CancelledError, GeneratorExit):
+                # Stopped by the consumer: no verdict on the provider
+                breaker.release_probe()
+                raise
+
+        if last_error is None:
+            raise ProviderError(
+                "",
+                "All providers for this model are temporarily unavailable "
+                "(circuit breakers open). Please try again shortly.",
+                status_code=503,
+            )
+        raise last_error
+
+    def warm_clients(self) -> list[str]:
+        """
+        Create the configured providers' clients (blocking: run it in a
+        thread). Return the names of the providers warmed.
+        """
+        warmed = []
+        for provider in self.providers:
+            if provider.is_configured():
+                provider.warm()
+                warmed.append(provider.name)
+        return warmed
+
+    def health_snapshot(self) -> list[dict]:
+        """Per-provider health summary for diagnostics."""
+        snapshot = []
+        for provider in self.providers:
+            health = self.health[provider.name]
+            breaker = self.breakers[provider.name]
+            p50 = health.latency_percentile(50)
+            p95 = health.latency_percentile(95)
+            snapshot.append(
+                {
+                    "provider": provider.name,
+                    "configured": provider.is_configured(),
+                    "breaker": breaker.state,
+                    "error_rate": round(health.error_rate, 3),
+                    "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                    "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                    "samples": len(health.samples),
+                }
+            )
+        return snapshot
+
+
+_router: ProviderRouter | None = None
+
+
+def get_router() -> ProviderRouter:
+    """Return the process-wide provider router, creating it on first use."""
+    global _router
+    if _router is None:
+        hedge_delay_ms = os.getenv("AI_HEDGE_DELAY_MS")
+        _router = ProviderRouter(
+            default_providers(),
+            hedge=os.getenv("AI_HEDGE_REQUESTS", "").lower() in ("1", "true"),
+            hedge_delay=float(hedge_delay_ms) / 1000 if hedge_delay_ms else None,
+        )
+    return _router
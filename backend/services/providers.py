@@ -0,0 +1,355 @@
+"""Provider adapters for the LLM APIs WeightAshes can talk to."""
+
+import os
+from typing import AsyncIterator
+
+from models import AIProvider
+
+# The anthropic and openai SDKs take most of the app's import time, so they
+# are imported on first use rather than at module load.
+
+
+class ProviderError(Exception):
+    """
+    A failed call to an LLM provider.
+
+    Attributes:
+        provider: Name of the provider that failed
+        status_code: HTTP status returned by the provider, if any
+        retry_after: Seconds the provider asked us to wait, if given
+        retryable: Whether the same request may succeed later or elsewhere
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        message: str,
+        status_code: int | None = None,
+        retry_after: float | None = None,
+        retryable: bool = True,
+    ):
+        super().__init__(message)
+        self.provider = provider
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+    @property
+    def rate_limited(self) -> bool:
+        return self.status_code == 429
+
+
+def _parse_retry_after(headers) -> float | None:
+    """Read a Retry-After header (seconds form) from an SDK error response."""
+    if headers is None:
+        return None
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _status_error(provider: str, error) -> ProviderError:
+    """Convert an SDK APIStatusError into a ProviderError."""
+    status = error.status_code
+    response = getattr(error, "response", None)
+    return ProviderError(
+        provider,
+        f"API error ({status}): {error.message}",
+        status_code=status,
+        retry_after=_parse_retry_after(getattr(response, "headers", None)),
+        # Malformed or oversized requests fail the same way everywhere
+        retryable=status not in (400, 413, 422),
+    )
+
+
+class Provider:
+    """Base class for an LLM provider adapter."""
+
+    name: str = ""
+
+    def is_configured(self) -> bool:
+        """Return True if credentials for this provider are available."""
+        raise NotImplementedError
+
+    def model_for(self, model: str) -> str | None:
+        """
+        Translate a requested model ID into this provider's model ID.
+        Return None if this provider cannot serve the model.
+        """
+        raise NotImplementedError
+
+    async def complete(
+        self, prompt: str, system: str, model: str, max_tokens: int
+    ) -> dict:
+        """
+        Run a single non-streaming completion.
+
+        Returns:
+            Dict with response, input_tokens, output_tokens and
+            cached_tokens
+
+        Raises:
+            ProviderError: On any provider or connection failure
+        """
+        raise NotImplementedError
+
+    def warm(self) -> None:
+        """
+        Import the SDK and create the client ahead of the first request.
+        Blocks (SDK imports take a second or more), so run it in a thread.
+        """
+
+    def stream(
+        self, prompt: str, system: str, model: str, max_tokens: int
+    ) -> AsyncIterator[dict]:
+        """
+        Run a streaming completion.
+
+        Yields:
+            {"text": chunk} for each piece of output, then one final
+            {"input_tokens", "output_tokens", "cached_tokens"} usage dict
+
+        Raises:
+            ProviderError: On any provider or connection failure
+        """
+        raise NotImplementedError
+
+
+def _anthropic_usage(usage) -> dict:
+    # Anthropic counts prompt-cache reads and writes apart from input_tokens;
+    # report the whole prompt as input, with cache reads as a subset of it
+    cached = getattr(usage, "cache_read_input_tokens", None) or 0
+    written = getattr(usage, "cache_creation_input_tokens", None) or 0
+    return {
+        "input_tokens": usage.input_tokens + cached + written,
+        "output_tokens": usage.output_tokens,
+        "cached_tokens": cached,
+    }
+
+
+def _openai_usage(usage) -> dict:
+    if usage is None:
+        return {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": usage.prompt_tokens,
+        "output_tokens": usage.completion_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+    }
+
+
+class AnthropicProvider(Provider):
+    """Adapter for the Anthropic messages API."""
+
+    name = AIProvider.ANTHROPIC.value
+
+    def __init__(self):
+        self._client = None
+
+    def is_configured(self) -> bool:
+        return bool(os.getenv("ANTHROPIC_API_KEY"))
+
+    def model_for(self, model: str) -> str | None:
+        if model.startswith("anthropic/"):
+            return model.split("/", 1)[1]
+        if model.startswith("claude-"):
+            return model
+        return None
+
+    def _get_client(self):
+        if self._client is None:
+            import anthropic
+
+            # The SDK honours ANTHROPIC_BASE_URL, which lets us point it at
+            # a local fake server. Retries are handled by the router.
+            self._client = anthropic.AsyncAnthropic(
+                api_key=os.getenv("ANTHROPIC_API_KEY"),
+                max_retries=0,
+            )
+        return self._client
+
+    def warm(self) -> None:
+        self._get_client()
+
+    async def complete(
+        self, prompt: str, system: str, model: str, max_tokens: int
+    ) -> dict:
+        client = self._get_client()
+        import anthropic
+
+        try:
+            message = await client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                system=system,
+                messages=[
+                    {"role": "user", "content": prompt},
+                ],
+            )
+        except anthropic.APIConnectionError as e:
+            raise ProviderError(self.name, f"Could not connect: {e}") from e
+        except anthropic.APIStatusError as e:
+            raise _status_error(self.name, e) from e
+
+        # Extract text from response
+        response_text = ""
+        for block in message.content:
+            if hasattr(block, "text"):
+                response_text += block.text
+
+        return {"response": response_text, **_anthropic_usage(message.usage)}
+
+    async def stream(
+        self, prompt: str, system: str, model: str, max_tokens: int
+    ) -> AsyncIterator[dict]:
+        client = self._get_client()
+        import anthropic
+
+        try:
+            async with client.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                system=system,
+                messages=[
+                    {"role": "user", "content": prompt},
+                ],
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield {"text": text}
+                message = await stream.get_final_message()
+        except anthropic.APIConnectionError as e:
+            raise ProviderError(self.name, f"Could not connect: {e}") from e
+        except anthropic.APIStatusError as e:
+            raise _status_error(self.name, e) from e
+
+        yield _anthropic_usage(message.usage)
+
+
+class OpenAICompatibleProvider(Provider):
+    """Adapter for OpenAI and OpenAI-compatible chat completion APIs."""
+
+    def __init__(
+        self,
+        name: str,
+        api_key_env: str,
+        base_url_env: str,
+        default_base_url: str | None,
+    ):
+        self.name = name
+        self.api_key_env = api_key_env
+        self.base_url_env = base_url_env
+        self.default_base_url = default_base_url
+        self._client = None
+
+    def is_configured(self) -> bool:
+        return bool(os.getenv(self.api_key_env))
+
+    def model_for(self, model: str) -> str | None:
+        if self.name == AIProvider.OPENROUTER.value:
+            # OpenRouter serves everything under vendor-prefixed IDs
+            if "/" in model:
+                return model
+            if model.startswith("claude-"):
+                return f"anthropic/{model}"
+            if model.startswith(("gpt-", "o1", "o3", "o4")):
+                return f"openai/{model}"
+            return None
+
+        if model.startswith("openai/"):
+            return model.split("/", 1)[1]
+        if model.startswith(("gpt-", "o1", "o3", "o4")):
+            return model
+        return None
+
+    def _get_client(self):
+        if self._client is None:
+            import openai
+
+            self._client = openai.AsyncOpenAI(
+                api_key=os.getenv(self.api_key_env),
+                base_url=os.getenv(self.base_url_env) or self.default_base_url,
+                max_retries=0,
+            )
+        return self._client
+
+    def warm(self) -> None:
+        self._get_client()
+
+    async def complete(
+        self, prompt: str, system: str, model: str, max_tokens: int
+    ) -> dict:
+        client = self._get_client()
+        import openai
+
+        try:
+            completion = await client.chat.completions.create(
+                model=model,
+                max_tokens=max_tokens,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt},
+                ],
+            )
+        except openai.APIConnectionError as e:
+            raise ProviderError(self.name, f"Could not connect: {e}") from e
+        except openai.APIStatusError as e:
+            raise _status_error(self.name, e) from e
+
+        return {
+            "response": completion.choices[0].message.content or "",
+            **_openai_usage(completion.usage),
+        }
+
+    async def stream(
+        self, prompt: str, system: str, model: str, max_tokens: int
+    ) -> AsyncIterator[dict]:
+        client = self._get_client()
+        import openai
+
+        usage = None
+        try:
+            chunks = await client.chat.completions.create(
+                model=model,
+                max_tokens=max_tokens,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt},
+                ],
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for chunk in chunks:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield {"text": chunk.choices[0].delta.content}
+        except openai.APIConnectionError as e:
+            raise ProviderError(self.name, f"Could not connect: {e}") from e
+        except openai.APIStatusError as e:
+            raise _status_error(self.name, e) from e
+
+        yield _openai_usage(usage)
+
+
+def default_providers() -> list[Provider]:
+    """Build the provider adapters, in failover preference order."""
+    return [
+        AnthropicProvider(),
+        OpenAICompatibleProvider(
+            AIProvider.OPENAI.value,
+            api_key_env="OPENAI_API_KEY",
+            base_url_env="OPENAI_BASE_URL",
+            default_base_url=None,
+        ),
+        OpenAICompatibleProvider(
+            AIProvider.OPENROUTER.value,
+            api_key_env="OPENROUTER_API_KEY",
+            base_url_env="OPENROUTER_BASE_URL",
+            default_base_url="https://openrouter.ai/api/v1",
+        ),
+    ]
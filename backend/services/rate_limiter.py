@@ -0,0 +1,342 @@
+"""Client-side rate-limit scheduling for LLM requests."""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from .providers import ProviderError
+
+T = TypeVar("T")
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Per-model limits (requests, input tokens, output tokens per minute).
+# Defaults match Anthropic's entry tier and can be raised through env.
+DEFAULT_LIMITS = {
+    "rpm": int(os.getenv("AI_LIMIT_RPM", "50")),
+    "itpm": int(os.getenv("AI_LIMIT_ITPM", "30000")),
+    "otpm": int(os.getenv("AI_LIMIT_OTPM", "8000")),
+}
+
+# Share of every budget that batch work may not touch
+INTERACTIVE_RESERVE = float(os.getenv("AI_INTERACTIVE_RESERVE", "0.2"))
+
+
+class TokenBucket:
+    """
+    A bucket refilled continuously up to its capacity.
+    The level may go negative when actual usage exceeds what was reserved;
+    the debt is paid back by refill before anything else is granted.
+    """
+
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        refilled = self.level + (now - self.updated) * self.rate
+        self.level = min(self.capacity, refilled)
+        self.updated = now
+
+    def wait_time(self, amount: float, floor: float = 0.0) -> float:
+        """Seconds until `amount` can be taken while leaving `floor` behind."""
+        self._refill()
+        amount = min(amount, self.capacity - floor)
+        missing = amount + floor - self.level
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    def __init__(self, input_tokens: int, output_tokens: int):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class ModelBudget:
+    """
+    RPM / input TPM / output TPM buckets for one model, with a queue per
+    priority. Interactive waiters are always granted before batch ones,
+    and batch grants must leave the interactive reserve untouched.
+    """
+
+    def __init__(self, rpm: int, itpm: int, otpm: int, reserve: float):
+        self.requests = TokenBucket(rpm, rpm)
+        self.input_tokens = TokenBucket(itpm, itpm)
+        self.output_tokens = TokenBucket(otpm, otpm)
+        self.reserve = reserve
+        self.queues: dict[str, deque[_Waiter]] = {
+            INTERACTIVE: deque(),
+            BATCH: deque(),
+        }
+        self.paused_until = 0.0
+        self._wake = asyncio.Event()
+        self._pump: asyncio.Task | None = None
+
+    def _wait_time(self, waiter: _Waiter, priority: str) -> float:
+        reserve = self.reserve if priority == BATCH else 0.0
+        waits = [
+            self.paused_until - time.monotonic(),
+            self.requests.wait_time(1, self.requests.capacity * reserve),
+            self.input_tokens.wait_time(
+                waiter.input_tokens, self.input_tokens.capacity * reserve
+            ),
+            self.output_tokens.wait_time(
+                waiter.output_tokens, self.output_tokens.capacity * reserve
+            ),
+        ]
+        return max(0.0, *waits)
+
+    def _head(self) -> tuple[str, _Waiter] | None:
+        for priority in (INTERACTIVE, BATCH):
+            queue = self.queues[priority]
+            while queue and queue[0].future.done():
+                queue.popleft()  # Cancelled while waiting
+            if queue:
+                return priority, queue[0]
+        return None
+
+    async def _run_pump(self) -> None:
+        while True:
+            head = self._head()
+            if head is None:
+                self._pump = None
+                return
+            priority, waiter = head
+            wait = self._wait_time(waiter, priority)
+            if wait <= 0:
+                self.queues[priority].popleft()
+                self.requests.take(1)
+                self.input_tokens.take(waiter.input_tokens)
+                self.output_tokens.take(waiter.output_tokens)
+                waiter.future.set_result(None)
+                continue
+
+            # Sleep until the head fits, or until new work (which may be
+            # interactive and jump the batch queue) arrives.
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def acquire(
+        self, input_tokens: int, output_tokens: int, priority: str
+    ) -> None:
+        waiter = _Waiter(input_tokens, output_tokens)
+        self.queues[priority].append(waiter)
+        self._wake.set()
+        if self._pump is None:
+            self._pump = asyncio.create_task(self._run_pump())
+        await waiter.future
+
+    def settle(
+        self,
+        reserved_input: int,
+        reserved_output: int,
+        actual_input: int,
+        actual_output: int,
+    ) -> None:
+        """Correct the buckets once real usage is known."""
+        self.input_tokens.take(actual_input - reserved_input)
+        self.output_tokens.give_back(reserved_output - actual_output)
+        self._wake.set()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every queued request for `seconds` (server Retry-After)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self._wake.set()
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": round(self.requests.level, 1),
+            "input_tokens": round(self.input_tokens.level),
+            "output_tokens": round(self.output_tokens.level),
+            "queued_interactive": len(self.queues[INTERACTIVE]),
+            "queued_batch": len(self.queues[BATCH]),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+        }
+
+
+class RateLimitScheduler:
+    """
+    Queue LLM calls against per-model budgets instead of failing them,
+    retrying rate-limited and transient failures with jittered backoff.
+    """
+
+    def __init__(
+        self,
+        limits: dict | None = None,
+        reserve: float = INTERACTIVE_RESERVE,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.default_limits = limits or DEFAULT_LIMITS
+        self.model_limits: dict[str, dict] = {}
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budgets: dict[str, ModelBudget] = {}
+
+    def configure(self, model: str, **limits: int) -> None:
+        """Override rpm/itpm/otpm for one model (applies to new budgets)."""
+        self.model_limits[model] = {**self.default_limits, **limits}
+        self.budgets.pop(model, None)
+
+    def _budget(self, model: str) -> ModelBudget:
+        if model not in self.budgets:
+            limits = self.model_limits.get(model, self.default_limits)
+            self.budgets[model] = ModelBudget(
+                limits["rpm"], limits["itpm"], limits["otpm"], self.reserve
+            )
+        return self.budgets[model]
+
+    def _backoff(self, attempt: int, error: ProviderError) -> float:
+        if error.retry_after is not None:
+            # The server told us when; add a little jitter so queued
+            # requests don't all land on the same instant.
+            jitter = random.uniform(0, 0.1 * error.retry_after + 0.25)
+            return error.retry_after + jitter
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    async def run(
+        self,
+        model: str,
+        call: Callable[[], Awaitable[T]],
+        input_tokens: int,
+        max_output_tokens: int,
+        priority: str = INTERACTIVE,
+    ) -> T:
+        """
+        Run `call` once the model's budget allows it.
+
+        Args:
+            model: Model ID the budget is tracked under
+            call: Zero-argument coroutine factory performing the request;
+                its result may carry input_tokens/output_tokens to settle
+                the reservation
+            input_tokens: Estimated prompt tokens
+            max_output_tokens: Output token cap (reserved up front)
+            priority: INTERACTIVE or BATCH
+
+        Raises:
+            ProviderError: If retries are exhausted or the error is permanent
+        """
+        budget = self._budget(model)
+        attempt = 0
+
+        while True:
+            await budget.acquire(input_tokens, max_output_tokens, priority)
+            produced = False
+            try:
+                result = await call()
+                produced = True
+            except ProviderError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                error = e
+            finally:
+                if not produced:
+                    # Failed, or cancelled (a client gone, a hedge lost):
+                    # hand back the output reservation
+                    budget.settle(input_tokens, max_output_tokens, input_tokens, 0)
+
+            if produced:
+                if isinstance(result, dict):
+                    budget.settle(
+                        input_tokens,
+                        max_output_tokens,
+                        result.get("input_tokens", input_tokens),
+                        result.get("output_tokens", max_output_tokens),
+                    )
+                return result
+
+            delay = self._backoff(attempt, error)
+            if error.rate_limited:
+                budget.pause(delay)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def stream(
+        self,
+        model: str,
+        call: Callable[[], AsyncIterator[dict]],
+        input_tokens: int,
+        max_output_tokens: int,
+        priority: str = INTERACTIVE,
+    ) -> AsyncIterator[dict]:
+        """
+        Like run(), for a streaming call: `call` returns an async iterator
+        of events, and the event carrying output_tokens settles the
+        reservation. Failures are only retried before the first event has
+        been passed on.
+        """
+        budget = self._budget(model)
+        attempt = 0
+
+        while True:
+            await budget.acquire(input_tokens, max_output_tokens, priority)
+            started = settled = False
+            try:
+                # Closed with this generator, so a consumer that stops
+                # early also stops the provider stream
+                async with aclosing(call()) as events:
+                    async for event in events:
+                        if "output_tokens" in event:
+                            budget.settle(
+                                input_tokens,
+                                max_output_tokens,
+                                event.get("input_tokens", input_tokens),
+                                event["output_tokens"],
+                            )
+                            settled = True
+                        started = True
+                        yield event
+                return
+            except ProviderError as e:
+                if not settled:
+                    # Hand back the output reservation (a stream abandoned
+                    # by the caller keeps it, as its usage is unknown)
+                    budget.settle(input_tokens, max_output_tokens, input_tokens, 0)
+                if started or not e.retryable or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                if e.rate_limited:
+                    budget.pause(delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def snapshot(self) -> dict:
+        return {model: budget.snapshot() for model, budget in self.budgets.items()}
+
+
+_scheduler: RateLimitScheduler | None = None
+
+
+def get_scheduler() -> RateLimitScheduler:
+    """Return the process-wide scheduler, creating it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RateLimitScheduler()
+    return _scheduler
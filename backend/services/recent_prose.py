@@ -0,0 +1,131 @@
+"""Tail reads of scene prose for "recent prose" (wordsBefore) context."""
+
+import os
+import re
+from pathlib import Path
+
+from . import fs
+from .file_manager import manuscript_dir
+
+# Bytes read per backward step
+CHUNK_SIZE = 4096
+
+_WORD = re.compile(rb"\S+")
+_PARAGRAPH_BREAK = re.compile(rb"\r?\n[ \t]*\r?\n\s*")
+
+
+def _align_to_char_start(f, offset: int) -> int:
+    """Move a byte offset back so it doesn't split a UTF-8 sequence."""
+    while offset > 0:
+        f.seek(offset)
+        byte = f.read(1)
+        if not byte or byte[0] & 0xC0 != 0x80:
+            break
+        offset -= 1
+    return offset
+
+
+def _read_tail(path: Path, words: int, cursor: int | None) -> tuple[str, int]:
+    """
+    Read backward from `cursor` (or EOF) until more than `words` words are
+    buffered, then keep the trailing whole paragraphs that fit in `words`.
+
+    Returns:
+        Tuple of (text, byte offset where the text starts in the file)
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size if cursor is None else max(0, min(cursor, size))
+        end = _align_to_char_start(f, end)
+
+        pos = end
+        buffer = b""
+        while pos > 0:
+            step = min(CHUNK_SIZE, pos)
+            pos -= step
+            f.seek(pos)
+            buffer = f.read(step) + buffer
+            # One extra word guarantees the budget boundary is buffered
+            if len(_WORD.findall(buffer)) > words:
+                break
+
+    # Drop the leading fragment if we stopped mid-file: it may be a partial
+    # word (or a split UTF-8 sequence) and belongs to a partial paragraph.
+    complete_start = pos == 0
+
+    # Paragraph spans within the buffer: (start, end) byte offsets
+    spans = []
+    start = 0
+    for match in _PARAGRAPH_BREAK.finditer(buffer):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(buffer)))
+
+    taken = 0
+    first_start = None
+    for index in range(len(spans) - 1, -1, -1):
+        span_start, span_end = spans[index]
+        paragraph = buffer[span_start:span_end]
+        if paragraph.lstrip().startswith(b"#"):
+            # Markdown heading (e.g. the scene title) isn't prose
+            if first_start is None:
+                continue
+            break
+        if index == 0 and not complete_start:
+            break
+        count = len(_WORD.findall(paragraph))
+        if taken + count > words:
+            break
+        taken += count
+        first_start = span_start
+
+    if first_start is None:
+        # The most recent paragraph alone exceeds the budget (or there are
+        # no whole paragraphs): fall back to its last `words` words.
+        matches = list(_WORD.finditer(buffer))
+        tail = matches[-words:] if words > 0 else []
+        if not tail:
+            return "", end
+        first_start = tail[0].start()
+        if first_start == 0 and not complete_start:
+            first_start = tail[1].start() if len(tail) > 1 else len(buffer)
+
+    text = buffer[first_start:].decode("utf-8", errors="ignore").strip()
+    return text, pos + first_start
+
+
+async def get_recent_prose(
+    book_id: str,
+    act_id: str,
+    chapter_id: str,
+    scene_id: str,
+    words: int = 600,
+    cursor: int | None = None,
+) -> dict | None:
+    """
+    Return up to `words` words of prose ending at the cursor (or scene end),
+    trimmed to whole paragraphs.
+
+    Only the tail of the scene's .md file is read, so the cost depends on
+    `words`, not on the length of the scene.
+
+    Args:
+        book_id, act_id, chapter_id, scene_id: Scene path components
+        words: Word budget
+        cursor: UTF-8 byte offset into the scene file to read back from,
+            for inserting mid-scene (default: end of scene)
+
+    Returns:
+        Dict with text, word_count and start_offset (bytes), or None if the
+        scene has no prose file
+    """
+    md_path = manuscript_dir() / book_id / act_id / chapter_id / f"{scene_id}.md"
+    try:
+        text, start = await fs.run(_read_tail, md_path, words, cursor)
+    except FileNotFoundError:
+        return None
+    return {
+        "text": text,
+        "word_count": len(text.split()),
+        "start_offset": start,
+    }
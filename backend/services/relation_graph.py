@@ -0,0 +1,157 @@
+"""In-memory index of codex relations with forward and reverse edges."""
+
+import asyncio
+from collections import deque
+
+from models import CodexEntry
+
+from .file_manager import list_codex_entries, subscribe
+from .workspace import current_workspace
+
+OUTGOING = "out"
+INCOMING = "in"
+BOTH = "both"
+
+
+class RelationGraph:
+    """
+    Adjacency index over `CodexEntry.relations`.
+
+    `forward[source]` and `reverse[target]` hold (neighbour, relation type)
+    pairs, so "what does Merrill relate to" and "who relates to Merrill"
+    are both dictionary lookups. Targets need not exist as entries yet.
+    """
+
+    def __init__(self):
+        self.forward: dict[str, list[tuple[str, str]]] = {}
+        self.reverse: dict[str, list[tuple[str, str]]] = {}
+        self.built = False
+        self._lock = asyncio.Lock()
+
+    async def ensure_built(self) -> None:
+        """Load every entry's relations on first use."""
+        async with self._lock:
+            if self.built:
+                return
+            for entry in await list_codex_entries():
+                self.set_entry(entry)
+            self.built = True
+
+    def set_entry(self, entry: CodexEntry) -> None:
+        """Replace an entry's outgoing edges."""
+        self.remove_entry(entry.id)
+        edges = [(relation.target, relation.type) for relation in entry.relations]
+        if edges:
+            self.forward[entry.id] = edges
+        for target, rel_type in edges:
+            self.reverse.setdefault(target, []).append((entry.id, rel_type))
+
+    def remove_entry(self, entry_id: str) -> None:
+        """
+        Drop an entry's outgoing edges. Incoming edges belong to their
+        source entries and stay until those entries change.
+        """
+        for target, rel_type in self.forward.pop(entry_id, []):
+            sources = self.reverse.get(target)
+            if sources is None:
+                continue
+            sources.remove((entry_id, rel_type))
+            if not sources:
+                del self.reverse[target]
+
+    def neighbors(
+        self,
+        entry_id: str,
+        direction: str = BOTH,
+        types: set[str] | None = None,
+    ) -> list[dict]:
+        """
+        Entries directly related to `entry_id`.
+
+        Args:
+            entry_id: Entry to look up
+            direction: OUTGOING, INCOMING or BOTH
+            types: Only follow these relation types (default: all)
+
+        Returns:
+            List of {"id", "type", "direction"} dicts
+        """
+        result = []
+        if direction in (OUTGOING, BOTH):
+            for target, rel_type in self.forward.get(entry_id, []):
+                if types is None or rel_type in types:
+                    result.append(
+                        {"id": target, "type": rel_type, "direction": OUTGOING}
+                    )
+        if direction in (INCOMING, BOTH):
+            for source, rel_type in self.reverse.get(entry_id, []):
+                if types is None or rel_type in types:
+                    result.append(
+                        {"id": source, "type": rel_type, "direction": INCOMING}
+                    )
+        return result
+
+    def expand(
+        self,
+        seeds: list[str],
+        hops: int = 1,
+        limit: int = 10,
+        direction: str = BOTH,
+        types: set[str] | None = None,
+    ) -> list[tuple[str, int]]:
+        """
+        Breadth-first expansion from the seed entries.
+
+        Closer entries come first; within a hop, entries reached from
+        earlier seeds come first. Seeds themselves are not returned.
+
+        Args:
+            seeds: Entry IDs to expand from
+            hops: Maximum distance from any seed
+            limit: Maximum number of entries to return
+            direction: Edge direction(s) to follow
+            types: Only follow these relation types (default: all)
+
+        Returns:
+            List of (entry_id, distance) tuples
+        """
+        seen = set(seeds)
+        queue = deque((seed, 0) for seed in seeds)
+        found: list[tuple[str, int]] = []
+
+        while queue and len(found) < limit:
+            entry_id, distance = queue.popleft()
+            if distance >= hops:
+                continue
+            for neighbor in self.neighbors(entry_id, direction, types):
+                neighbor_id = neighbor["id"]
+                if neighbor_id in seen:
+                    continue
+                seen.add(neighbor_id)
+                found.append((neighbor_id, distance + 1))
+                if len(found) >= limit:
+                    break
+                queue.append((neighbor_id, distance + 1))
+
+        return found
+
+
+def get_relation_graph() -> RelationGraph:
+    """Return the current workspace's relation graph."""
+    return current_workspace().service("relation_graph", RelationGraph)
+
+
+async def _on_codex_saved(entry, description) -> None:
+    graph = get_relation_graph()
+    if graph.built:
+        graph.set_entry(entry)
+
+
+async def _on_codex_deleted(entry_id) -> None:
+    graph = get_relation_graph()
+    if graph.built:
+        graph.remove_entry(entry_id)
+
+
+subscribe("codex_saved", _on_codex_saved)
+subscribe("codex_deleted", _on_codex_deleted)
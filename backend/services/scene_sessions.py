@@ -0,0 +1,381 @@
+"""In-memory editing sessions for open scenes (WebSocket edit channel)."""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from models import Scene
+
+from .file_manager import count_words, get_scene, save_scene, scene_key, subscribe
+from .highlighter import highlight_paragraphs, split_paragraphs
+from .locks import get_lock_manager, scene_resource
+from .occurrence_matrix import get_occurrence_matrix
+from .workspace import current_workspace
+
+logger = logging.getLogger(__name__)
+
+# Idle time before edits are written to disk
+FLUSH_DELAY = 2.0
+# Idle time before entity detection reruns
+ENTITY_DELAY = 0.5
+
+Send = Callable[[dict], Awaitable[Any]]
+
+
+class SessionError(ValueError):
+    """A client message that can't be applied."""
+
+
+class SceneSession:
+    """
+    One open scene, shared by every client editing it.
+
+    The content lives in memory for as long as any client is connected:
+    edits are applied to it directly, acknowledged with a new version
+    number, and written to disk after FLUSH_DELAY seconds of quiet (and
+    when the last client leaves). Offsets are character (code point)
+    offsets into the current content.
+    """
+
+    def __init__(
+        self, book_id: str, act_id: str, chapter_id: str, scene: Scene, content: str
+    ):
+        self.book_id = book_id
+        self.act_id = act_id
+        self.chapter_id = chapter_id
+        self.scene = scene
+        self.content = content
+        self.version = 0
+        self.saved_version = 0
+        self.clients: set[Send] = set()
+        self.key = scene_key(book_id, act_id, chapter_id, scene.id)
+        self._entities: list[dict] | None = None
+        self._flush_task: asyncio.Task | None = None
+        self._entity_task: asyncio.Task | None = None
+        self._flushing = False
+        self.deleted = False
+
+    @property
+    def word_count(self) -> int:
+        return count_words(self.content)
+
+    def snapshot(self, message_type: str = "snapshot") -> dict:
+        return {
+            "type": message_type,
+            "version": self.version,
+            "content": self.content,
+            "wordCount": self.word_count,
+        }
+
+    async def handle(self, client: Send, message: dict) -> None:
+        """
+        Apply one client message.
+
+        Messages:
+            {"type": "edit", "baseVersion", "start", "end", "text"}
+                Replace content[start:end] with text. Rejected with a
+                "conflict" snapshot unless baseVersion is current.
+            {"type": "sync"}
+                Resend the current snapshot.
+            {"type": "highlight", "start", "end"}
+                Codex mention spans for paragraphs start..end-1 (blank-line
+                separated), answered with a "highlights" message.
+            {"type": "save"}
+                Write to disk now.
+
+        Raises:
+            SessionError: On a malformed message
+        """
+        message_type = message.get("type")
+        if self.deleted:
+            raise SessionError("Scene was deleted")
+        if message_type == "sync":
+            await client(self.snapshot())
+        elif message_type == "save":
+            await self.flush()
+        elif message_type == "edit":
+            await self._edit(client, message)
+        elif message_type == "highlight":
+            await self._highlight(client, message)
+        else:
+            raise SessionError(f"Unknown message type '{message_type}'")
+
+    async def _edit(self, client: Send, message: dict) -> None:
+        try:
+            base_version = int(message["baseVersion"])
+            start = int(message["start"])
+            end = int(message["end"])
+            text = str(message.get("text", ""))
+        except (KeyError, TypeError, ValueError) as e:
+            raise SessionError("Edit needs baseVersion, start, end and text") from e
+        if not 0 <= start <= end <= len(self.content):
+            raise SessionError(
+                f"Edit range {start}-{end} is outside the scene "
+                f"(length {len(self.content)})"
+            )
+
+        if base_version != self.version:
+            # The client edited a stale copy: it must resync and reapply
+            await client(self.snapshot("conflict"))
+            return
+
+        self.content = self.content[:start] + text + self.content[end:]
+        self.version += 1
+
+        await client({"type": "ack", "version": self.version})
+        edit = {
+            "type": "edit",
+            "version": self.version,
+            "start": start,
+            "end": end,
+            "text": text,
+        }
+        await self.broadcast(edit, exclude=client)
+        await self.broadcast(
+            {"type": "stats", "version": self.version, "wordCount": self.word_count}
+        )
+        self._schedule_flush()
+        self._schedule_entities()
+
+    async def _highlight(self, client: Send, message: dict) -> None:
+        paragraphs = split_paragraphs(self.content)
+        try:
+            start = int(message.get("start", 0))
+            end = int(message.get("end", len(paragraphs)))
+        except (TypeError, ValueError) as e:
+            raise SessionError("Highlight start and end must be integers") from e
+        start = max(start, 0)
+        selected = paragraphs[start:end]
+        version = self.version
+        results = await highlight_paragraphs(
+            [text for _, text in selected], first_index=start
+        )
+        for result, (offset, _) in zip(results, selected):
+            result["offset"] = offset
+        await client(
+            {"type": "highlights", "version": version, "paragraphs": results}
+        )
+
+    async def broadcast(self, message: dict, exclude: Send | None = None) -> None:
+        """Send a message to every connected client (except `exclude`)."""
+        targets = [client for client in self.clients if client is not exclude]
+        results = await asyncio.gather(
+            *(client(message) for client in targets), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.debug("Dropped push to a closed client: %s", result)
+
+    # ------------------------------------------------------------------------
+    # Background work
+    # ------------------------------------------------------------------------
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(FLUSH_DELAY)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write the content to disk if it changed since the last write."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self.saved_version == self.version:
+            return
+        resource = scene_resource(
+            self.book_id, self.act_id, self.chapter_id, self.scene.id
+        )
+        async with get_lock_manager().hold(resource):
+            await self.write_pending()
+
+    async def write_pending(self) -> None:
+        """
+        Like flush(), for a caller already holding the scene's lock (the
+        lock manager's locks aren't reentrant).
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self.saved_version == self.version:
+            return
+        version = self.version
+        self._flushing = True
+        try:
+            await save_scene(
+                self.book_id, self.act_id, self.chapter_id, self.scene, self.content
+            )
+        finally:
+            self._flushing = False
+        self.saved_version = version
+        await self.broadcast({"type": "saved", "version": version})
+
+    def _schedule_entities(self) -> None:
+        if self._entity_task is not None:
+            self._entity_task.cancel()
+        self._entity_task = asyncio.create_task(self._entities_later())
+
+    async def _entities_later(self) -> None:
+        await asyncio.sleep(ENTITY_DELAY)
+        self._entity_task = None
+        await self.push_entities()
+
+    async def push_entities(self, client: Send | None = None) -> None:
+        """
+        Detect codex entries in the content and push them if they changed
+        (or unconditionally to `client`, e.g. one that just joined).
+        """
+        matrix = get_occurrence_matrix()
+        await matrix.ensure_built()
+        version = self.version
+        found = matrix.matcher.scan(self.content)
+        entities = [
+            {"id": entry_id, "count": count, "first": first}
+            for entry_id, (count, first) in sorted(
+                found.items(), key=lambda item: item[1][1]
+            )
+        ]
+        message = {"type": "entities", "version": version, "entities": entities}
+        if client is not None:
+            await client(message)
+        elif entities != self._entities:
+            await self.broadcast(message)
+        self._entities = entities
+
+    async def reload(self, scene: Scene, content: str) -> None:
+        """Adopt a version of the scene written outside this session."""
+        self.scene = scene
+        if content == self.content:
+            return
+        self.content = content
+        self.version += 1
+        self.saved_version = self.version
+        await self.broadcast(self.snapshot())
+        self._schedule_entities()
+
+    async def close(self) -> None:
+        if self._entity_task is not None:
+            self._entity_task.cancel()
+        await self.flush()
+
+
+class SessionTable:
+    """A workspace's open scene sessions, by scene key."""
+
+    def __init__(self):
+        self.sessions: dict[str, SceneSession] = {}
+        self.lock = asyncio.Lock()
+
+    async def close(self) -> None:
+        """Flush and close every open session."""
+        async with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception:
+                logger.exception("Failed to save scene %s on close", session.key)
+
+
+def _table() -> SessionTable:
+    return current_workspace().service("scene_sessions", SessionTable)
+
+
+async def join_session(
+    book_id: str, act_id: str, chapter_id: str, scene_id: str, client: Send
+) -> SceneSession | None:
+    """
+    Join the scene's session, opening it (one disk read) if no one else
+    has it open. Return None if the scene doesn't exist.
+    """
+    key = scene_key(book_id, act_id, chapter_id, scene_id)
+    table = _table()
+    async with table.lock:
+        session = table.sessions.get(key)
+        if session is None:
+            existing = await get_scene(book_id, act_id, chapter_id, scene_id)
+            if existing is None:
+                return None
+            data = existing.model_dump()
+            content = data.pop("content")
+            session = SceneSession(
+                book_id, act_id, chapter_id, Scene.model_validate(data), content
+            )
+            table.sessions[key] = session
+        session.clients.add(client)
+        return session
+
+
+async def leave_session(session: SceneSession, client: Send) -> None:
+    """Leave a session; the last client out flushes and closes it."""
+    table = _table()
+    async with table.lock:
+        session.clients.discard(client)
+        if session.clients:
+            return
+        # The scene may have been deleted and a new session opened for
+        # the same key since; that one stays open
+        if table.sessions.get(session.key) is session:
+            del table.sessions[session.key]
+    try:
+        await session.close()
+    except Exception:
+        logger.exception("Failed to save scene %s on close", session.key)
+
+
+async def close_all_sessions() -> None:
+    """Flush and close every open session of the current workspace."""
+    await _table().close()
+
+
+def get_session(key: str) -> SceneSession | None:
+    """The open session for a scene key, if any."""
+    return _table().sessions.get(key)
+
+
+async def flush_session(key: str) -> None:
+    """
+    Write an open session's unsaved edits to disk, so an HTTP read (and
+    its ETag) reflects them.
+    """
+    session = get_session(key)
+    if session is not None:
+        await session.flush()
+
+
+async def write_session_edits(key: str) -> None:
+    """
+    Like flush_session(), for a caller holding the scene's lock: before an
+    If-Match check and write, so the check is against the live content and
+    the write doesn't silently replace edits not yet flushed.
+    """
+    session = get_session(key)
+    if session is not None:
+        await session.write_pending()
+
+
+async def _on_scene_saved(book_id, act_id, chapter_id, scene, content) -> None:
+    session = get_session(scene_key(book_id, act_id, chapter_id, scene.id))
+    if session is not None and not session._flushing:
+        await session.reload(scene, content)
+
+
+async def _on_scene_deleted(book_id, act_id, chapter_id, scene_id) -> None:
+    key = scene_key(book_id, act_id, chapter_id, scene_id)
+    session = _table().sessions.pop(key, None)
+    if session is not None:
+        # Don't let a pending flush recreate the files
+        session.deleted = True
+        if session._flush_task is not None:
+            session._flush_task.cancel()
+        session.saved_version = session.version
+        await session.broadcast({"type": "deleted"})
+
+
+subscribe("scene_saved", _on_scene_saved)
+subscribe("scene_deleted", _on_scene_deleted)
@@ -0,0 +1,313 @@
+"""Scene summaries, with several scenes packed into each AI request."""
+
+import asyncio
+import html
+import re
+from typing import AsyncIterator, NamedTuple
+
+from models import Scene
+
+from .ai_client import generate
+from .file_manager import get_scene, list_scene_paths, save_scene, scene_key
+from .locks import get_lock_manager, scene_resource
+from .prompt_builder import load_system_prompt, load_template
+from .rate_limiter import BATCH
+from .scene_sessions import get_session
+from .token_estimator import get_token_estimator
+
+# Estimated input tokens of scene text packed into one request
+DEFAULT_PACK_BUDGET = 12000
+# Upper bound on scenes per request, however short they are
+MAX_PACK_SCENES = 12
+# Output cap for one request; packs are also kept small enough to fit it
+MAX_OUTPUT_TOKENS = 8192
+# Requests in flight at once for one summarization run
+MAX_CONCURRENT_REQUESTS = 4
+
+_SUMMARY = re.compile(r'<summary id="([^"]+)">(.*?)</summary>', re.DOTALL)
+# A scene tag (opening or closing) written in the prose itself
+_SCENE_TAG = re.compile(r"<(?=\s*/?\s*scene\b)", re.IGNORECASE)
+
+ScenePath = tuple[str, str, str, str]
+
+
+class SceneText(NamedTuple):
+    """A scene to summarize."""
+
+    path: ScenePath
+    title: str
+    content: str
+    # Estimated tokens of the scene's block in a prompt
+    tokens: int
+
+
+def _scene_block(label: str, scene: SceneText) -> str:
+    # Neither the title nor the prose may break the tags the model echoes
+    title = html.escape(scene.title, quote=True)
+    content = _SCENE_TAG.sub("&lt;", scene.content.strip())
+    return f'<scene id="{label}" title="{title}">\n{content}\n</scene>'
+
+
+def build_summarize_prompt(scenes: list[SceneText], words: int) -> str:
+    """
+    Fill the summarization template with the scenes, labelled 1, 2, ...
+    in order (short labels cost fewer tokens than scene keys).
+    """
+    template = load_template("summarize.md") or "{{scenes}}"
+    blocks = "\n\n".join(
+        _scene_block(str(i), scene) for i, scene in enumerate(scenes, start=1)
+    )
+    return template.replace("{{words}}", str(words)).replace("{{scenes}}", blocks)
+
+
+def parse_summaries(text: str) -> dict[str, str]:
+    """
+    Summaries by scene label from a response. A summary cut off by the
+    output cap has no closing tag, so it is missing rather than partial.
+    """
+    return {
+        label: summary.strip()
+        for label, summary in _SUMMARY.findall(text)
+        if summary.strip()
+    }
+
+
+def output_tokens_for(words: int) -> int:
+    """Output tokens to allow per summary: its words plus tags and slack."""
+    return int(words * 1.5) + 40
+
+
+def pack(
+    scenes: list[SceneText], budget: int, per_scene_output: int
+) -> list[list[SceneText]]:
+    """
+    Group scenes, in order, into packs whose estimated input stays within
+    `budget` tokens and whose summaries fit in one response. A scene over
+    the budget on its own gets a pack to itself.
+    """
+    max_scenes = max(1, min(MAX_PACK_SCENES, MAX_OUTPUT_TOKENS // per_scene_output))
+    packs: list[list[SceneText]] = []
+    current: list[SceneText] = []
+    used = 0
+    for scene in scenes:
+        if current and (used + scene.tokens > budget or len(current) >= max_scenes):
+            packs.append(current)
+            current, used = [], 0
+        current.append(scene)
+        used += scene.tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+async def _store_summary(path: ScenePath, summary: str) -> None:
+    """Set a scene's summary, keeping its prose as it is."""
+    book_id, act_id, chapter_id, scene_id = path
+    async with get_lock_manager().hold(scene_resource(*path)):
+        existing = await get_scene(book_id, act_id, chapter_id, scene_id)
+        if existing is None:
+            return
+        # An open editing session may hold edits not yet flushed; write
+        # those rather than have the save event replace them
+        session = get_session(scene_key(*path))
+        content = session.content if session is not None else existing.content
+        data = existing.model_dump()
+        data.pop("content")
+        data["summary"] = summary
+        await save_scene(
+            book_id, act_id, chapter_id, Scene.model_validate(data), content
+        )
+
+
+class SummaryRun:
+    """Request and token counts of one summarization run."""
+
+    def __init__(self):
+        self.scenes = 0
+        self.summarized = 0
+        self.failed = 0
+        self.requests = 0
+        self.packed_requests = 0
+        self.fallback_requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        # Estimated input tokens of the requests made, and had every scene
+        # had a request of its own (compared like for like)
+        self.estimated_input_tokens = 0
+        self.baseline_input_tokens = 0
+
+    def report(self) -> dict:
+        baseline = self.baseline_input_tokens
+        estimated = self.estimated_input_tokens
+        return {
+            "scenes": self.scenes,
+            "summarized": self.summarized,
+            "failed": self.failed,
+            "requests": {
+                "made": self.requests,
+                "packed": self.packed_requests,
+                "fallback": self.fallback_requests,
+                "onePerScene": self.scenes,
+                "saved": self.scenes - self.requests,
+            },
+            "inputTokens": {
+                "used": self.input_tokens,
+                "estimated": estimated,
+                "onePerScene": baseline,
+                "saved": baseline - estimated,
+                "savedRatio": round(1 - estimated / baseline, 3) if baseline else None,
+            },
+            "outputTokens": self.output_tokens,
+            "cost": round(self.cost, 6),
+        }
+
+
+async def summarize_scenes(
+    scope: tuple[str, ...],
+    model: str = "claude-sonnet-4-20250514",
+    budget: int = DEFAULT_PACK_BUDGET,
+    words: int = 80,
+    missing_only: bool = False,
+    packed: bool = True,
+) -> AsyncIterator[dict]:
+    """
+    Summarize every scene under a book, act or chapter and store the
+    summaries on the scenes.
+
+    Scenes are packed, in reading order, into requests of up to `budget`
+    estimated input tokens, so the system prompt and per-request overhead
+    are paid once per pack rather than once per scene. Each response is
+    split back into per-scene summaries by their tags; scenes whose
+    summary is missing (a failed request, a response cut off by the
+    output cap, a skipped scene) are retried one request each. Requests
+    run at batch priority, leaving headroom for interactive ones.
+
+    Args:
+        scope: (book_id,), (book_id, act_id) or (book_id, act_id, chapter_id)
+        model: Model to summarize with
+        budget: Estimated input tokens of scene text per request
+        words: Target summary length
+        missing_only: Skip scenes that already have a summary
+        packed: False sends one request per scene (for comparison)
+
+    Yields:
+        {"type": "plan", "scenes", "requests"} first; then
+        {"type": "summary", "key", "summary", "packed"} or
+        {"type": "failed", "key", "message"} per scene as each is done;
+        and last {"type": "done", "report"} with request and token counts
+        against one request per scene
+    """
+    estimator = get_token_estimator()
+    await estimator.ensure_loaded()
+    system = load_system_prompt()
+
+    scenes: list[SceneText] = []
+    for path in await list_scene_paths():
+        if path[: len(scope)] != scope:
+            continue
+        scene = await get_scene(*path)
+        if scene is None or not scene.content.strip():
+            continue
+        if missing_only and scene.summary.strip():
+            continue
+        text = SceneText(path, scene.title, scene.content, 0)
+        (tokens,) = estimator.count([_scene_block("1", text)], model)
+        scenes.append(text._replace(tokens=tokens))
+
+    run = SummaryRun()
+    run.scenes = len(scenes)
+    for scene in scenes:
+        run.baseline_input_tokens += estimator.estimate(
+            [system, build_summarize_prompt([scene], words)], model
+        )
+
+    per_scene_output = output_tokens_for(words)
+    packs = (
+        pack(scenes, budget, per_scene_output)
+        if packed
+        else [[scene] for scene in scenes]
+    )
+    yield {"type": "plan", "scenes": len(scenes), "requests": len(packs)}
+
+    queue: asyncio.Queue[dict | None] = asyncio.Queue()
+    slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def request(items: list[SceneText]) -> tuple[dict[str, str], str | None]:
+        """Summaries by label, and an error message if the request failed."""
+        prompt = build_summarize_prompt(items, words)
+        run.estimated_input_tokens += estimator.estimate([system, prompt], model)
+        async with slots:
+            result = await generate(
+                prompt,
+                system,
+                model=model,
+                max_tokens=min(MAX_OUTPUT_TOKENS, per_scene_output * len(items)),
+                priority=BATCH,
+                operation="summarize",
+                scene_id=scene_key(*items[0].path) if len(items) == 1 else None,
+            )
+        run.requests += 1
+        run.input_tokens += result["input_tokens"]
+        run.output_tokens += result["output_tokens"]
+        run.cost += result["cost"] or 0.0
+        if not result["provider"]:
+            # generate() reports failures as an "Error: ..." response
+            return {}, result["response"]
+        return parse_summaries(result["response"]), None
+
+    async def finish(scene: SceneText, summary: str, was_packed: bool) -> None:
+        await _store_summary(scene.path, summary)
+        run.summarized += 1
+        queue.put_nowait(
+            {
+                "type": "summary",
+                "key": scene_key(*scene.path),
+                "summary": summary,
+                "packed": was_packed,
+            }
+        )
+
+    async def summarize_pack(items: list[SceneText]) -> None:
+        try:
+            summaries: dict[str, str] = {}
+            if len(items) > 1:
+                summaries, _ = await request(items)
+                run.packed_requests += 1
+            for i, scene in enumerate(items, start=1):
+                summary = summaries.get(str(i))
+                if summary is not None:
+                    await finish(scene, summary, True)
+                    continue
+                # Missing from the pack's response: a request of its own
+                if len(items) > 1:
+                    run.fallback_requests += 1
+                single, error = await request([scene])
+                summary = single.get("1")
+                if summary is not None:
+                    await finish(scene, summary, False)
+                    continue
+                run.failed += 1
+                queue.put_nowait(
+                    {
+                        "type": "failed",
+                        "key": scene_key(*scene.path),
+                        "message": error or "No summary in the response",
+                    }
+                )
+        finally:
+            queue.put_nowait(None)
+
+    tasks = [asyncio.create_task(summarize_pack(items)) for items in packs]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event = await queue.get()
+            if event is None:
+                remaining -= 1
+                continue
+            yield event
+        yield {"type": "done", "report": run.report()}
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,326 @@
+"""Local token estimation, calibrated per model from logged real usage."""
+
+import asyncio
+import json
+import logging
+import re
+import time
+from pathlib import Path
+
+from . import fs
+from .file_manager import sessions_dir
+from .workspace import current_workspace
+
+logger = logging.getLogger(__name__)
+
+SAMPLES_FILENAME = "token_samples.jsonl"
+
+# Bump when FEATURES change; samples logged under another version are skipped
+FEATURE_VERSION = 1
+FEATURES = (
+    "short_words",  # alphabetic words of up to 6 letters
+    "long_letters",  # letters in longer words
+    "capitalized",  # words starting with a capital (names split oddly)
+    "digits",
+    "punctuation",
+    "newlines",
+    "non_ascii",
+)
+# Rough priors for English prose (about a token per short word, invented
+# names splitting into several); per-model calibration replaces these
+DEFAULT_WEIGHTS = (1.0, 0.24, 0.32, 0.55, 0.85, 0.6, 1.1)
+# Message framing and role tokens per request
+DEFAULT_OVERHEAD = 8.0
+
+# Samples needed before a model's calibration replaces the defaults
+MIN_SAMPLES = 20
+# Samples kept per model (the most recent)
+MAX_SAMPLES = 5000
+# Pull toward the defaults, so a few samples can't produce wild weights
+RIDGE = 5.0
+
+_TOKEN = re.compile(r"[A-Za-z]+|[0-9]|\n|[^\x00-\x7f]|[^\sA-Za-z0-9]")
+
+
+def features(text: str) -> list[float]:
+    """Feature vector for one block of text (see FEATURES)."""
+    short_words = long_letters = capitalized = 0
+    digits = punctuation = newlines = non_ascii = 0
+    for match in _TOKEN.finditer(text):
+        token = match.group(0)
+        first = token[0]
+        if first.isascii() and first.isalpha():
+            if len(token) <= 6:
+                short_words += 1
+            else:
+                long_letters += len(token)
+            if first.isupper():
+                capitalized += 1
+        elif first.isdigit():
+            digits += 1
+        elif first == "\n":
+            newlines += 1
+        elif not first.isascii():
+            non_ascii += 1
+        else:
+            punctuation += 1
+    return [
+        short_words,
+        long_letters,
+        capitalized,
+        digits,
+        punctuation,
+        newlines,
+        non_ascii,
+    ]
+
+
+def _solve(matrix: list[list[float]], vector: list[float]) -> list[float]:
+    """Solve a small dense linear system (Gaussian elimination)."""
+    n = len(vector)
+    rows = [row[:] + [value] for row, value in zip(matrix, vector)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        divisor = rows[col][col]
+        for r in range(col + 1, n):
+            factor = rows[r][col] / divisor
+            if factor:
+                for c in range(col, n + 1):
+                    rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        total = rows[r][n] - sum(rows[r][c] * solution[c] for c in range(r + 1, n))
+        solution[r] = total / rows[r][r]
+    return solution
+
+
+def fit(samples: list[tuple[list[float], int]]) -> tuple[list[float], float]:
+    """
+    Ridge least-squares fit of (weights, overhead) to logged samples of
+    (summed request features, actual input tokens), regularized toward
+    the defaults.
+    """
+    prior = [*DEFAULT_WEIGHTS, DEFAULT_OVERHEAD]
+    n = len(prior)
+    gram = [[0.0] * n for _ in range(n)]
+    moment = [0.0] * n
+    for feats, tokens in samples:
+        row = [*feats, 1.0]
+        for i in range(n):
+            if row[i]:
+                moment[i] += row[i] * tokens
+                for j in range(n):
+                    gram[i][j] += row[i] * row[j]
+    for i in range(n):
+        gram[i][i] += RIDGE
+        moment[i] += RIDGE * prior[i]
+    solution = _solve(gram, moment)
+    return solution[:-1], solution[-1]
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Calibration:
+    """Estimator weights for one model."""
+
+    def __init__(self):
+        self.weights = list(DEFAULT_WEIGHTS)
+        self.overhead = DEFAULT_OVERHEAD
+        self.samples: list[tuple[list[float], int, int]] = []
+        self.calibrated = False
+        self.pending = 0
+
+    def block(self, feats: list[float]) -> float:
+        return sum(w * f for w, f in zip(self.weights, feats))
+
+    def add(self, feats: list[float], tokens: int, chars: int) -> None:
+        self.samples.append((feats, tokens, chars))
+        self.pending += 1
+        if len(self.samples) > MAX_SAMPLES:
+            del self.samples[: len(self.samples) - MAX_SAMPLES]
+
+    def refit(self) -> None:
+        if len(self.samples) < MIN_SAMPLES:
+            return
+        self.weights, self.overhead = fit(
+            [(feats, tokens) for feats, tokens, _ in self.samples]
+        )
+        self.calibrated = True
+        self.pending = 0
+
+
+class TokenEstimator:
+    """
+    Linear token estimator over cheap text features.
+
+    Estimates are additive over blocks (plus a per-request overhead), so
+    many blocks can be counted at once and a request's estimate is the sum
+    of its parts. Each served request logs its summed features and actual
+    input token count; per-model weights are refitted from that log.
+    """
+
+    # Refit once this many new samples arrived since the last fit
+    REFIT_EVERY = 25
+
+    def __init__(self):
+        self.models: dict[str, Calibration] = {}
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    def calibration(self, model: str) -> Calibration:
+        if model not in self.models:
+            self.models[model] = Calibration()
+        return self.models[model]
+
+    async def ensure_loaded(self) -> None:
+        async with self._lock:
+            if self.loaded:
+                return
+            path = sessions_dir() / SAMPLES_FILENAME
+            for sample in await fs.run(_read_samples, path):
+                self.calibration(sample["model"]).add(
+                    sample["features"], sample["tokens"], sample["chars"]
+                )
+            for calibration in self.models.values():
+                calibration.refit()
+            self.loaded = True
+
+    def count(self, blocks: list[str], model: str) -> list[int]:
+        """Estimated tokens per block (without request overhead)."""
+        calibration = self.models.get(model) or Calibration()
+        return [max(0, round(calibration.block(features(b)))) for b in blocks]
+
+    def estimate(self, blocks: list[str], model: str) -> int:
+        """Estimated input tokens for a request made of these blocks."""
+        calibration = self.models.get(model) or Calibration()
+        total = calibration.overhead
+        for block in blocks:
+            total += calibration.block(features(block))
+        return max(1, round(total))
+
+    async def record(self, model: str, blocks: list[str], input_tokens: int) -> None:
+        """Log a served request's actual input tokens and refit if due."""
+        if input_tokens <= 0:
+            return
+        await self.ensure_loaded()
+        summed = [0.0] * len(FEATURES)
+        for block in blocks:
+            for i, value in enumerate(features(block)):
+                summed[i] += value
+        chars = sum(len(block) for block in blocks)
+        calibration = self.calibration(model)
+        calibration.add(summed, input_tokens, chars)
+        if calibration.pending >= self.REFIT_EVERY or (
+            not calibration.calibrated and len(calibration.samples) >= MIN_SAMPLES
+        ):
+            calibration.refit()
+
+        sample = {
+            "v": FEATURE_VERSION,
+            "ts": time.time(),
+            "model": model,
+            "features": summed,
+            "chars": chars,
+            "tokens": input_tokens,
+        }
+        try:
+            await fs.run(_append_sample, sessions_dir() / SAMPLES_FILENAME, sample)
+        except OSError:
+            logger.warning("Could not log token sample", exc_info=True)
+
+    def evaluate(self, model: str, holdout: float = 0.2) -> dict:
+        """
+        Error bounds on held-out logged requests.
+
+        Fits on the oldest (1 - holdout) share of the model's samples and
+        measures relative error on the newest share, next to the chars/4
+        rule of thumb.
+
+        Returns:
+            Dict with sample counts and p50/p90/p95/max absolute relative
+            error and mean signed error, for the estimator and for chars/4
+        """
+        samples = self.models[model].samples if model in self.models else []
+        split = int(len(samples) * (1 - holdout))
+        train, test = samples[:split], samples[split:]
+        if len(train) < MIN_SAMPLES or not test:
+            return {
+                "model": model,
+                "samples": len(samples),
+                "error": f"Need at least {MIN_SAMPLES} training samples "
+                "and one held-out sample",
+            }
+
+        weights, overhead = fit([(feats, tokens) for feats, tokens, _ in train])
+
+        def bounds(predictions: list[float]) -> dict:
+            errors = [
+                (predicted - tokens) / tokens
+                for predicted, (_, tokens, _) in zip(predictions, test)
+            ]
+            absolute = [abs(e) for e in errors]
+            return {
+                "p50": round(_percentile(absolute, 0.5), 4),
+                "p90": round(_percentile(absolute, 0.9), 4),
+                "p95": round(_percentile(absolute, 0.95), 4),
+                "max": round(max(absolute), 4),
+                "bias": round(sum(errors) / len(errors), 4),
+            }
+
+        return {
+            "model": model,
+            "train": len(train),
+            "holdout": len(test),
+            "estimator": bounds(
+                [
+                    overhead + sum(w * f for w, f in zip(weights, feats))
+                    for feats, _, _ in test
+                ]
+            ),
+            "chars_div_4": bounds([chars / 4 for _, _, chars in test]),
+        }
+
+    def snapshot(self) -> list[dict]:
+        return [
+            {
+                "model": model,
+                "samples": len(calibration.samples),
+                "calibrated": calibration.calibrated,
+                "weights": dict(
+                    zip(FEATURES, (round(w, 4) for w in calibration.weights))
+                ),
+                "overhead": round(calibration.overhead, 2),
+            }
+            for model, calibration in sorted(self.models.items())
+        ]
+
+
+def _read_samples(path: Path) -> list[dict]:
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return []
+    samples = []
+    for line in lines:
+        try:
+            sample = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if sample.get("v") == FEATURE_VERSION:
+            samples.append(sample)
+    return samples
+
+
+def _append_sample(path: Path, sample: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(sample, separators=(",", ":")) + "\n")
+
+
+def get_token_estimator() -> TokenEstimator:
+    """Return the current workspace's token estimator."""
+    return current_workspace().service("token_estimator", TokenEstimator)
@@ -0,0 +1,123 @@
+"""Several drafts of one prompt, generated concurrently and cancellable."""
+
+import asyncio
+import uuid
+from typing import AsyncIterator
+
+from .ai_client import generate_stream
+from .workspace import current_workspace
+
+# Variant statuses
+STREAMING = "streaming"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Upper bound on variants per run, whatever the request asks for
+MAX_VARIANTS = 5
+
+
+class VariantRun:
+    """The variants of one request, while they stream."""
+
+    def __init__(self, count: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.statuses = [STREAMING] * count
+        self.tasks: list[asyncio.Task] = []
+
+    def cancel(self, index: int) -> bool:
+        """
+        Stop a variant that is still streaming. Return False if it had
+        already finished.
+        """
+        if self.statuses[index] != STREAMING:
+            return False
+        self.statuses[index] = CANCELLED
+        self.tasks[index].cancel()
+        return True
+
+
+def _runs() -> dict[str, VariantRun]:
+    """The current workspace's runs in progress, by ID."""
+    return current_workspace().service("variant_runs", dict)
+
+
+def get_run(run_id: str) -> VariantRun | None:
+    return _runs().get(run_id)
+
+
+async def generate_variants(
+    prompt: str,
+    system: str,
+    count: int,
+    model: str = "claude-sonnet-4-20250514",
+    max_tokens: int = 1024,
+    scene_id: str | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Generate `count` responses to the same prompt concurrently, streaming
+    their events interleaved as they arrive.
+
+    Each variant is its own request (rate limited, routed and billed like
+    any other stream), so total latency is about that of the slowest
+    one. Cancelling a variant (see VariantRun.cancel) stops its provider
+    stream, so no more output tokens are generated for it. Closing this
+    generator cancels every variant still streaming.
+
+    Yields:
+        {"type": "run", "id", "variants"} first; then, tagged with their
+        "variant" index, {"type": "text", "text"} chunks and one final
+        {"type": "done", ...usage, "cost"}, {"type": "error", "message"}
+        or {"type": "cancelled"} per variant; and last {"type": "end",
+        "statuses", "cost"} with the summed cost of finished variants
+    """
+    count = min(count, MAX_VARIANTS)
+    run = VariantRun(count)
+    runs = _runs()
+    runs[run.id] = run
+    # Events from every variant, None marking the end of one
+    queue: asyncio.Queue[dict | None] = asyncio.Queue()
+
+    async def produce(index: int) -> None:
+        try:
+            async for event in generate_stream(
+                prompt,
+                system,
+                model=model,
+                max_tokens=max_tokens,
+                operation="variants",
+                scene_id=scene_id,
+            ):
+                if event["type"] == "done":
+                    run.statuses[index] = DONE
+                elif event["type"] == "error":
+                    run.statuses[index] = FAILED
+                queue.put_nowait({**event, "variant": index})
+        except asyncio.CancelledError:
+            run.statuses[index] = CANCELLED
+            queue.put_nowait({"type": "cancelled", "variant": index})
+        finally:
+            queue.put_nowait(None)
+
+    run.tasks = [asyncio.create_task(produce(i)) for i in range(count)]
+    cost = 0.0
+    try:
+        yield {"type": "run", "id": run.id, "variants": count}
+        remaining = count
+        while remaining:
+            event = await queue.get()
+            if event is None:
+                remaining -= 1
+                continue
+            if event["type"] == "done":
+                cost += event["cost"] or 0.0
+            yield event
+        yield {"type": "end", "statuses": run.statuses, "cost": round(cost, 6)}
+    finally:
+        # Client gone (or done): stop the rest. Waiting doesn't cancel them
+        # again if this is cancelled, so they still record their usage
+        runs.pop(run.id, None)
+        for index, task in enumerate(run.tasks):
+            if not task.done():
+                run.cancel(index)
+        await asyncio.wait(run.tasks)
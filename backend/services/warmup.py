@@ -0,0 +1,116 @@
+"""Startup warm-up of codex, manuscript and template caches."""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from . import fs
+from .cost_ledger import get_cost_ledger
+from .extractor import get_name_index
+from .file_manager import list_codex_entries, list_scene_paths
+from .fuzzy_index import get_fuzzy_index
+from .highlighter import get_highlighter
+from .listing_index import get_codex_listing, get_scene_listing
+from .occurrence_matrix import get_occurrence_matrix
+from .passage_index import get_passage_index
+from .progressions import get_progression_index
+from .prompt_builder import warm_templates
+from .provider_router import get_router
+from .relation_graph import get_relation_graph
+from .token_estimator import get_token_estimator
+from .writing_stats import get_writing_stats
+
+logger = logging.getLogger(__name__)
+
+COLD = "cold"
+WARMING = "warming"
+WARM = "warm"
+FAILED = "failed"
+
+
+class WarmupState:
+    """Progress of the startup warm-up, for the readiness endpoint."""
+
+    def __init__(self):
+        self.status = COLD
+        self.started: float | None = None
+        self.finished: float | None = None
+        self.tasks: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+
+    def snapshot(self) -> dict:
+        elapsed = None
+        if self.started is not None:
+            elapsed = (self.finished or time.perf_counter()) - self.started
+        return {
+            "status": self.status,
+            "seconds": round(elapsed, 3) if elapsed is not None else None,
+            "tasks": {name: round(s, 3) for name, s in self.tasks.items()},
+            "errors": self.errors,
+        }
+
+
+_state = WarmupState()
+
+
+def get_warmup_state() -> WarmupState:
+    """Return the process-wide warm-up state."""
+    return _state
+
+
+async def _timed(name: str, step: Callable[[], Awaitable]) -> None:
+    started = time.perf_counter()
+    try:
+        await step()
+    except Exception as e:
+        logger.exception("Warm-up step %s failed", name)
+        _state.errors[name] = str(e)
+    finally:
+        _state.tasks[name] = time.perf_counter() - started
+
+
+async def warm_up() -> WarmupState:
+    """
+    Fill every cache a first request would otherwise pay for.
+
+    Runs in two concurrent phases: raw data first (codex files, manuscript
+    layout, templates, token calibration, provider clients), then the
+    indexes derived from it, so nothing scans the codex twice. A failed
+    step is logged and leaves its cache to fill lazily; it doesn't stop
+    the others.
+    """
+    _state.status = WARMING
+    _state.started = time.perf_counter()
+    _state.finished = None
+    _state.tasks.clear()
+    _state.errors.clear()
+
+    await asyncio.gather(
+        _timed("codex", list_codex_entries),
+        _timed("manuscript", list_scene_paths),
+        _timed("templates", lambda: fs.run(warm_templates)),
+        _timed("token_estimator", get_token_estimator().ensure_loaded),
+        # SDK imports are slow and would stall the loop on the first request
+        _timed("providers", lambda: asyncio.to_thread(get_router().warm_clients)),
+    )
+    await asyncio.gather(
+        _timed("codex_listing", get_codex_listing().ensure_built),
+        _timed("scene_listing", get_scene_listing().ensure_built),
+        _timed("relations", get_relation_graph().ensure_built),
+        _timed("progressions", get_progression_index().ensure_built),
+        _timed("occurrences", get_occurrence_matrix().ensure_built),
+        _timed("highlighter", get_highlighter().ensure_built),
+        _timed("name_index", get_name_index().ensure_built),
+        _timed("fuzzy_index", get_fuzzy_index().ensure_built),
+        _timed("passages", get_passage_index().ensure_built),
+        _timed("writing_stats", get_writing_stats().ensure_built),
+        _timed("cost_ledger", get_cost_ledger().ensure_built),
+    )
+
+    _state.finished = time.perf_counter()
+    _state.status = FAILED if _state.errors else WARM
+    logger.info(
+        "Warm-up %s in %.2fs", _state.status, _state.finished - _state.started
+    )
+    return _state
@@ -0,0 +1,294 @@
+"""
+Workspaces: independent projects (a series bible, side projects) served
+by one process.
+
+Each workspace is a data directory laid out like data/ (codex/,
+manuscript/, sessions/) with its own caches and indexes. The workspace
+for a request is held in a context variable, so storage functions and
+the get_x() accessors of per-workspace services resolve to it without
+any parameter threading; background tasks inherit it from the request
+that started them.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+
+from . import fs
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+DEFAULT_WORKSPACE = "default"
+# The default workspace's data directory (DATA_DIR points it elsewhere,
+# e.g. at a throwaway copy for load tests)
+DEFAULT_DATA_DIR = Path(os.getenv("DATA_DIR") or PROJECT_ROOT / "data")
+# Other workspaces live in subdirectories here
+WORKSPACES_DIR = Path(os.getenv("WORKSPACES_DIR") or PROJECT_ROOT / "workspaces")
+# Estimated memory of loaded workspaces above which idle ones are evicted
+WORKSPACE_MEMORY_MB = float(os.getenv("WORKSPACE_MEMORY_MB") or 512)
+# Caches and indexes take roughly this many times a workspace's data size
+MEMORY_PER_DATA_BYTE = 6
+
+_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class WorkspaceError(ValueError):
+    """Invalid workspace name."""
+
+
+class Workspace:
+    """One project's directories and its loaded per-workspace services."""
+
+    def __init__(self, name: str, data_dir: Path):
+        self.name = name
+        self.data_dir = data_dir
+        self.codex_dir = data_dir / "codex"
+        self.manuscript_dir = data_dir / "manuscript"
+        self.sessions_dir = data_dir / "sessions"
+        # Service name -> instance, created on first use
+        self.services: dict[str, Any] = {}
+        # Requests (and WebSocket connections) in flight
+        self.active = 0
+        self.last_used = time.monotonic()
+        # Estimated memory once loaded (bytes); None until measured
+        self.footprint: int | None = None
+
+    def service(self, name: str, factory: Callable[[], T]) -> T:
+        """This workspace's instance of a service, created on first use."""
+        instance = self.services.get(name)
+        if instance is None:
+            instance = self.services[name] = factory()
+        return instance
+
+    async def close(self) -> None:
+        """
+        Close every loaded service that holds unsaved state (those with an
+        async close()), then drop them all. Runs as this workspace.
+        """
+        services = list(self.services.values())
+        self.services = {}
+        with using(self):
+            for service in services:
+                close = getattr(service, "close", None)
+                if close is None:
+                    continue
+                try:
+                    await close()
+                except Exception:
+                    logger.exception("Failed to close %r in %s", service, self.name)
+
+    def snapshot(self) -> dict:
+        footprint = self.footprint
+        if footprint is not None:
+            footprint = round(footprint / 2**20, 1)
+        return {
+            "name": self.name,
+            "services": sorted(self.services),
+            "active": self.active,
+            "idleSeconds": round(time.monotonic() - self.last_used, 1),
+            "footprintMb": footprint,
+        }
+
+
+_current: ContextVar[Workspace | None] = ContextVar("workspace", default=None)
+
+
+def current_workspace() -> Workspace:
+    """The workspace of the running request (the default one outside any)."""
+    workspace = _current.get()
+    return workspace if workspace is not None else get_workspaces().default
+
+
+@contextmanager
+def using(workspace: Workspace) -> Iterator[Workspace]:
+    """Make `workspace` current for the enclosed code (and tasks it starts)."""
+    token = _current.set(workspace)
+    try:
+        yield workspace
+    finally:
+        _current.reset(token)
+
+
+def _data_size(data_dir: Path) -> int:
+    """Bytes of codex and manuscript files. Runs in the filesystem pool."""
+    return sum(
+        stat.size
+        for sub in ("codex", "manuscript")
+        for stat in fs.walk_files(data_dir / sub)
+    )
+
+
+class WorkspaceRegistry:
+    """
+    Known workspaces, loaded lazily and evicted least recently used.
+
+    A workspace is loaded when a request first selects it; its services
+    then fill on first use. Whenever the estimated memory of loaded
+    workspaces exceeds the ceiling, idle ones (no request in flight) are
+    closed and dropped, oldest first, until it fits. An evicted workspace
+    reloads transparently on its next request.
+    """
+
+    def __init__(
+        self,
+        default_dir: Path = DEFAULT_DATA_DIR,
+        root: Path = WORKSPACES_DIR,
+        memory_limit: int = int(WORKSPACE_MEMORY_MB * 2**20),
+    ):
+        self.default_dir = default_dir
+        self.root = root
+        self.memory_limit = memory_limit
+        self.default = Workspace(DEFAULT_WORKSPACE, default_dir)
+        self.loaded: OrderedDict[str, Workspace] = OrderedDict()
+        self.evictions = 0
+        # Evicted workspaces still flushing, by name; reopening one waits
+        self.closing: dict[str, asyncio.Event] = {}
+        self._lock = asyncio.Lock()
+
+    def _data_dir(self, name: str) -> Path:
+        if name == DEFAULT_WORKSPACE:
+            return self.default_dir
+        if not _NAME.match(name):
+            raise WorkspaceError(
+                f"Invalid workspace name '{name}': use lowercase letters, "
+                "digits, '-' and '_'"
+            )
+        return self.root / name
+
+    async def names(self) -> list[str]:
+        """Every workspace on disk, the default first."""
+        others = await fs.run(fs.list_subdirs, self.root)
+        return [DEFAULT_WORKSPACE, *sorted(n for n in others if _NAME.match(n))]
+
+    async def open(self, name: str) -> Workspace:
+        """
+        The named workspace, loading it if needed.
+
+        Raises:
+            WorkspaceError: If the name is invalid
+            KeyError: If no such workspace exists
+        """
+        workspace = self.loaded.get(name)
+        if workspace is not None:
+            self.loaded.move_to_end(name)
+            return workspace
+        data_dir = self._data_dir(name)
+        if name != DEFAULT_WORKSPACE and not await fs.exists(data_dir):
+            raise KeyError(name)
+
+        # Don't load a fresh copy over files an evicted one is still writing
+        closing = self.closing.get(name)
+        if closing is not None:
+            await closing.wait()
+        async with self._lock:
+            workspace = self.loaded.get(name)
+            if workspace is None:
+                workspace = (
+                    self.default
+                    if name == DEFAULT_WORKSPACE
+                    else Workspace(name, data_dir)
+                )
+                workspace.footprint = (
+                    await fs.run(_data_size, data_dir) * MEMORY_PER_DATA_BYTE
+                )
+                self.loaded[name] = workspace
+        return workspace
+
+    async def create(self, name: str) -> Workspace:
+        """
+        Create an empty workspace on disk and load it.
+
+        Raises:
+            WorkspaceError: If the name is invalid
+            FileExistsError: If the workspace already exists
+        """
+        data_dir = self._data_dir(name)
+        if name == DEFAULT_WORKSPACE or await fs.exists(data_dir):
+            raise FileExistsError(name)
+        for sub in ("codex", "manuscript", "sessions"):
+            await fs.mkdir(data_dir / sub)
+        return await self.open(name)
+
+    @asynccontextmanager
+    async def use(self, workspace: Workspace) -> AsyncIterator[Workspace]:
+        """
+        Serve a request from `workspace`, keeping it from being evicted,
+        after making room for it by evicting others if need be.
+        """
+        workspace.active += 1
+        workspace.last_used = time.monotonic()
+        try:
+            await self.evict()
+            with using(workspace):
+                yield workspace
+        finally:
+            workspace.active -= 1
+            workspace.last_used = time.monotonic()
+
+    def memory(self) -> int:
+        """Estimated bytes held by loaded workspaces."""
+        return sum(w.footprint or 0 for w in self.loaded.values())
+
+    async def evict(self) -> list[str]:
+        """
+        Drop idle workspaces, oldest first, until under the ceiling. They
+        are unlisted under the lock but closed (flushing ledgers, stats
+        and sessions) after it is released, so requests resolving other
+        workspaces don't wait on that disk I/O.
+        """
+        evicted: list[Workspace] = []
+        async with self._lock:
+            while self.memory() > self.memory_limit:
+                idle = [w for w in self.loaded.values() if w.active == 0]
+                if not idle:
+                    break
+                workspace = min(idle, key=lambda w: w.last_used)
+                # Unlist it first: requests from now on load a fresh copy
+                del self.loaded[workspace.name]
+                if workspace is self.default:
+                    self.default = Workspace(DEFAULT_WORKSPACE, self.default_dir)
+                self.closing[workspace.name] = asyncio.Event()
+                evicted.append(workspace)
+                self.evictions += 1
+        for workspace in evicted:
+            try:
+                await workspace.close()
+            finally:
+                self.closing.pop(workspace.name).set()
+            logger.info("Evicted idle workspace %s", workspace.name)
+        return [workspace.name for workspace in evicted]
+
+    async def close_all(self) -> None:
+        """Close every loaded workspace (server shutdown)."""
+        workspaces = {id(w): w for w in [self.default, *self.loaded.values()]}
+        for workspace in workspaces.values():
+            await workspace.close()
+
+    def snapshot(self) -> dict:
+        return {
+            "memoryMb": round(self.memory() / 2**20, 1),
+            "limitMb": round(self.memory_limit / 2**20, 1),
+            "evictions": self.evictions,
+            "loaded": [w.snapshot() for w in self.loaded.values()],
+        }
+
+
+_registry: WorkspaceRegistry | None = None
+
+
+def get_workspaces() -> WorkspaceRegistry:
+    """Return the process-wide workspace registry."""
+    global _registry
+    if _registry is None:
+        _registry = WorkspaceRegistry()
+    return _registry
@@ -0,0 +1,362 @@
+"""Writing statistics: an append-only log of save deltas with rollups."""
+
+import asyncio
+import json
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import orjson
+
+from . import event_log, fs
+from .file_manager import (
+    list_scene_paths,
+    manuscript_dir,
+    scene_key,
+    sessions_dir,
+    subscribe,
+)
+from .workspace import current_workspace
+
+EVENTS_FILENAME = "writing_events.jsonl"
+ROLLUPS_FILENAME = "writing_rollups.json"
+# Bump when the rollup layout changes; old snapshots are rebuilt from the log
+ROLLUP_VERSION = 1
+# Events recorded between rollup snapshots (the log tail is replayed on load)
+SNAPSHOT_EVERY = 200
+
+_EVENT_FIELDS = frozenset({"ts", "key", "delta", "words"})
+
+# Rollup cells are [words added, words removed, saves]
+Tally = list[int]
+
+
+def week_of(day: date) -> str:
+    """ISO week key, e.g. "2026-W07"."""
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _tally_dict(tally: Tally | None) -> dict:
+    added, removed, saves = tally or (0, 0, 0)
+    return {
+        "added": added,
+        "removed": removed,
+        "net": added - removed,
+        "saves": saves,
+    }
+
+
+def _bump(table: dict[str, Tally], key: str, added: int, removed: int) -> None:
+    tally = table.get(key)
+    if tally is None:
+        tally = table[key] = [0, 0, 0]
+    tally[0] += added
+    tally[1] += removed
+    tally[2] += 1
+
+
+class WritingStats:
+    """
+    Words written per scene over time.
+
+    Every save that changes a scene's word count appends one event
+    ({"ts", "key", "delta", "words"}) to a JSONL log, and the event is
+    folded into daily, ISO-weekly, per-chapter and per-act rollups as it
+    is recorded, so dashboard reads never scan the log. The rollups are
+    snapshotted with the log offset they cover; on load the snapshot is
+    restored and only the log tail after it is replayed.
+
+    Scenes the log has never seen start from their length on disk when
+    the stats are first built, so existing prose isn't counted as written.
+    """
+
+    def __init__(self):
+        self.daily: dict[str, Tally] = {}
+        self.weekly: dict[str, Tally] = {}
+        self.chapters: dict[str, Tally] = {}
+        self.acts: dict[str, Tally] = {}
+        # Act key -> day -> tally, for velocity over a window
+        self.act_daily: dict[str, dict[str, Tally]] = {}
+        # Current word count per scene key, and its sums per chapter
+        self.scene_words: dict[str, int] = {}
+        self.chapter_words: dict[str, int] = {}
+        self.total_words = 0
+        self.offset = 0
+        self.pending = 0
+        self.built = False
+        self._lock = asyncio.Lock()
+
+    async def ensure_built(self) -> None:
+        async with self._lock:
+            if self.built:
+                return
+            snapshot, events, offset = await fs.run(
+                event_log.load,
+                sessions_dir() / EVENTS_FILENAME,
+                sessions_dir() / ROLLUPS_FILENAME,
+                ROLLUP_VERSION,
+                _EVENT_FIELDS,
+            )
+            if snapshot is not None:
+                self._restore(snapshot)
+            for event in events:
+                self._apply(event)
+            self.offset = offset
+            self.pending = len(events)
+
+            paths = await list_scene_paths()
+            unseen = [p for p in paths if scene_key(*p) not in self.scene_words]
+            words = await fs.run(_read_word_counts, manuscript_dir(), unseen)
+            for path, count in zip(unseen, words):
+                if count:
+                    self.scene_words[scene_key(*path)] = count
+
+            self.chapter_words.clear()
+            for key, count in self.scene_words.items():
+                chapter = key.rsplit("/", 1)[0]
+                total = self.chapter_words.get(chapter, 0) + count
+                self.chapter_words[chapter] = total
+            self.total_words = sum(self.scene_words.values())
+            self.built = True
+
+    def _restore(self, snapshot: dict) -> None:
+        self.daily = snapshot["daily"]
+        self.weekly = snapshot["weekly"]
+        self.chapters = snapshot["chapters"]
+        self.acts = snapshot["acts"]
+        self.act_daily = snapshot["actDaily"]
+        self.scene_words = snapshot["sceneWords"]
+
+    def _apply(self, event: dict) -> None:
+        """Fold one event into the rollups."""
+        key, delta, words = event["key"], event["delta"], event["words"]
+        day = date.fromtimestamp(event["ts"])
+        added, removed = max(delta, 0), max(-delta, 0)
+        chapter = key.rsplit("/", 1)[0]
+        act = chapter.rsplit("/", 1)[0]
+
+        _bump(self.daily, day.isoformat(), added, removed)
+        _bump(self.weekly, week_of(day), added, removed)
+        _bump(self.chapters, chapter, added, removed)
+        _bump(self.acts, act, added, removed)
+        _bump(self.act_daily.setdefault(act, {}), day.isoformat(), added, removed)
+
+        previous = self.scene_words.pop(key, 0)
+        if words:
+            self.scene_words[key] = words
+        if self.built:
+            count = self.chapter_words.get(chapter, 0) + words - previous
+            self.chapter_words[chapter] = count
+            self.total_words += words - previous
+
+    async def record(self, key: str, words: int) -> None:
+        """
+        Log a scene's new word count (0 once deleted). Saves that don't
+        change the count are not logged.
+
+        Args:
+            key: Scene key (book/act/chapter/scene)
+            words: The scene's word count after the save
+        """
+        await self.ensure_built()
+        async with self._lock:
+            delta = words - self.scene_words.get(key, 0)
+            if delta == 0:
+                return
+            event = {
+                "ts": round(time.time(), 3),
+                "key": key,
+                "delta": delta,
+                "words": words,
+            }
+            written = await fs.run(
+                event_log.append, sessions_dir() / EVENTS_FILENAME, event
+            )
+            self._apply(event)
+            self.offset += written
+            self.pending += 1
+            if self.pending >= SNAPSHOT_EVERY:
+                await self._snapshot()
+
+    async def flush(self) -> None:
+        """Snapshot the rollups if events were recorded since the last one."""
+        async with self._lock:
+            if self.built and self.pending:
+                await self._snapshot()
+
+    async def close(self) -> None:
+        """Flush before shutdown or workspace eviction."""
+        await self.flush()
+
+    async def _snapshot(self) -> None:
+        data = orjson.dumps(
+            {
+                "version": ROLLUP_VERSION,
+                "offset": self.offset,
+                "daily": self.daily,
+                "weekly": self.weekly,
+                "chapters": self.chapters,
+                "acts": self.acts,
+                "actDaily": self.act_daily,
+                "sceneWords": self.scene_words,
+            }
+        )
+        await fs.run(event_log.write_snapshot, sessions_dir() / ROLLUPS_FILENAME, data)
+        self.pending = 0
+
+    # ------------------------------------------------------------------------
+    # Queries: O(1) lookups or O(days) walks over the rollups
+    # ------------------------------------------------------------------------
+
+    def _active(self, day: date) -> bool:
+        tally = self.daily.get(day.isoformat())
+        return tally is not None and tally[0] > 0
+
+    def current_streak(self, today: date | None = None) -> int:
+        """
+        Consecutive days up to today on which words were added. A streak
+        still counts if today has no writing yet but yesterday did.
+        """
+        day = today or date.today()
+        if not self._active(day):
+            day -= timedelta(days=1)
+        streak = 0
+        while self._active(day):
+            streak += 1
+            day -= timedelta(days=1)
+        return streak
+
+    def longest_streak(self) -> int:
+        longest = run = 0
+        previous = None
+        for day in sorted(d for d, tally in self.daily.items() if tally[0] > 0):
+            current = date.fromisoformat(day)
+            if previous is not None and current - previous == timedelta(days=1):
+                run += 1
+            else:
+                run = 1
+            longest = max(longest, run)
+            previous = current
+        return longest
+
+    def summary(self, today: date | None = None) -> dict:
+        today = today or date.today()
+        return {
+            "totalWords": self.total_words,
+            "today": _tally_dict(self.daily.get(today.isoformat())),
+            "thisWeek": _tally_dict(self.weekly.get(week_of(today))),
+            "currentStreak": self.current_streak(today),
+            "longestStreak": self.longest_streak(),
+            "writingDays": sum(1 for tally in self.daily.values() if tally[0] > 0),
+        }
+
+    def days(self, count: int, today: date | None = None) -> list[dict]:
+        """Tallies for the last `count` days, oldest first (zeros included)."""
+        today = today or date.today()
+        result = []
+        for back in range(count - 1, -1, -1):
+            day = (today - timedelta(days=back)).isoformat()
+            result.append({"date": day, **_tally_dict(self.daily.get(day))})
+        return result
+
+    def weeks(self, count: int, today: date | None = None) -> list[dict]:
+        """Tallies for the last `count` ISO weeks, oldest first."""
+        today = today or date.today()
+        result = []
+        for back in range(count - 1, -1, -1):
+            week = week_of(today - timedelta(weeks=back))
+            result.append({"week": week, **_tally_dict(self.weekly.get(week))})
+        return result
+
+    def velocity(self, days: int, today: date | None = None) -> list[dict]:
+        """
+        Words per day for each act over the last `days` days.
+
+        Returns:
+            List of {"bookId", "actId", "added", "removed", "net",
+            "activeDays", "wordsPerDay"} dicts, most productive first
+        """
+        today = today or date.today()
+        window = [
+            (today - timedelta(days=back)).isoformat() for back in range(days)
+        ]
+        result = []
+        for act, by_day in self.act_daily.items():
+            added = removed = active = 0
+            for day in window:
+                tally = by_day.get(day)
+                if tally is not None:
+                    added += tally[0]
+                    removed += tally[1]
+                    active += tally[0] > 0
+            if not added and not removed:
+                continue
+            book_id, act_id = act.split("/")
+            result.append(
+                {
+                    "bookId": book_id,
+                    "actId": act_id,
+                    "added": added,
+                    "removed": removed,
+                    "net": added - removed,
+                    "activeDays": active,
+                    "wordsPerDay": round((added - removed) / days, 1),
+                }
+            )
+        result.sort(key=lambda item: (-item["net"], item["bookId"], item["actId"]))
+        return result
+
+    def chapter_totals(self) -> list[dict]:
+        """Current length and all-time activity per chapter, in key order."""
+        keys = sorted(self.chapters.keys() | self.chapter_words.keys())
+        result = []
+        for key in keys:
+            book_id, act_id, chapter_id = key.split("/")
+            result.append(
+                {
+                    "bookId": book_id,
+                    "actId": act_id,
+                    "chapterId": chapter_id,
+                    "words": self.chapter_words.get(key, 0),
+                    **_tally_dict(self.chapters.get(key)),
+                }
+            )
+        return result
+
+
+def _read_word_counts(
+    root: Path, paths: list[tuple[str, str, str, str]]
+) -> list[int]:
+    counts = []
+    for book_id, act_id, chapter_id, scene_id in paths:
+        path = root / book_id / act_id / chapter_id / f"{scene_id}.json"
+        text = fs.read_text_or_none(path)
+        try:
+            data = json.loads(text) if text is not None else None
+        except json.JSONDecodeError:
+            data = None
+        count = 0
+        if isinstance(data, dict):
+            count = data.get("wordCount", data.get("word_count", 0))
+        counts.append(count if isinstance(count, int) else 0)
+    return counts
+
+
+def get_writing_stats() -> WritingStats:
+    """Return the current workspace's writing statistics."""
+    return current_workspace().service("writing_stats", WritingStats)
+
+
+async def _on_scene_saved(book_id, act_id, chapter_id, scene, content) -> None:
+    key = scene_key(book_id, act_id, chapter_id, scene.id)
+    await get_writing_stats().record(key, scene.word_count)
+
+
+async def _on_scene_deleted(book_id, act_id, chapter_id, scene_id) -> None:
+    key = scene_key(book_id, act_id, chapter_id, scene_id)
+    await get_writing_stats().record(key, 0)
+
+
+subscribe("scene_saved", _on_scene_saved)
+subscribe("scene_deleted", _on_scene_deleted)
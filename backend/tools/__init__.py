@@ -0,0 +1 @@
+"""Developer tools (benchmarks, load tests) for the WeightAshes backend."""
@@ -0,0 +1,88 @@
+"""
+Benchmark codex listing throughput on a synthetic codex.
+
+Usage (from backend/):
+    python -m tools.bench_codex_listing [--entries 5000] [--rounds 5]
+
+Builds a throwaway codex of N entries in a temp directory, then times
+list_codex_entries() (cold and warm) and a full GET /api/codex/ round trip
+through the ASGI app, reporting entries per second.
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+
+def _write_codex(codex_dir: Path, count: int) -> None:
+    regions = ["piramia", "dimanor", "forestalia"]
+    for i in range(count):
+        region = regions[i % len(regions)]
+        entry_dir = codex_dir / "character" / region
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        data = {
+            "id": f"entry-{i:05d}",
+            "type": "character",
+            "name": f"Character {i}",
+            "aliases": [f"Alias {i}", f"C{i}"],
+            "tags": ["bench", region, f"group-{i % 20}"],
+            "global": i % 50 == 0,
+            "region": region,
+            "relations": [{"target": f"entry-{(i + 1) % count:05d}", "type": "ally"}],
+            "created": "2025-12-24T00:09:08Z",
+            "modified": "2025-12-24T00:09:08Z",
+        }
+        (entry_dir / f"{data['id']}.json").write_text(json.dumps(data, indent=2))
+        (entry_dir / f"{data['id']}.md").write_text(f"# Character {i}\n\nBench.\n")
+
+
+def _rate(count: int, seconds: float) -> str:
+    return f"{seconds * 1000:8.1f} ms  ({count / seconds:10.0f} entries/s)"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        codex_dir = Path(tmp) / "codex"
+        _write_codex(codex_dir, args.entries)
+
+        import services.file_manager as file_manager
+        import services.workspace as workspace
+
+        workspace._registry = workspace.WorkspaceRegistry(default_dir=Path(tmp))
+
+        from fastapi.testclient import TestClient
+
+        from app import app
+
+        client = TestClient(app)
+
+        start = time.perf_counter()
+        entries = asyncio.run(file_manager.list_codex_entries())
+        print(f"list_codex_entries (cold): {_rate(len(entries), time.perf_counter() - start)}")
+
+        best = float("inf")
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            asyncio.run(file_manager.list_codex_entries())
+            best = min(best, time.perf_counter() - start)
+        print(f"list_codex_entries (warm): {_rate(len(entries), best)}")
+
+        best = float("inf")
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            response = client.get("/api/codex/")
+            best = min(best, time.perf_counter() - start)
+        assert response.status_code == 200 and len(response.json()) == args.entries
+        print(f"GET /api/codex/          : {_rate(args.entries, best)}")
+
+
+if __name__ == "__main__":
+    main()
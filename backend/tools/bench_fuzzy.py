@@ -0,0 +1,117 @@
+"""
+Benchmark typo-tolerant codex name lookup.
+
+Usage (from backend/):
+    python -m tools.bench_fuzzy [--entries 10000] [--queries 2000]
+
+Indexes N synthetic fantasy names (each with an alias) in memory, then
+looks up misspelled versions of them (a letter dropped, doubled, swapped
+or changed) and reports lookup latency percentiles and how often the
+intended entry was ranked first and within the top five.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+from models import CodexEntry
+from services.fuzzy_index import FuzzyNameIndex
+
+ONSETS = "b br c ch d dr f g gr h k kh l m n p r s sh t th tr v w z".split()
+VOWELS = "a e i o u ae ai ei ia io y".split()
+CODAS = ["", "", "", "n", "r", "l", "s", "th", "nd", "rk", "ll", "m", "x"]
+
+
+def _name(rng: random.Random) -> str:
+    word = "".join(
+        rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS)
+        for _ in range(rng.randint(2, 3))
+    )
+    return word.capitalize()
+
+
+def _typo(rng: random.Random, name: str) -> str:
+    i = rng.randrange(1, len(name))
+    kind = rng.choice(["drop", "double", "swap", "change"])
+    if kind == "drop":
+        return name[:i] + name[i + 1 :]
+    if kind == "double":
+        return name[:i] + name[i] + name[i:]
+    if kind == "swap" and i < len(name) - 1:
+        return name[:i] + name[i + 1] + name[i] + name[i + 2 :]
+    return name[:i] + rng.choice("aeiourlnst") + name[i + 1 :]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    entries = []
+    seen = set()
+    while len(entries) < args.entries:
+        first, last = _name(rng), _name(rng)
+        if (first, last) in seen:
+            continue
+        seen.add((first, last))
+        entries.append(
+            CodexEntry(
+                id=f"entry-{len(entries):05d}",
+                type="character",
+                name=f"{first} {last}",
+                aliases=[first],
+                created=now,
+                modified=now,
+            )
+        )
+
+    index = FuzzyNameIndex()
+    started = time.perf_counter()
+    for entry in entries:
+        index.set_entry(entry)
+    build = time.perf_counter() - started
+    print(f"build               : {build * 1000:8.1f} ms  {index.stats()}")
+
+    timings = []
+    first = top5 = 0
+    for _ in range(args.queries):
+        entry = rng.choice(entries)
+        query = _typo(rng, entry.name)
+        started = time.perf_counter()
+        results = index.search(query, limit=5)
+        timings.append(time.perf_counter() - started)
+        ids = [result["id"] for result in results]
+        first += bool(ids) and ids[0] == entry.id
+        top5 += entry.id in ids
+
+    timings.sort()
+
+    def p(q: float) -> float:
+        return timings[min(len(timings) - 1, int(q * len(timings)))] * 1000
+
+    print(
+        f"lookup              : p50 {p(0.5):6.3f} ms  p95 {p(0.95):6.3f} ms  "
+        f"p99 {p(0.99):6.3f} ms  mean {statistics.mean(timings) * 1000:6.3f} ms"
+    )
+    print(
+        f"misspelled full name: top-1 {first / args.queries:6.1%}  "
+        f"top-5 {top5 / args.queries:6.1%}"
+    )
+
+    started = time.perf_counter()
+    pairs = asyncio.run(index.duplicates(min_score=0.8))
+    print(
+        f"duplicates scan     : {(time.perf_counter() - started) * 1000:8.1f} ms  "
+        f"({len(pairs)} pairs >= 0.8)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark BM25 retrieval of earlier manuscript passages.
+
+Usage (from backend/):
+    python -m tools.bench_passages [--scenes 500] [--paragraphs 30]
+
+Indexes N synthetic scenes of random prose in memory, then reports build
+time, query latency percentiles for short multi-word queries, and the
+cost of re-indexing one scene after a save.
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from services.passage_index import PassageIndex
+
+SYLLABLES = "ar en ith or al ver mor tan el ka ri sha dun vel ost im ae".split()
+
+
+def _vocabulary(rng: random.Random, size: int) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(1, 3))))
+    return sorted(words)
+
+
+def _scene(rng: random.Random, words: list[str], paragraphs: int) -> str:
+    # Zipf-like word choice, so some words are common and most are rare
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return "\n\n".join(
+        " ".join(rng.choices(words, weights, k=rng.randint(20, 100)))
+        for _ in range(paragraphs)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scenes", type=int, default=500)
+    parser.add_argument("--paragraphs", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = _vocabulary(rng, 5000)
+    scenes = {
+        f"book-1/act-1/chapter-{i // 10:02d}/scene-{i:04d}": _scene(
+            rng, words, args.paragraphs
+        )
+        for i in range(args.scenes)
+    }
+
+    index = PassageIndex()
+    started = time.perf_counter()
+    for key, content in scenes.items():
+        index.set_scene(key, content)
+    build = time.perf_counter() - started
+    print(f"build        : {build * 1000:8.1f} ms  {index.stats()}")
+
+    timings = []
+    for _ in range(args.queries):
+        query = " ".join(rng.sample(words[:2000], rng.randint(2, 6)))
+        started = time.perf_counter()
+        index.search(query, limit=5)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+
+    def p(q: float) -> float:
+        return timings[min(len(timings) - 1, int(q * len(timings)))] * 1000
+
+    print(
+        f"query        : p50 {p(0.5):6.3f} ms  p95 {p(0.95):6.3f} ms  "
+        f"p99 {p(0.99):6.3f} ms  mean {statistics.mean(timings) * 1000:6.3f} ms"
+    )
+
+    edits = [
+        (key, _scene(rng, words, args.paragraphs))
+        for key in rng.sample(list(scenes), min(100, len(scenes)))
+    ]
+    started = time.perf_counter()
+    for key, content in edits:
+        index.set_scene(key, content)
+    update = (time.perf_counter() - started) / len(edits)
+    print(f"scene update : {update * 1000:8.3f} ms per save")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark cold start: app import time, time-to-warm and first requests.
+
+Usage (from backend/):
+    python -m tools.bench_startup [--entries 2000] [--scenes 300] [--rounds 5]
+
+Each measurement runs in a fresh interpreter. Reports:
+  - `import app` time (median of --rounds), next to the provider SDK
+    import time that lazy loading keeps off the startup path
+  - time until /api/ready turns 200 on a synthetic project
+  - latency of the first listing/search requests with and without warm-up
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from tools.bench_codex_listing import _write_codex
+
+FIRST_REQUESTS = [
+    "/api/codex/?sort=name&limit=50",
+    "/api/codex/search?q=character",
+    "/api/manuscript/scenes?limit=50",
+    "/api/manuscript/matrix",
+]
+
+_IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def _write_manuscript(manuscript_dir: Path, count: int) -> None:
+    per_chapter = 10
+    for i in range(count):
+        chapter = f"chapter-{i // per_chapter:03d}"
+        chapter_dir = manuscript_dir / "book-1" / "act-1" / chapter
+        chapter_dir.mkdir(parents=True, exist_ok=True)
+        scene_id = f"scene-{i:04d}"
+        scene = {
+            "id": scene_id,
+            "title": f"Scene {i}",
+            "status": "draft",
+            "created": "2025-12-24T00:09:08Z",
+            "modified": "2025-12-24T00:09:08Z",
+        }
+        (chapter_dir / f"{scene_id}.json").write_text(json.dumps(scene))
+        prose = " ".join(
+            f"Character {(i * 7 + j) % 500} walked through the ashes."
+            for j in range(200)
+        )
+        (chapter_dir / f"{scene_id}.md").write_text(f"# Scene {i}\n\n{prose}\n")
+        meta = chapter_dir / "meta.json"
+        scenes = json.loads(meta.read_text())["scenes"] if meta.exists() else []
+        meta.write_text(
+            json.dumps({"id": chapter, "title": chapter, "scenes": [*scenes, scene_id]})
+        )
+
+
+def _time_import(module: str, rounds: int) -> float:
+    times = []
+    for _ in range(rounds):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def _child(data_dir: Path, warm: bool) -> None:
+    """Runs in a fresh interpreter; prints a JSON result line."""
+    import time
+
+    from fastapi.testclient import TestClient
+
+    import services.workspace as workspace
+    from app import app
+
+    # Serve the synthetic project as the default workspace
+    workspace._registry = workspace.WorkspaceRegistry(default_dir=data_dir)
+
+    result: dict = {}
+    client = TestClient(app)
+    if warm:
+        client.__enter__()
+        started = time.perf_counter()
+        while client.get("/api/ready").status_code != 200:
+            time.sleep(0.005)
+        result["time_to_warm"] = time.perf_counter() - started
+        result["tasks"] = client.get("/api/ready").json()["tasks"]
+
+    for url in FIRST_REQUESTS:
+        started = time.perf_counter()
+        response = client.get(url)
+        result[url] = time.perf_counter() - started
+        assert response.status_code == 200, (url, response.status_code)
+
+    if warm:
+        client.__exit__(None, None, None)
+    print(json.dumps(result))
+
+
+def _run_child(data_dir: Path, warm: bool) -> dict:
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "tools.bench_startup",
+            "--child",
+            "warm" if warm else "cold",
+            "--data",
+            str(data_dir),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--scenes", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--child", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    parser.add_argument("--data", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.data, warm=args.child == "warm")
+        return
+
+    print(f"import app          : {_time_import('app', args.rounds) * 1000:8.1f} ms")
+    sdk = _time_import("anthropic, openai", args.rounds)
+    print(f"import SDKs (lazy)  : {sdk * 1000:8.1f} ms  (not paid at startup)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "data"
+        _write_codex(data_dir / "codex", args.entries)
+        _write_manuscript(data_dir / "manuscript", args.scenes)
+
+        cold = _run_child(data_dir, warm=False)
+        warm = _run_child(data_dir, warm=True)
+
+        print(
+            f"time to warm        : {warm['time_to_warm'] * 1000:8.1f} ms  "
+            f"({args.entries} entries, {args.scenes} scenes)"
+        )
+        for name, seconds in sorted(warm["tasks"].items(), key=lambda t: -t[1]):
+            print(f"  {name:<17} : {seconds * 1000:8.1f} ms")
+        print("first request       :     cold ms     warm ms")
+        for url in FIRST_REQUESTS:
+            print(f"  {url:<34} {cold[url] * 1000:8.1f}  {warm[url] * 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Check the rate-limit scheduler against the fake LLM server's 429s.
+
+Usage (from backend/):
+    python -m tools.check_rate_limiter [--retry-after 1.0]
+
+Starts tools.fake_llm answering the first request with a 429 (with
+Retry-After), points the Anthropic provider at it and checks that:
+
+- the request is retried after the Retry-After delay, and a request
+  queued meanwhile for the same model waits out the pause too;
+- backoff is jittered, so retries queued together don't land together;
+- interactive requests are granted before batch ones queued earlier;
+- a cancelled request hands back its output token reservation;
+- a stream the consumer stops early is closed, not left running.
+
+Exits with status 1 if any check fails. Spends no tokens.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from tools.load_test import BACKEND_DIR, _free_port, _wait_until_up
+
+MODEL = "claude-sonnet-4-20250514"
+
+
+def _report(name: str, ok: bool, detail: str) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'}  {name}: {detail}")
+    return ok
+
+
+async def _check_retry_after(provider, scheduler, retry_after: float, url: str):
+    import httpx
+
+    async def call():
+        return await provider.complete("Hello", "", MODEL, 16)
+
+    started = time.perf_counter()
+    first = asyncio.create_task(scheduler.run(MODEL, call, 10, 16))
+    # Let the first request fail, then queue a second behind the pause
+    await asyncio.sleep(min(0.5, retry_after / 2))
+    paused_for = scheduler.snapshot()[MODEL]["paused_for"]
+    second = asyncio.create_task(scheduler.run(MODEL, call, 10, 16))
+    await asyncio.sleep(0.1)
+    during_pause = httpx.get(f"{url}/stats").json()["requests"]
+    await asyncio.gather(first, second)
+    elapsed = time.perf_counter() - started
+    served = httpx.get(f"{url}/stats").json()["requests"]
+    return _report(
+        "Retry-After pause",
+        paused_for > 0 and during_pause == 1 and served == 3 and elapsed >= retry_after,
+        f"paused {paused_for:.2f} s after the 429, {during_pause} request(s) "
+        f"sent during the pause, {served} in all, done in {elapsed:.2f} s",
+    )
+
+
+def _check_jitter(scheduler) -> bool:
+    from services.providers import ProviderError
+
+    error = ProviderError("fake", "Injected 500", status_code=500)
+    delays = [scheduler._backoff(3, error) for _ in range(50)]
+    cap = min(scheduler.max_delay, scheduler.base_delay * 2**3)
+    limited = ProviderError("fake", "Injected 429", status_code=429, retry_after=2.0)
+    after = [scheduler._backoff(0, limited) for _ in range(50)]
+    return _report(
+        "jittered backoff",
+        len(set(delays)) > 40
+        and all(0 <= delay <= cap for delay in delays)
+        and all(2.0 <= delay <= 2.0 * 1.1 + 0.25 for delay in after)
+        and len(set(after)) > 40,
+        f"attempt 3 delays {min(delays):.2f}-{max(delays):.2f} s (cap {cap:.0f} s), "
+        f"Retry-After 2 s delays {min(after):.2f}-{max(after):.2f} s",
+    )
+
+
+async def _check_priority(scheduler) -> bool:
+    from services.rate_limiter import BATCH, INTERACTIVE
+
+    order: list[str] = []
+
+    def call(label: str):
+        async def run():
+            order.append(label)
+            return {"input_tokens": 1, "output_tokens": 1}
+
+        return run
+
+    # Hold the queue so both priorities are waiting when it opens
+    scheduler._budget(MODEL).pause(0.3)
+    tasks = [
+        asyncio.create_task(scheduler.run(MODEL, call(f"batch {i}"), 1, 1, BATCH))
+        for i in range(3)
+    ]
+    await asyncio.sleep(0.05)
+    tasks += [
+        asyncio.create_task(
+            scheduler.run(MODEL, call(f"interactive {i}"), 1, 1, INTERACTIVE)
+        )
+        for i in range(2)
+    ]
+    await asyncio.gather(*tasks)
+    return _report(
+        "interactive before batch",
+        order[:2] == ["interactive 0", "interactive 1"],
+        ", ".join(order),
+    )
+
+
+async def _check_cancel_settles(scheduler) -> bool:
+    budget = scheduler._budget(MODEL)
+    before = budget.snapshot()["output_tokens"]
+    task = asyncio.create_task(scheduler.run(MODEL, lambda: asyncio.sleep(10), 1, 4096))
+    await asyncio.sleep(0.05)
+    during = budget.snapshot()["output_tokens"]
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    after = budget.snapshot()["output_tokens"]
+    return _report(
+        "cancelled request settled",
+        during < before and after == before,
+        f"output tokens available {before}, {during} while running, "
+        f"{after} after the cancel",
+    )
+
+
+async def _check_stream_closed(provider, scheduler, url: str) -> bool:
+    import httpx
+
+    closed = False
+
+    async def call():
+        nonlocal closed
+        try:
+            async for event in provider.stream("Hello", "", MODEL, 200):
+                yield event
+        finally:
+            closed = True
+
+    events = scheduler.stream(MODEL, call, 10, 200)
+    async for _ in events:
+        break
+    await events.aclose()
+    # Closed by aclose() itself, not later by garbage collection
+    closed_at_once = closed
+    await asyncio.sleep(0.2)
+    in_flight = httpx.get(f"{url}/stats").json()["inFlight"]
+    return _report(
+        "stream closed early",
+        closed_at_once and in_flight == 0,
+        f"provider stream closed with the consumer: {closed_at_once}, "
+        f"{in_flight} stream(s) still open on the fake server",
+    )
+
+
+async def _run(args: argparse.Namespace, url: str) -> bool:
+    from services.providers import AnthropicProvider
+    from services.rate_limiter import RateLimitScheduler
+
+    provider = AnthropicProvider()
+    # Import the SDK now, so it doesn't delay the first timed request
+    provider.warm()
+    high = {"rpm": 1_000_000, "itpm": 1_000_000_000, "otpm": 1_000_000_000}
+    results = [
+        await _check_retry_after(
+            provider, RateLimitScheduler(high), args.retry_after, url
+        ),
+        _check_jitter(RateLimitScheduler(high)),
+        await _check_priority(RateLimitScheduler(high)),
+        await _check_cancel_settles(RateLimitScheduler({**high, "otpm": 100_000})),
+        await _check_stream_closed(provider, RateLimitScheduler(high), url),
+    ]
+    return all(results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    fake = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "tools.fake_llm",
+            f"--port={port}",
+            "--latency-ms=20",
+            "--jitter-ms=0",
+            "--tokens-per-second=200",
+            "--fail-first=1",
+            f"--retry-after={args.retry_after}",
+        ],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        _wait_until_up(f"{url}/stats", fake, 30)
+        os.environ["ANTHROPIC_API_KEY"] = "fake"
+        os.environ["ANTHROPIC_BASE_URL"] = url
+        passed = asyncio.run(_run(args, url))
+    finally:
+        fake.terminate()
+        fake.wait(timeout=30)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
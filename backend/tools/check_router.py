@@ -0,0 +1,208 @@
+"""
+Check provider routing against local fake providers.
+
+Usage (from backend/):
+    python -m tools.check_router
+
+Drives a ProviderRouter over in-process fake providers with injected
+latency and failures (no network, no tokens) and checks that:
+
+- a retryable failure fails over to the next provider;
+- a slow primary is hedged, the backup wins and the primary is cancelled;
+- a non-retryable failure is raised without starting the backup;
+- repeated failures open the breaker, which lets one probe through
+  after its cooldown and closes on its success;
+- streams that keep failing after their first chunk open the breaker.
+
+Exits with status 1 if any check fails.
+"""
+
+import asyncio
+import sys
+import time
+from typing import AsyncIterator
+
+from services.provider_router import CircuitBreaker, ProviderRouter
+from services.providers import Provider, ProviderError
+
+MODEL = "claude-sonnet-4-20250514"
+
+
+class FakeProvider(Provider):
+    """
+    A provider answering after `latency` seconds, or failing with
+    `fail_status` (after `fail_after` chunks, for streams).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        latency: float = 0.01,
+        fail_status: int | None = None,
+        fail_after: int = 0,
+    ):
+        self.name = name
+        self.latency = latency
+        self.fail_status = fail_status
+        self.fail_after = fail_after
+        self.started = 0
+        self.cancelled = 0
+
+    def is_configured(self) -> bool:
+        return True
+
+    def model_for(self, model: str) -> str | None:
+        return model
+
+    def _error(self) -> ProviderError:
+        return ProviderError(
+            self.name,
+            f"Injected {self.fail_status}",
+            status_code=self.fail_status,
+            retryable=self.fail_status not in (400, 401, 413, 422),
+        )
+
+    async def complete(
+        self, prompt: str, system: str, model: str, max_tokens: int
+    ) -> dict:
+        self.started += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail_status is not None:
+            raise self._error()
+        return {"response": self.name, "input_tokens": 10, "output_tokens": 2}
+
+    async def stream(
+        self, prompt: str, system: str, model: str, max_tokens: int
+    ) -> AsyncIterator[dict]:
+        self.started += 1
+        await asyncio.sleep(self.latency)
+        for i in range(3):
+            if self.fail_status is not None and i == self.fail_after:
+                raise self._error()
+            yield {"text": f"{self.name} {i} "}
+        yield {"input_tokens": 10, "output_tokens": 3}
+
+
+def _router(*providers: FakeProvider, **options) -> ProviderRouter:
+    router = ProviderRouter(list(providers), **options)
+    router.breakers = {
+        p.name: CircuitBreaker(failure_threshold=3, cooldown=0.2) for p in providers
+    }
+    return router
+
+
+def _report(name: str, ok: bool, detail: str) -> bool:
+    print(f"{'ok  ' if ok else 'FAIL'}  {name}: {detail}")
+    return ok
+
+
+async def _check_failover() -> bool:
+    primary, backup = FakeProvider("primary", fail_status=529), FakeProvider("backup")
+    result = await _router(primary, backup).generate("Hi", "", MODEL)
+    return _report(
+        "failover",
+        result["provider"] == "backup",
+        f"primary failed with 529, served by {result['provider']}",
+    )
+
+
+async def _check_hedge() -> bool:
+    primary, backup = FakeProvider("primary", latency=1.0), FakeProvider("backup")
+    router = _router(primary, backup, hedge=True, hedge_delay=0.1)
+    started = time.perf_counter()
+    result = await router.generate("Hi", "", MODEL)
+    elapsed = time.perf_counter() - started
+    return _report(
+        "hedging",
+        result["provider"] == "backup" and primary.cancelled == 1 and elapsed < 0.5,
+        f"served by {result['provider']} in {elapsed * 1000:.0f} ms, "
+        f"slow primary cancelled: {primary.cancelled == 1}",
+    )
+
+
+async def _check_no_hedge_on_bad_request() -> bool:
+    primary = FakeProvider("primary", fail_status=400)
+    backup = FakeProvider("backup")
+    router = _router(primary, backup, hedge=True, hedge_delay=0.1)
+    try:
+        await router.generate("Hi", "", MODEL)
+        raised = None
+    except ProviderError as e:
+        raised = e.status_code
+    return _report(
+        "no backup for a bad request",
+        raised == 400 and backup.started == 0,
+        f"raised {raised}, backup requests started: {backup.started}",
+    )
+
+
+async def _check_breaker() -> bool:
+    primary, backup = FakeProvider("primary", fail_status=500), FakeProvider("backup")
+    router = _router(primary, backup)
+    for _ in range(5):
+        await router.generate("Hi", "", MODEL)
+    tripped = primary.started
+    state = router.breakers["primary"].state
+    await asyncio.sleep(0.25)
+    primary.fail_status = None
+    result = await router.generate("Hi", "", MODEL)
+    return _report(
+        "circuit breaker",
+        tripped == 3
+        and state == "open"
+        and result["provider"] == "primary"
+        and router.breakers["primary"].state == "closed",
+        f"primary tried {tripped} of 5 times before opening; after the "
+        f"cooldown its probe served and the breaker is "
+        f"{router.breakers['primary'].state}",
+    )
+
+
+async def _check_stream_failure() -> bool:
+    primary = FakeProvider("primary", fail_status=529, fail_after=1)
+    router = _router(primary, FakeProvider("backup"))
+    chunks = []
+    raised = 0
+    for _ in range(5):
+        try:
+            async for event in router.stream("Hi", "", MODEL):
+                chunks.append(event)
+        except ProviderError:
+            raised += 1
+    health = router.health["primary"]
+    breaker = router.breakers["primary"]
+    served = sum(1 for event in chunks if event.get("text", "").startswith("backup"))
+    return _report(
+        "mid-stream failure",
+        raised == 3
+        and primary.started == 3
+        and breaker.state == "open"
+        and health.error_rate == 1.0
+        and served > 0,
+        f"{raised} of 5 streams broke off after their first chunk; primary "
+        f"started {primary.started} times, error rate {health.error_rate:.2f}, "
+        f"breaker {breaker.state}",
+    )
+
+
+async def _run() -> bool:
+    results = [
+        await _check_failover(),
+        await _check_hedge(),
+        await _check_no_hedge_on_bad_request(),
+        await _check_breaker(),
+        await _check_stream_failure(),
+    ]
+    return all(results)
+
+
+def main() -> None:
+    sys.exit(0 if asyncio.run(_run()) else 1)
+
+
+if __name__ == "__main__":
+    main()
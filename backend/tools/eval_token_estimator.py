@@ -0,0 +1,52 @@
+"""
+Report token estimator error bounds on held-out logged requests.
+
+Usage (from backend/):
+    python -m tools.eval_token_estimator [--holdout 0.2] [--model MODEL]
+
+Reads data/sessions/token_samples.jsonl (written as requests are served),
+fits each model's weights on the older samples and measures relative
+error on the newest ones, next to the chars/4 rule of thumb.
+"""
+
+import argparse
+import asyncio
+
+
+def _row(label: str, bounds: dict) -> str:
+    return (
+        f"  {label:<12} p50 {bounds['p50']:7.1%}  p90 {bounds['p90']:7.1%}  "
+        f"p95 {bounds['p95']:7.1%}  max {bounds['max']:7.1%}  "
+        f"bias {bounds['bias']:+7.1%}"
+    )
+
+
+async def _report(holdout: float, only: str | None) -> None:
+    from services.token_estimator import get_token_estimator
+
+    estimator = get_token_estimator()
+    await estimator.ensure_loaded()
+    models = [m for m in estimator.models if only is None or m == only]
+    if not models:
+        print("No logged samples yet; serve some AI requests first.")
+        return
+    for model in sorted(models):
+        result = estimator.evaluate(model, holdout)
+        if "error" in result:
+            print(f"{model}: {result['samples']} samples. {result['error']}")
+            continue
+        print(f"{model}: trained on {result['train']}, held out {result['holdout']}")
+        print(_row("estimator", result["estimator"]))
+        print(_row("chars/4", result["chars_div_4"]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args()
+    asyncio.run(_report(args.holdout, args.model))
+
+
+if __name__ == "__main__":
+    main()
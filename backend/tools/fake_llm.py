@@ -0,0 +1,257 @@
+"""
+Local stand-in for the Anthropic messages API, for load tests.
+
+Usage (from backend/):
+    python -m tools.fake_llm [--port 8901] [--latency-ms 400]
+                             [--tokens-per-second 60] [--output-tokens 200]
+                             [--rate-429 0.0] [--rate-5xx 0.0] [--fail-first 0]
+
+Then point the backend at it:
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8901 ANTHROPIC_API_KEY=fake ...
+
+Serves POST /v1/messages, streaming (server-sent events, as the SDK
+expects) and non-streaming. Each response waits --latency-ms (plus up to
+--jitter-ms) before its first token, then produces filler prose at
+--tokens-per-second, up to the request's max_tokens. Requests can be
+failed at random with 429 (with Retry-After) or 500/529, before any
+output, and the first --fail-first requests always get a 429. Usage is
+reported like the real API (input tokens estimated at four characters
+per token). GET /stats reports what was served.
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import uuid
+
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+WORDS = (
+    "the ash fell over the ridge and she watched it settle on the dead "
+    "fields while the wind carried smoke from the burning keep toward the "
+    "river where the others waited in silence for a signal that never came"
+).split()
+
+# Server errors injected, with the API's error type for each
+SERVER_ERRORS = ((500, "api_error"), (529, "overloaded_error"))
+
+
+class Stats:
+    """Counts of what the fake server has served."""
+
+    def __init__(self):
+        self.requests = 0
+        self.streams = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "streams": self.streams,
+            "rateLimited": self.rate_limited,
+            "serverErrors": self.server_errors,
+            "inputTokens": self.input_tokens,
+            "outputTokens": self.output_tokens,
+            "inFlight": self.in_flight,
+            "maxInFlight": self.max_in_flight,
+        }
+
+
+def _text_of(content) -> str:
+    """Text of a message's content (a string or a list of blocks)."""
+    if isinstance(content, str):
+        return content
+    return " ".join(
+        block.get("text", "") for block in content if isinstance(block, dict)
+    )
+
+
+def count_input_tokens(body: dict) -> int:
+    system = body.get("system") or ""
+    text = _text_of(system) + "".join(
+        _text_of(message.get("content", "")) for message in body.get("messages", [])
+    )
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _error(status_code: int, error_type: str, headers=None) -> JSONResponse:
+    return JSONResponse(
+        {
+            "type": "error",
+            "error": {"type": error_type, "message": f"Injected {status_code}"},
+        },
+        status_code=status_code,
+        headers=headers,
+    )
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Fake LLM")
+    stats = Stats()
+    rng = random.Random(args.seed)
+
+    async def first_token_delay() -> None:
+        await asyncio.sleep((args.latency_ms + rng.uniform(0, args.jitter_ms)) / 1000)
+
+    def chunks(count: int):
+        """Filler text in chunks of about --chunk-tokens tokens (one per word)."""
+        position = 0
+        while position < count:
+            size = min(args.chunk_tokens, count - position)
+            words = [WORDS[(position + i) % len(WORDS)] for i in range(size)]
+            position += size
+            yield size, " ".join(words) + " "
+
+    @app.post("/v1/messages")
+    async def messages(request: Request) -> Response:
+        body = orjson.loads(await request.body())
+        stats.requests += 1
+        roll = rng.random()
+        if stats.requests <= args.fail_first or roll < args.rate_429:
+            stats.rate_limited += 1
+            return _error(
+                429, "rate_limit_error", headers={"retry-after": str(args.retry_after)}
+            )
+        if roll < args.rate_429 + args.rate_5xx:
+            stats.server_errors += 1
+            return _error(*rng.choice(SERVER_ERRORS))
+
+        model = body.get("model", "fake")
+        input_tokens = count_input_tokens(body)
+        output_tokens = min(args.output_tokens, body.get("max_tokens", 4096))
+        stop_reason = (
+            "max_tokens" if output_tokens < args.output_tokens else "end_turn"
+        )
+        message_id = f"msg_{uuid.uuid4().hex[:24]}"
+        stats.input_tokens += input_tokens
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
+
+        if not body.get("stream"):
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+            try:
+                await first_token_delay()
+                await asyncio.sleep(output_tokens / args.tokens_per_second)
+            finally:
+                stats.in_flight -= 1
+            stats.output_tokens += output_tokens
+            text = "".join(chunk for _, chunk in chunks(output_tokens))
+            return JSONResponse(
+                {
+                    "id": message_id,
+                    "type": "message",
+                    "role": "assistant",
+                    "model": model,
+                    "content": [{"type": "text", "text": text}],
+                    "stop_reason": stop_reason,
+                    "stop_sequence": None,
+                    "usage": usage,
+                }
+            )
+
+        async def events():
+            stats.streams += 1
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+            try:
+                yield _sse(
+                    "message_start",
+                    {
+                        "type": "message_start",
+                        "message": {
+                            "id": message_id,
+                            "type": "message",
+                            "role": "assistant",
+                            "model": model,
+                            "content": [],
+                            "stop_reason": None,
+                            "stop_sequence": None,
+                            "usage": {**usage, "output_tokens": 1},
+                        },
+                    },
+                )
+                await first_token_delay()
+                yield _sse(
+                    "content_block_start",
+                    {
+                        "type": "content_block_start",
+                        "index": 0,
+                        "content_block": {"type": "text", "text": ""},
+                    },
+                )
+                for size, text in chunks(output_tokens):
+                    yield _sse(
+                        "content_block_delta",
+                        {
+                            "type": "content_block_delta",
+                            "index": 0,
+                            "delta": {"type": "text_delta", "text": text},
+                        },
+                    )
+                    # Counted as sent, so cancelled streams bill what they got
+                    stats.output_tokens += size
+                    await asyncio.sleep(size / args.tokens_per_second)
+                yield _sse(
+                    "content_block_stop", {"type": "content_block_stop", "index": 0}
+                )
+                yield _sse(
+                    "message_delta",
+                    {
+                        "type": "message_delta",
+                        "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                        "usage": {"output_tokens": output_tokens},
+                    },
+                )
+                yield _sse("message_stop", {"type": "message_stop"})
+            finally:
+                stats.in_flight -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats() -> dict:
+        return stats.snapshot()
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency-ms", type=float, default=400.0)
+    parser.add_argument("--jitter-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--output-tokens", type=int, default=200)
+    parser.add_argument("--chunk-tokens", type=int, default=5)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--fail-first", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Load-test the AI chat path without spending tokens.
+
+Usage (from backend/):
+    python -m tools.load_test [--sessions 20] [--messages 5] [--think-ms 500]
+                              [--variants 0] [--passages 3]
+                              [--fake-latency-ms 400] [--fake-tps 60]
+                              [--fake-rate-429 0.0] [--fake-rate-5xx 0.0]
+    python -m tools.load_test --url http://127.0.0.1:8000 ...
+
+By default, starts the fake LLM server (tools.fake_llm) and a backend
+pointed at it, serving a throwaway copy of data/ with the client-side
+rate limits raised out of the way (--limit-rpm etc. to test them). With
+--url, drives an already running backend instead; point that backend at
+the fake server yourself, or it will spend real tokens.
+
+Runs --sessions concurrent chat sessions, each sending --messages
+messages about one scene with a few codex entries, pausing --think-ms
+between them. With --variants N, each message asks /api/ai/variants for
+N streamed drafts instead of one /api/ai/chat response. Reports
+throughput, latency and time to first token (the whole response for
+plain chat, which isn't streamed), and the backend's event-loop lag.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import orjson
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+MESSAGES = [
+    "What would she say next?",
+    "Suggest how this beat could end.",
+    "Describe the ridge at dusk in her voice.",
+    "What does he remember about the fire?",
+    "Give me three lines of tense dialogue here.",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentiles(values: list[float]) -> str:
+    if not values:
+        return "n/a"
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return f"p50 {at(0.5):7.1f} ms  p95 {at(0.95):7.1f} ms  p99 {at(0.99):7.1f} ms"
+
+
+class Results:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.first_tokens: list[float] = []
+        self.errors: dict[str, int] = {}
+        self.output_tokens = 0
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+async def _chat(
+    client: httpx.AsyncClient, body: dict, results: Results
+) -> None:
+    started = time.perf_counter()
+    response = await client.post("/api/ai/chat", json=body)
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        results.error(f"HTTP {response.status_code}")
+        return
+    data = response.json()
+    if data["response"].startswith("Error:"):
+        results.error(data["response"][:60])
+        return
+    results.latencies.append(elapsed)
+    results.first_tokens.append(elapsed)
+    results.output_tokens += data["tokens_used"]["output"]
+
+
+async def _variants(
+    client: httpx.AsyncClient, body: dict, results: Results
+) -> None:
+    started = time.perf_counter()
+    first_token = None
+    failed = False
+    async with client.stream("POST", "/api/ai/variants", json=body) as response:
+        if response.status_code != 200:
+            results.error(f"HTTP {response.status_code}")
+            return
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            event = orjson.loads(line)
+            if event["type"] == "text" and first_token is None:
+                first_token = time.perf_counter() - started
+            elif event["type"] == "done":
+                results.output_tokens += event["output_tokens"]
+            elif event["type"] == "error":
+                results.error(event["message"][:60])
+                failed = True
+    if not failed:
+        results.latencies.append(time.perf_counter() - started)
+    if first_token is not None:
+        results.first_tokens.append(first_token)
+
+
+async def _session(
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    rng: random.Random,
+    scenes: list[dict],
+    entry_ids: list[str],
+    results: Results,
+) -> None:
+    scene = rng.choice(scenes) if scenes else None
+    entries = rng.sample(entry_ids, min(3, len(entry_ids)))
+    for _ in range(args.messages):
+        body = {
+            "message": rng.choice(MESSAGES),
+            "context_entries": entries,
+            "scene_id": scene["key"] if scene else None,
+            "relation_hops": args.relation_hops,
+            "passages": args.passages,
+        }
+        try:
+            if args.variants:
+                await _variants(client, {**body, "count": args.variants}, results)
+            else:
+                await _chat(client, body, results)
+        except httpx.HTTPError as e:
+            results.error(type(e).__name__)
+        await asyncio.sleep(args.think_ms / 1000)
+
+
+async def _run(args: argparse.Namespace, url: str) -> None:
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.sessions + 10)
+    async with httpx.AsyncClient(
+        base_url=url, timeout=args.timeout, limits=limits
+    ) as client:
+        scenes = (await client.get("/api/manuscript/scenes?limit=200")).json()
+        entries = (await client.get("/api/codex/?limit=200")).json()
+        entry_ids = [entry["id"] for entry in entries]
+
+        results = Results()
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                _session(client, args, rng, scenes, entry_ids, results)
+                for _ in range(args.sessions)
+            )
+        )
+        elapsed = time.perf_counter() - started
+        metrics = (await client.get("/api/metrics")).json()
+
+    requests = len(results.latencies)
+    mode = f"variants x{args.variants}" if args.variants else "chat"
+    print(f"mode              : {mode}, {args.sessions} sessions")
+    print(f"completed         : {requests} requests in {elapsed:.2f} s")
+    print(f"errors            : {sum(results.errors.values())}")
+    for kind, count in sorted(results.errors.items(), key=lambda item: -item[1]):
+        print(f"  {count:5d}  {kind}")
+    print(f"throughput        : {requests / elapsed:8.2f} req/s")
+    print(f"output tokens     : {results.output_tokens / elapsed:8.1f} tok/s")
+    print(f"latency           : {_percentiles(results.latencies)}")
+    print(f"time to 1st token : {_percentiles(results.first_tokens)}")
+
+    lag = metrics["series"].get("loop_lag")
+    if lag:
+        print(
+            f"backend loop lag  : p50 {lag['p50'] * 1000:7.2f} ms  "
+            f"p99 {lag['p99'] * 1000:7.2f} ms  max {lag['max'] * 1000:7.2f} ms"
+        )
+    assembly = metrics["series"].get("context_assembly")
+    if assembly:
+        print(
+            f"context assembly  : p50 {assembly['p50'] * 1000:7.2f} ms  "
+            f"p99 {assembly['p99'] * 1000:7.2f} ms"
+        )
+    cache = metrics.get("contextCache")
+    if cache:
+        print(f"context cache     : hit rate {cache['hitRate']}")
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"{url} exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    sys.exit(f"{url} not up after {timeout:.0f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", help="Drive this backend instead of starting one")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--think-ms", type=float, default=500.0)
+    parser.add_argument("--variants", type=int, default=0)
+    parser.add_argument("--passages", type=int, default=3)
+    parser.add_argument("--relation-hops", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--fake-latency-ms", type=float, default=400.0)
+    parser.add_argument("--fake-tps", type=float, default=60.0)
+    parser.add_argument("--fake-output-tokens", type=int, default=200)
+    parser.add_argument("--fake-rate-429", type=float, default=0.0)
+    parser.add_argument("--fake-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--limit-rpm", type=int, default=1_000_000)
+    parser.add_argument("--limit-itpm", type=int, default=1_000_000_000)
+    parser.add_argument("--limit-otpm", type=int, default=1_000_000_000)
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(_run(args, args.url))
+        return
+
+    from services.workspace import DEFAULT_DATA_DIR
+
+    fake_port, backend_port = _free_port(), _free_port()
+    processes: list[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "data"
+        shutil.copytree(DEFAULT_DATA_DIR, data_dir)
+        try:
+            fake = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "tools.fake_llm",
+                    f"--port={fake_port}",
+                    f"--latency-ms={args.fake_latency_ms}",
+                    f"--tokens-per-second={args.fake_tps}",
+                    f"--output-tokens={args.fake_output_tokens}",
+                    f"--rate-429={args.fake_rate_429}",
+                    f"--rate-5xx={args.fake_rate_5xx}",
+                    f"--seed={args.seed}",
+                ],
+                cwd=BACKEND_DIR,
+            )
+            processes.append(fake)
+            env = {
+                **os.environ,
+                "ANTHROPIC_API_KEY": "fake",
+                "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{fake_port}",
+                # Only the fake provider is configured
+                "OPENAI_API_KEY": "",
+                "OPENROUTER_API_KEY": "",
+                "DATA_DIR": str(data_dir),
+                "WORKSPACES_DIR": str(Path(tmp) / "workspaces"),
+                "AI_LIMIT_RPM": str(args.limit_rpm),
+                "AI_LIMIT_ITPM": str(args.limit_itpm),
+                "AI_LIMIT_OTPM": str(args.limit_otpm),
+            }
+            backend = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "uvicorn",
+                    "app:app",
+                    f"--port={backend_port}",
+                    "--log-level=warning",
+                ],
+                cwd=BACKEND_DIR,
+                env=env,
+            )
+            processes.append(backend)
+            _wait_until_up(f"http://127.0.0.1:{fake_port}/stats", fake, 30)
+            url = f"http://127.0.0.1:{backend_port}"
+            _wait_until_up(f"{url}/api/ready", backend, 60)
+
+            asyncio.run(_run(args, url))
+            stats = httpx.get(f"http://127.0.0.1:{fake_port}/stats").json()
+            print(
+                f"fake LLM          : {stats['requests']} requests, "
+                f"{stats['rateLimited']} x 429, {stats['serverErrors']} x 5xx, "
+                f"max {stats['maxInFlight']} in flight"
+            )
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
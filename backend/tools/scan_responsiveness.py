@@ -0,0 +1,122 @@
+"""
+Check that a cold filesystem scan doesn't stall the event loop.
+
+Usage (from backend/):
+    python -m tools.scan_responsiveness [--entries 10000] [--scenes 500]
+                                        [--max-lag-ms 100] [--baseline]
+
+Builds a throwaway project in a temp directory, then runs a cold codex
+listing, scene listing and manuscript structure scan while a ticker
+coroutine measures how late the loop wakes it. Exits non-zero if the worst
+lag exceeds --max-lag-ms. --baseline also runs the same codex scan on the
+loop itself, for comparison.
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from tools.bench_codex_listing import _write_codex
+from tools.bench_startup import _write_manuscript
+
+TICK = 0.001
+
+
+async def _measure_lag(work) -> tuple[float, list[float]]:
+    """Run `work` while ticking; return (work seconds, per-tick lag)."""
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - started - TICK)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    done.set()
+    await task
+    return elapsed, lags
+
+
+def _report(name: str, elapsed: float, lags: list[float]) -> float:
+    ordered = sorted(lags) or [0.0]
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+    worst = ordered[-1]
+    print(
+        f"{name:<22}: {elapsed * 1000:8.1f} ms   loop lag p99 "
+        f"{p99 * 1000:7.2f} ms  max {worst * 1000:7.2f} ms  ({len(lags)} ticks)"
+    )
+    return worst
+
+
+async def _run(args: argparse.Namespace, data_dir: Path) -> float:
+    import services.file_manager as file_manager
+    import services.workspace as workspace
+
+    workspace._registry = workspace.WorkspaceRegistry(default_dir=data_dir)
+
+    def clear_codex_cache():
+        workspace.current_workspace().services.pop("codex_cache", None)
+
+    worst = 0.0
+    if args.baseline:
+
+        async def on_loop():
+            # The same scan and validation, blocking the loop throughout
+            file_manager._scan_codex_files(file_manager.codex_dir(), {})
+
+        _report("codex scan on loop", *await _measure_lag(on_loop))
+        clear_codex_cache()
+
+    async def codex():
+        entries = await file_manager.list_codex_entries()
+        assert len(entries) == args.entries, len(entries)
+
+    async def scenes():
+        paths = await file_manager.list_scene_paths()
+        assert len(paths) == args.scenes, len(paths)
+
+    async def everything():
+        await asyncio.gather(
+            file_manager.list_codex_entries(),
+            file_manager.list_scene_paths(),
+            file_manager.get_manuscript_structure(),
+        )
+
+    worst = max(worst, _report("cold codex listing", *await _measure_lag(codex)))
+    worst = max(worst, _report("scene listing", *await _measure_lag(scenes)))
+    clear_codex_cache()
+    worst = max(worst, _report("all scans at once", *await _measure_lag(everything)))
+    return worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--scenes", type=int, default=500)
+    parser.add_argument("--max-lag-ms", type=float, default=100.0)
+    parser.add_argument("--baseline", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "data"
+        _write_codex(data_dir / "codex", args.entries)
+        _write_manuscript(data_dir / "manuscript", args.scenes)
+        worst = asyncio.run(_run(args, data_dir))
+
+    if worst * 1000 > args.max_lag_ms:
+        print(f"FAIL: loop stalled {worst * 1000:.1f} ms (> {args.max_lag_ms} ms)")
+        sys.exit(1)
+    print(f"OK: worst loop stall {worst * 1000:.1f} ms (<= {args.max_lag_ms} ms)")
+
+
+if __name__ == "__main__":
+    main()